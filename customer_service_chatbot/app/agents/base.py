@@ -1,13 +1,98 @@
-from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+import asyncio
+from abc import ABC
+from typing import Dict, Any, Optional, AsyncIterator
+from app.policies.enforcement.rule_engine import policy_engine
+from app.services.llm_service import llm_service
 
 class BaseAgent(ABC):
-    """Abstract base class for chatbot agents."""
+    """
+    Base class for chatbot agents.
 
-    def __init__(self, name: str):
-        self.name = name
+    Subclasses set `agent_type` (the LLM service's system prompt and the rules.yaml
+    section to enforce); requests are checked against the enforced policies and
+    then answered by the LLM. Agents that override only `handle_request` are run
+    in a worker thread by the async entry points.
+    """
+
+    agent_type: str = ""
+
+    # Agents whose prompt includes the recent conversation set this, so the pipeline loads the history for them
+    uses_history = False
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or self.agent_type
+
+    @staticmethod
+    def use_response_cache(context: Optional[Dict[str, Any]]) -> bool:
+        """Whether the LLM response cache may serve this request (False when the client sent a bypass header)."""
+        return not (context or {}).get("cache_bypass", False)
+
+    def check_policies(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns a canned response if a strictly enforced policy applies (see rules.yaml), otherwise None.
+
+        Reuses the outcome of the pipeline's enforce stage when the context carries one.
+        """
+        if context is not None and "policy_response" in context:
+            return context["policy_response"]
+        decision = policy_engine.evaluate(self.name, user_input)
+        if decision.rejected:
+            return {"agent": self.name, "response": decision.response}
+        return None
+
+    def llm_options(self, context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """LLM service arguments taken from the request context (policies, conversation, cache bypass, token report)."""
+        context = context or {}
+        return {
+            "policy_context": context.get("policy", "No specific policies applied."),
+            "history": context.get("history"),
+            "summary": context.get("summary"),
+            "use_cache": self.use_response_cache(context),
+            "report": context.get("prompt_tokens")
+        }
+
+    def _overrides(self, method: str) -> bool:
+        return getattr(type(self), method) is not getattr(BaseAgent, method)
 
-    @abstractmethod
     def handle_request(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a user request and return a structured response."""
-        pass
\ No newline at end of file
+        policy_response = self.check_policies(user_input, context)
+        if policy_response:
+            return policy_response
+
+        response_text = llm_service.generate_response(agent_type=self.agent_type, user_input=user_input, **self.llm_options(context))
+
+        return {"agent": self.name, "response": response_text}
+
+    async def ahandle_request(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Async variant of `handle_request` using the non-blocking LLM client."""
+        if self._overrides("handle_request"):
+            # A synchronous custom handler must not block the event loop
+            return await asyncio.to_thread(self.handle_request, user_input, context)
+
+        policy_response = self.check_policies(user_input, context)
+        if policy_response:
+            return policy_response
+
+        response_text = await llm_service.agenerate_response(agent_type=self.agent_type, user_input=user_input, **self.llm_options(context))
+
+        return {"agent": self.name, "response": response_text}
+
+    async def astream_request(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Streams the LLM response; policy short-circuits are yielded as a single chunk.
+
+        Agents with a custom handler yield its complete response as a single chunk.
+        """
+        if self._overrides("handle_request") or self._overrides("ahandle_request"):
+            response_data = await self.ahandle_request(user_input, context)
+            yield response_data.get("response", "No response provided.")
+            return
+
+        policy_response = self.check_policies(user_input, context)
+        if policy_response:
+            yield policy_response["response"]
+            return
+
+        async for token in llm_service.astream_response(agent_type=self.agent_type, user_input=user_input, **self.llm_options(context)):
+            yield token
@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+from fastapi import Header, HTTPException, Request
+from config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS, RATE_LIMIT_API_KEYS,
+    RATE_LIMIT_TRUSTED_PROXIES, ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_AGENT_LIMITS, ADMISSION_PRIORITIES, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_SLO_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+def rejection(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    """429/503 with a `Retry-After` header (whole seconds, at least 1)."""
+    return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class ClientIdentifier:
+    """
+    Rate-limit key of a request (a FastAPI dependency).
+
+    Requests with an `X-API-Key` from `api_keys` are keyed by that key; any
+    other key is ignored, so clients can't mint fresh buckets by sending random
+    ones. Everything else is keyed by the client address. When the direct peer
+    is one of `trusted_proxies` ("*" trusts any peer), the address is taken
+    from `X-Forwarded-For`: the rightmost entry that isn't a trusted proxy.
+    """
+
+    def __init__(self, api_keys: Iterable[str] = (), trusted_proxies: Iterable[str] = ()):
+        self.api_keys = set(api_keys)
+        self.trusted_proxies = set(trusted_proxies)
+
+    def _trusted(self, address: str) -> bool:
+        return "*" in self.trusted_proxies or address in self.trusted_proxies
+
+    def address(self, request: Request) -> str:
+        peer = request.client.host if request.client else "unknown"
+        forwarded = request.headers.get("x-forwarded-for")
+        if not forwarded or not self._trusted(peer):
+            return peer
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    def __call__(self, request: Request, x_api_key: Optional[str] = Header(None)) -> str:
+        if x_api_key and x_api_key in self.api_keys:
+            return f"key:{x_api_key}"
+        return f"ip:{self.address(request)}"
+
+class TokenBucket:
+    """Holds up to `burst` tokens and refills at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Takes `cost` tokens and returns 0, or returns the seconds until they are available (taking nothing)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+class RateLimiter:
+    """
+    Per-client token buckets.
+
+    Each client may send `burst` requests at once and `rate` per second after
+    that; a request over the limit gets a 429 with the time until it would be
+    allowed. A batch costs one token per item, capped at `burst` so a full
+    batch is never refused outright. Buckets of the least recently seen
+    clients are dropped beyond `max_clients` (they come back full).
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 20, max_clients: int = 10000, enabled: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.enabled = enabled
+        self.clock = clock
+
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client: str, cost: int = 1):
+        """Charges `cost` requests to `client`, or raises a 429 HTTPException."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+
+        wait = bucket.take(min(cost, self.burst), now)
+        if wait:
+            self.limited += 1
+            raise rejection(429, "Rate limit exceeded. Please slow down.", wait)
+        self.allowed += 1
+
+    def clear(self):
+        """Forgets every client's bucket."""
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited
+        }
+
+class Ticket:
+    """A granted slot; pass it back to `AdmissionController.release` (releasing twice is a no-op)."""
+
+    def __init__(self, agent: str, queued_seconds: float, started: float):
+        self.agent = agent
+        self.queued_seconds = queued_seconds
+        self.started = started
+        self.released = False
+
+class _Waiter:
+    def __init__(self, agent: str, priority: int, seq: int, future: asyncio.Future):
+        self.agent = agent
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+    @property
+    def rank(self):
+        return self.priority, self.seq
+
+class AdmissionController:
+    """
+    Caps the turns being answered at once and queues the rest by priority.
+
+    At most `max_in_flight` turns run at a time, and at most `agent_limits[agent]`
+    of one agent type, so one busy agent can't take every slot. Turns beyond
+    that wait in a queue of at most `max_queue` entries, served by agent
+    priority (lower first, e.g. `tech_support` before `sales`), then in arrival
+    order. A turn is rejected with a 503 and `Retry-After` right away instead
+    of queueing when its expected wait (turns ahead of it × the average turn
+    time ÷ slots) exceeds `slo_seconds`, and when it has waited `slo_seconds`
+    after all. When the queue is full, a newcomer displaces the newest waiter
+    of a lower priority (which gets the 503), or is rejected itself.
+    """
+
+    def __init__(self, max_in_flight: int = 64, agent_limits: Optional[Dict[str, int]] = None,
+                 priorities: Optional[Dict[str, int]] = None, max_queue: int = 128, slo_seconds: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.agent_limits = dict(agent_limits or {})
+        self.priorities = dict(priorities or {})
+        self.default_priority = max(self.priorities.values(), default=0) + 1  # Unlisted agents go last
+        self.max_queue = max_queue
+        self.slo_seconds = slo_seconds
+        self.clock = clock
+
+        self.in_flight = 0
+        self.agent_in_flight: Counter = Counter()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.avg_turn_seconds: Optional[float] = None  # Moving average of admitted turns' duration
+
+        self.admitted = 0
+        self.queued = 0
+        self.queue_seconds = 0.0
+        self.rejected: Counter = Counter()  # reason -> count
+
+    def priority(self, agent: str) -> int:
+        return self.priorities.get(agent, self.default_priority)
+
+    def limit(self, agent: str) -> int:
+        return min(self.max_in_flight, self.agent_limits.get(agent, self.max_in_flight))
+
+    def _can_run(self, agent: str) -> bool:
+        return self.in_flight < self.max_in_flight and self.agent_in_flight[agent] < self.limit(agent)
+
+    def _start(self, agent: str):
+        self.in_flight += 1
+        self.agent_in_flight[agent] += 1
+        self.admitted += 1
+
+    def expected_wait(self, agent: str) -> float:
+        """Seconds a new `agent` turn would likely queue (0 until a turn has completed)."""
+        if not self.avg_turn_seconds:
+            return 0.0
+        ahead = sum(1 for waiter in self._waiters if waiter.priority <= self.priority(agent))
+        return (ahead + 1) * self.avg_turn_seconds / self.limit(agent)
+
+    def _reject(self, reason: str, agent: str, retry_after: float) -> HTTPException:
+        self.rejected[reason] += 1
+        logger.warning(f"⚠️ Shedding {agent} turn ({reason})")
+        return rejection(503, "The service is busy. Please try again shortly.", retry_after)
+
+    async def acquire(self, agent: str) -> Ticket:
+        """Waits for a slot for an `agent` turn, or raises a 503 HTTPException."""
+        now = self.clock()
+        priority = self.priority(agent)
+        if self._can_run(agent):  # Waiters are only left queued while they can't run, so nobody is overtaken
+            self._start(agent)
+            return Ticket(agent, 0.0, now)
+
+        wait = self.expected_wait(agent)
+        if wait > self.slo_seconds:
+            raise self._reject("slo", agent, wait)
+        if len(self._waiters) >= self.max_queue:
+            victim = max(self._waiters, key=lambda waiter: waiter.rank)
+            if victim.priority <= priority:
+                raise self._reject("queue_full", agent, wait or self.slo_seconds)
+            self._waiters.remove(victim)
+            victim.future.set_exception(self._reject("shed", victim.agent, wait or self.slo_seconds))
+
+        waiter = _Waiter(agent, priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.slo_seconds)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                pass  # Granted just as the wait ran out
+            else:
+                self._remove(waiter)
+                raise self._reject("timeout", agent, self.expected_wait(agent) or self.slo_seconds)
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self._finish(agent)  # The slot was handed over, but the request is gone
+            else:
+                self._remove(waiter)
+            raise
+
+        waited = self.clock() - now
+        self.queue_seconds += waited
+        return Ticket(agent, waited, self.clock())
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    def _finish(self, agent: str):
+        self.in_flight -= 1
+        self.agent_in_flight[agent] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hands free slots to the best-ranked waiters whose agent is under its cap."""
+        while self._waiters:
+            ready = [waiter for waiter in self._waiters if self._can_run(waiter.agent)]
+            if not ready:
+                return
+            waiter = min(ready, key=lambda candidate: candidate.rank)
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                self._start(waiter.agent)
+                waiter.future.set_result(True)
+
+    def release(self, ticket: Ticket):
+        """Frees a ticket's slot and records how long the turn took."""
+        if ticket.released:
+            return
+        ticket.released = True
+        elapsed = self.clock() - ticket.started
+        self.avg_turn_seconds = elapsed if self.avg_turn_seconds is None else 0.8 * self.avg_turn_seconds + 0.2 * elapsed
+        self._finish(ticket.agent)
+
+    @asynccontextmanager
+    async def slot(self, agent: str):
+        """`async with` form of `acquire`/`release`."""
+        ticket = await self.acquire(agent)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        """Slots in use, queue length and rejections (by reason) for monitoring."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "agent_in_flight": {agent: count for agent, count in self.agent_in_flight.items() if count},
+            "queued_now": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_queue_ms": round(self.queue_seconds / self.queued * 1000, 3) if self.queued else 0.0,
+            "avg_turn_ms": round(self.avg_turn_seconds * 1000, 3) if self.avg_turn_seconds else 0.0,
+            "rejected": dict(self.rejected)
+        }
+
+client_key = ClientIdentifier(RATE_LIMIT_API_KEYS, RATE_LIMIT_TRUSTED_PROXIES)
+rate_limiter = RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS, RATE_LIMIT_ENABLED)
+admission_controller = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_AGENT_LIMITS, ADMISSION_PRIORITIES,
+                                           ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_SLO_SECONDS)
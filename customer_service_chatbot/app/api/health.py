@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Health"])
+
+class Warmup:
+    """
+    Startup work (migrations, policy index, clients) run in the background.
+
+    The app starts serving immediately; `/readyz` reports 503 until every step
+    has succeeded. Steps run in registration order on a worker thread, and a
+    failed step is retried the next time readiness is checked, so the app
+    becomes ready on its own once an unreachable dependency comes back.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, Callable[[], Any]] = {}
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_step(self, name: str, fn: Callable[[], Any]):
+        self.steps[name] = fn
+        self.state[name] = {"status": "pending"}
+
+    @property
+    def ready(self) -> bool:
+        return all(step["status"] == "ok" for step in self.state.values())
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> asyncio.Task:
+        """Starts (or retries) the steps that haven't succeeded yet, unless a run is in progress."""
+        if not self.running and not self.ready:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def cancel(self):
+        if self.running:
+            self._task.cancel()
+
+    async def _run(self):
+        for name, fn in self.steps.items():
+            if self.state[name]["status"] == "ok":
+                continue
+            self.state[name] = {"status": "running"}
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(fn)
+                self.state[name] = {"status": "ok", "seconds": round(time.perf_counter() - start, 3)}
+            except Exception as e:
+                self.state[name] = {"status": "failed", "seconds": round(time.perf_counter() - start, 3), "error": str(e)}
+                logger.error(f"❌ Warmup step '{name}' failed: {e}")
+                return  # Later steps may depend on this one; retried on the next readiness check
+        logger.info(f"✅ Warmup complete: {self.state}")
+
+warmup = Warmup()
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving (no dependency checks)."""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the warmup steps have succeeded, else 503 with each step's status."""
+    if warmup.ready:
+        return {"status": "ready", "steps": warmup.state}
+    warmup.start()
+    return JSONResponse(status_code=503, content={"status": "warming_up" if warmup.running else "not_ready", "steps": warmup.state})
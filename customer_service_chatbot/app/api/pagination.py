@@ -0,0 +1,48 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, true
+
+def encode_cursor(timestamp: datetime, key: Any) -> str:
+    """Opaque cursor for the row a page ended on: its `(timestamp, id)` sort key."""
+    raw = json.dumps([timestamp.isoformat(), key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], key_type: type) -> Optional[Tuple[datetime, Any]]:
+    """Parses a cursor from `encode_cursor` whose key must be a `key_type`; a malformed cursor is a 400."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        # Checked here so a wrong key type never reaches the database as a comparison (bool is not an int id)
+        if not isinstance(timestamp, str) or not isinstance(key, key_type) or isinstance(key, bool):
+            raise ValueError("cursor has the wrong shape")
+        return datetime.fromisoformat(timestamp), key
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def after_cursor(timestamp_column, key_column, cursor: Optional[Tuple[datetime, Any]], descending: bool = True):
+    """
+    Keyset predicate selecting rows strictly after `cursor` in `(timestamp, key)` order.
+
+    Unlike OFFSET, the database seeks straight to the cursor through the
+    timestamp index, so every page costs the same however deep it is.
+    """
+    if cursor is None:
+        return true()
+    timestamp, key = cursor
+    if descending:
+        return or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, key_column < key))
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, key_column > key))
+
+def page(rows: list, limit: int, cursor_of) -> Tuple[list, Optional[str]]:
+    """Splits `limit + 1` fetched rows into the page and the cursor of its last row (None on the last page)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app.agents.agent_factory import AgentFactory
+from app.services.prompt_builder import POLICY_SEPARATOR, POLICY_UNAVAILABLE
+from app.services.rag_service import PolicyRetrievalError
+from app.services.resilience import deadline_scope
+from config import PROMPT_HISTORY_MESSAGES, REQUEST_DEADLINE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+NO_POLICY = ["No relevant policy found."]
+
+class Turn:
+    """State of one conversation turn as it moves through the pipeline."""
+
+    def __init__(self, agent_type: str, conversation_id: str, user_input: str, cache_bypass: bool = False,
+                 retrieved_policies: Optional[list] = None):
+        self.agent_type = agent_type
+        self.conversation_id = conversation_id
+        self.user_input = user_input
+        self.cache_bypass = cache_bypass
+        self.retrieved_policies = retrieved_policies  # Pre-retrieved by the caller (e.g. a batch), else filled lazily
+        self.received_at = datetime.utcnow()
+        self.deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS  # Upstream calls of this turn must finish by then
+
+        self.agent = None
+        self.policy_response: Optional[Dict[str, Any]] = None  # Canned response from the enforce stage
+        self.context: Dict[str, Any] = {"cache_bypass": cache_bypass}
+        self.response_text: Optional[str] = None
+        self.policy_error: Optional[str] = None  # Set when policies couldn't be retrieved
+        self.timings: Dict[str, float] = {}  # stage -> seconds
+
+    @property
+    def rejected(self) -> bool:
+        return self.policy_response is not None
+
+    @property
+    def policies(self) -> List[str]:
+        """Retrieved policies as reported to the client (empty when retrieval failed)."""
+        if self.policy_error is not None:
+            return []
+        return self.retrieved_policies or NO_POLICY
+
+    @property
+    def prompt_tokens(self) -> Optional[dict]:
+        """Token breakdown of the prompt sent to the model (None for rejected turns)."""
+        return self.context.get("prompt_tokens") or None
+
+    def start(self):
+        """Starts the turn's clock once it holds an admission slot, so time spent queued doesn't count against its deadline."""
+        self.received_at = datetime.utcnow()
+        self.deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Milliseconds per completed stage."""
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.timings.items()}
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value (milliseconds per completed stage)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.timings.items())
+
+class TurnPipeline:
+    """
+    Runs conversation turns as explicit stages: validate → enforce → retrieve → generate → persist.
+
+    Enforcement runs before anything touches the network, so a turn rejected
+    by a policy rule skips retrieval and generation and only pays for the
+    rules pass (and persisting the canned reply). Retrieval runs only for
+    turns that reach generation, and history is loaded only for agents whose
+    prompt uses it. With `summaries`, long conversations also get the rolling
+    summary of their older messages, and each stored turn schedules a
+    background update of it. Upstream calls made by retrieval and generation
+    share the turn's deadline (`REQUEST_DEADLINE_SECONDS`). Every stage is timed
+    per turn (`Turn.timings`) and in aggregate (`stats`).
+    """
+
+    STAGES = ("validate", "enforce", "retrieve", "generate", "persist")
+
+    def __init__(self, retriever, conversations, history_messages: int = PROMPT_HISTORY_MESSAGES, summaries=None):
+        self.retriever = retriever
+        self.conversations = conversations
+        self.history_messages = history_messages
+        self.summaries = summaries
+
+        self._stage_stats = {stage: [0, 0.0, 0.0] for stage in self.STAGES}  # count, total, max seconds
+        self.outcomes = Counter()
+
+    def _record(self, turn: Turn, name: str, elapsed: float):
+        turn.timings[name] = elapsed
+        stats = self._stage_stats[name]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    @contextmanager
+    def stage(self, turn: Turn, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(turn, name, time.perf_counter() - start)
+
+    async def admit(self, turn: Turn):
+        """Validate and enforce: raises HTTPException for invalid turns, records policy rejections."""
+        with self.stage(turn, "validate"):
+            if not turn.user_input.strip():
+                raise HTTPException(status_code=400, detail="User input cannot be empty.")
+            try:
+                turn.agent = AgentFactory.get_agent(turn.agent_type)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        with self.stage(turn, "enforce"):
+            turn.policy_response = turn.agent.check_policies(turn.user_input)
+            turn.context["policy_response"] = turn.policy_response  # Agents reuse it instead of re-checking
+
+    async def _policies(self, turn: Turn) -> Optional[list]:
+        try:
+            return await self.retriever.aretrieve_policy(turn.user_input)
+        except PolicyRetrievalError as e:
+            turn.policy_error = str(e)  # The turn is still answered, without policies (see `POLICY_UNAVAILABLE`)
+            self.outcomes["policy_unavailable"] += 1
+            return None
+
+    async def retrieve(self, turn: Turn):
+        """Retrieves policies (unless pre-retrieved) and, for agents that use it, the recent history."""
+        if turn.rejected:
+            return
+
+        with self.stage(turn, "retrieve"), deadline_scope(turn.deadline):
+            policies = None if turn.retrieved_policies is not None else self._policies(turn)
+            history = self.conversations.aget_last_n_messages(turn.conversation_id, n=self.history_messages) if turn.agent.uses_history else None
+            fetched = await asyncio.gather(*(job for job in (policies, history) if job is not None))
+
+            if policies is not None:
+                turn.retrieved_policies = fetched.pop(0)
+            if history is not None:
+                turn.context["history"] = list(fetched.pop(0))  # Oldest first; the prompt builder keeps what fits
+                # Only a conversation longer than the window can have a summary
+                if self.summaries is not None and len(turn.context["history"]) >= self.history_messages:
+                    turn.context["summary"] = await self.summaries.aget(turn.conversation_id)
+            if turn.policy_error is not None:
+                turn.context["policy"] = POLICY_UNAVAILABLE
+            else:
+                turn.context["policy"] = POLICY_SEPARATOR.join(turn.retrieved_policies) if turn.retrieved_policies else NO_POLICY[0]
+            turn.context["prompt_tokens"] = {}  # Filled by the LLM service when it builds the prompt
+
+    async def prepare(self, turn: Turn) -> Turn:
+        """Runs the stages before generation (used as-is by the streaming endpoints)."""
+        await self.admit(turn)
+        await self.retrieve(turn)
+        return turn
+
+    async def generate(self, turn: Turn):
+        if turn.rejected:
+            turn.response_text = turn.policy_response["response"]
+            return
+
+        with self.stage(turn, "generate"), deadline_scope(turn.deadline):
+            try:
+                response_data = await turn.agent.ahandle_request(turn.user_input, context=turn.context)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)}")
+
+        # ✅ Ensure response is a string
+        turn.response_text = response_data.get("response", "No response provided.") if isinstance(response_data, dict) else str(response_data)
+
+    async def persist(self, turn: Turn):
+        """Stores the user message & bot response (one transaction, or queued with write-behind)."""
+        with self.stage(turn, "persist"):
+            await self.conversations.aadd_turn(turn.conversation_id, turn.user_input, turn.response_text,
+                                               user_timestamp=turn.received_at, bot_timestamp=datetime.utcnow(),
+                                               agent=turn.agent_type)
+        # ✅ Fold messages pushed out of the window by this turn into the summary, off the request path
+        if self.summaries is not None and len(turn.context.get("history", ())) + 2 > self.history_messages:
+            self.summaries.schedule(turn.conversation_id)
+        self.outcomes["rejected" if turn.rejected else "generated"] += 1
+
+    async def complete(self, turn: Turn) -> Turn:
+        """Runs the remaining stages of an admitted turn."""
+        turn.start()
+        await self.retrieve(turn)
+        await self.generate(turn)
+        await self.persist(turn)
+        return turn
+
+    async def run(self, turn: Turn) -> Turn:
+        """Runs every stage of one turn."""
+        await self.admit(turn)
+        return await self.complete(turn)
+
+    async def stream(self, turn: Turn) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streams a prepared turn as events and persists it once the stream completes.
+
+        Yields `("token", {...})` for every chunk, then a single `("done", {...})` event
+        carrying the full response and the stage timings (or `("error", {...})` if the
+        agent fails mid-stream). The generate stage only counts time spent waiting
+        for the agent, not time the client takes to read the tokens.
+        """
+        chunks = []
+        if turn.rejected:
+            chunks.append(turn.policy_response["response"])
+            yield "token", {"content": chunks[0]}
+        else:
+            generating = 0.0
+            try:
+                tokens = turn.agent.astream_request(turn.user_input, context=turn.context)
+                while True:
+                    start = time.perf_counter()
+                    # The deadline is set per chunk: a context variable can't stay set across this generator's yields
+                    with deadline_scope(turn.deadline):
+                        try:
+                            token = await tokens.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            generating += time.perf_counter() - start
+                    chunks.append(token)
+                    yield "token", {"content": token}
+            except Exception as e:
+                logger.error(f"❌ Streaming error: {e}")
+                yield "error", {"detail": f"Agent processing error: {str(e)}"}
+                return
+            finally:
+                self._record(turn, "generate", generating)
+
+        turn.response_text = "".join(chunks) or "No response provided."
+        await self.persist(turn)
+
+        yield "done", {
+            "conversation_id": turn.conversation_id,
+            "agent": turn.agent_type,
+            "agent_response": turn.response_text,
+            "retrieved_policies": turn.policies,
+            "prompt_tokens": turn.prompt_tokens,
+            "timings_ms": turn.timings_ms()
+        }
+
+    def stats(self) -> dict:
+        """Per-stage latency and turn outcomes for monitoring."""
+        stages = {
+            stage: {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+                "max_ms": round(longest * 1000, 3)
+            }
+            for stage, (count, total, longest) in self._stage_stats.items()
+        }
+        return {"stages": stages, **{outcome: self.outcomes[outcome] for outcome in ("generated", "rejected", "policy_unavailable")}}
@@ -1,16 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from pydantic import BaseModel
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.agents.agent_factory import AgentFactory
-from app.services.rag_service import RAGPolicyRetriever
+from app.api.admission import admission_controller, client_key, rate_limiter
+from app.api.pipeline import Turn, TurnPipeline
+from app.services.rag_service import PolicyRetrievalError, RAGPolicyRetriever
 from app.services.conversation_service import conversation_service
-from app.models.database import SessionLocal 
-from app.models.conversation import Conversation  
-from typing import Optional
+from app.services.llm_service import llm_service
+from app.services.openai_clients import embeddings_upstream, upstream_stats
+from app.services.summary_service import conversation_summarizer
+from app.policies.enforcement.rule_engine import policy_engine
+from app.models.database import get_db, get_session_factory, session_scope
+from app.api.pagination import after_cursor, decode_cursor, encode_cursor, page
+from app.models.conversation import Conversation, ConversationSummary
+from typing import List, Optional
+from config import EXPORT_BATCH_SIZE, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 rag_retriever = RAGPolicyRetriever()
+pipeline = TurnPipeline(rag_retriever, conversation_service, summaries=conversation_summarizer)
 
 # ✅ Request Models
 class UserInput(BaseModel):
@@ -20,60 +37,120 @@ class UserInput(BaseModel):
 class PolicyQuery(BaseModel):
     query: str
 
-# ✅ Dependency for Database Session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class BatchItem(BaseModel):
+    conversation_id: str
+    agent_type: str
+    user_input: str
 
-@router.post("/conversation/{agent_type}")
-async def handle_conversation(agent_type: str, request_body: UserInput):
-    """Routes user input to the appropriate agent and returns a structured response."""
-    try:
-        # ✅ Validate user input
-        if not request_body.user_input.strip():
-            raise HTTPException(status_code=400, detail="User input cannot be empty.")
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    max_concurrency: Optional[int] = None
 
-        # ✅ Fetch correct agent & validate its existence
-        try:
-            agent = AgentFactory.get_agent(agent_type)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+def cache_bypass_requested(x_cache_bypass: Optional[str], cache_control: Optional[str]) -> bool:
+    """Clients skip the LLM response cache with `X-Cache-Bypass: true` or `Cache-Control: no-cache`."""
+    return (x_cache_bypass or "").strip().lower() in ("1", "true", "yes") or "no-cache" in (cache_control or "").lower()
 
-        # ✅ Retrieve last 5 messages from conversation history
-        conversation_history = conversation_service.get_last_n_messages(request_body.conversation_id, n=5)
+def new_turn(agent_type: str, request_body: UserInput, cache_bypass: bool = False, retrieved_policies: Optional[list] = None) -> Turn:
+    return Turn(agent_type, request_body.conversation_id, request_body.user_input, cache_bypass, retrieved_policies)
 
-        # ✅ Format chat history into context
-        history_context = "\n".join([f"{msg.sender}: {msg.content}" for msg in conversation_history]) if conversation_history else "No previous messages."
+# 🔹 Declared before `/conversation/{agent_type}` so "batch" isn't taken for an agent type
+@router.post("/conversation/batch")
+async def handle_conversation_batch(request_body: BatchRequest, x_cache_bypass: Optional[str] = Header(None),
+                                    cache_control: Optional[str] = Header(None), client: str = Depends(client_key)):
+    """
+    Processes many conversation turns in one request.
 
-        # ✅ Retrieve relevant policies using RAG
-        retrieved_policies = rag_retriever.retrieve_policy(request_body.user_input)
-        policy_context = "\n".join(retrieved_policies) if retrieved_policies else "No relevant policy found."
+    Every item is validated and checked against the enforced policies first;
+    policies for the items that pass are then retrieved with batched embedding calls.
+    Different conversations then run concurrently (at most `max_concurrency`
+    turns at a time), while the turns of one conversation run in request order
+    so each sees the previous one in its history. Every item gets its own
+    result or error. Each item counts against the client's rate limit and
+    waits for an admission slot like a single turn.
+    """
+    items = request_body.items
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items.")
+    rate_limiter.check(client, cost=len(items))
+    cache_bypass = cache_bypass_requested(x_cache_bypass, cache_control)
+    concurrency = max(1, min(request_body.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
 
-        # ✅ Generate agent response (Handle OpenAI API failures)
+    # ✅ Validate & enforce every item first: rejected or invalid items never reach retrieval
+    turns = [new_turn(item.agent_type, UserInput(conversation_id=item.conversation_id, user_input=item.user_input), cache_bypass)
+             for item in items]
+    errors = {}
+    for index, turn in enumerate(turns):
         try:
-            response_data = agent.handle_request(
-                request_body.user_input, 
-                context={"history": history_context, "policy": policy_context}
-            )
+            await pipeline.admit(turn)
+        except HTTPException as e:
+            errors[index] = e
+
+    # ✅ One embeddings call per chunk of queries instead of one per item
+    retrievable = [turn for index, turn in enumerate(turns) if index not in errors and not turn.rejected]
+    if retrievable:
+        try:
+            retrieved = await rag_retriever.aretrieve_policies([turn.user_input for turn in retrievable])
+        except PolicyRetrievalError:
+            retrieved = [None] * len(retrievable)  # Each turn retries on its own and answers without policies if that fails too
+        for turn, policies in zip(retrievable, retrieved):
+            turn.retrieved_policies = policies
+
+    results = [None] * len(items)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int):
+        item, turn = items[index], turns[index]
+        result = {"index": index, "conversation_id": item.conversation_id, "agent": item.agent_type}
+        try:
+            if index in errors:
+                raise errors[index]
+            async with semaphore, admission_controller.slot(turn.agent_type):
+                await pipeline.complete(turn)
+            result.update(status="ok", agent_response=turn.response_text, retrieved_policies=turn.policies,
+                          prompt_tokens=turn.prompt_tokens)
+        except HTTPException as e:
+            result.update(status="error", status_code=e.status_code, detail=e.detail)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)}")
+            result.update(status="error", status_code=500, detail=f"Unexpected Server Error: {str(e)}")
+        results[index] = result
+
+    async def run_conversation(indexes: List[int]):
+        for index in indexes:
+            await run_item(index)
 
-        # ✅ Ensure response is a string
-        response_text = response_data.get("response", "No response provided.") if isinstance(response_data, dict) else str(response_data)
+    conversations = {}
+    for index, item in enumerate(items):
+        conversations.setdefault(item.conversation_id, []).append(index)
+    await asyncio.gather(*(run_conversation(indexes) for indexes in conversations.values()))
 
-        # ✅ Store user message & bot response in conversation history
-        conversation_service.add_message(request_body.conversation_id, "user", request_body.user_input, datetime.utcnow())
-        conversation_service.add_message(request_body.conversation_id, "bot", response_text, datetime.utcnow())
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
 
+@router.post("/conversation/{agent_type}")
+async def handle_conversation(agent_type: str, request_body: UserInput, response: Response,
+                              x_cache_bypass: Optional[str] = Header(None), cache_control: Optional[str] = Header(None),
+                              client: str = Depends(client_key)):
+    """
+    Routes user input to the appropriate agent and returns a structured response (stage timings in `Server-Timing`).
+
+    Answers 429 over the client's rate limit and 503 when the agent's queue is
+    too long to answer in time, both with `Retry-After`.
+    """
+    rate_limiter.check(client)
+    turn = new_turn(agent_type, request_body, cache_bypass_requested(x_cache_bypass, cache_control))
+    try:
+        await pipeline.admit(turn)
+        async with admission_controller.slot(agent_type):
+            await pipeline.complete(turn)
+
+        response.headers["Server-Timing"] = turn.server_timing()
         return {
             "conversation_id": request_body.conversation_id,
             "agent": agent_type,
-            "agent_response": response_text,
-            "retrieved_policies": retrieved_policies if retrieved_policies else ["No relevant policy found."],
-            "history": conversation_service.get_last_n_messages(request_body.conversation_id, n=5)
+            "agent_response": turn.response_text,
+            "retrieved_policies": turn.policies,
+            "prompt_tokens": turn.prompt_tokens,
+            "history": await conversation_service.aget_last_n_messages(request_body.conversation_id, n=5)
         }
 
     except HTTPException:
@@ -81,64 +158,230 @@ async def handle_conversation(agent_type: str, request_body: UserInput):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected Server Error: {str(e)}")
 
+@router.post("/conversation/{agent_type}/stream")
+async def stream_conversation(agent_type: str, request_body: UserInput,
+                              x_cache_bypass: Optional[str] = Header(None), cache_control: Optional[str] = Header(None),
+                              client: str = Depends(client_key)):
+    """
+    Same as `/conversation/{agent_type}`, but streams the response as Server-Sent Events.
+
+    The admission slot is held until the stream ends. Stage timings arrive in
+    the final `done` event (`timings_ms`), since a header is sent before generation.
+    """
+    rate_limiter.check(client)
+    turn = new_turn(agent_type, request_body, cache_bypass_requested(x_cache_bypass, cache_control))
+    await pipeline.admit(turn)
+    ticket = await admission_controller.acquire(agent_type)
+    turn.start()
+    try:
+        await pipeline.retrieve(turn)
+    except BaseException:
+        admission_controller.release(ticket)
+        raise
+
+    async def event_stream():
+        async for event, data in pipeline.stream(turn):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(admission_controller.release, ticket)  # Runs after the stream, even if the client left
+    )
+
+@router.websocket("/conversation/{agent_type}/ws")
+async def conversation_websocket(websocket: WebSocket, agent_type: str):
+    """
+    Streams conversation turns over a WebSocket.
+
+    Each client message is a `UserInput` JSON object; the server answers with
+    `{"event": "token", ...}` messages followed by a `{"event": "done", ...}` message.
+    """
+    await websocket.accept()
+    cache_bypass = cache_bypass_requested(websocket.headers.get("x-cache-bypass"), websocket.headers.get("cache-control"))
+    client = client_key(websocket, websocket.headers.get("x-api-key"))
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                rate_limiter.check(client)
+                turn = new_turn(agent_type, UserInput(**payload), cache_bypass)
+                await pipeline.admit(turn)
+                ticket = await admission_controller.acquire(agent_type)
+            except HTTPException as e:
+                retry_after = (e.headers or {}).get("Retry-After")
+                await websocket.send_json({"event": "error", "detail": e.detail, **({"retry_after": int(retry_after)} if retry_after else {})})
+                continue
+            except (TypeError, ValidationError) as e:
+                await websocket.send_json({"event": "error", "detail": str(e)})
+                continue
+
+            turn.start()
+            try:
+                try:
+                    await pipeline.retrieve(turn)
+                except HTTPException as e:
+                    await websocket.send_json({"event": "error", "detail": e.detail})
+                    continue
+                async for event, data in pipeline.stream(turn):
+                    await websocket.send_json(jsonable_encoder({"event": event, **data}))
+            finally:
+                admission_controller.release(ticket)
+    except WebSocketDisconnect:
+        logger.info(f"🔌 WebSocket closed for agent '{agent_type}'")
+
 @router.post("/retrieve_policy")
-async def retrieve_policy(request: PolicyQuery):
+async def retrieve_policy(request: PolicyQuery, client: str = Depends(client_key)):
     """Retrieve the most relevant policy based on user query."""
+    rate_limiter.check(client)
     try:
         if not request.query.strip():
             raise HTTPException(status_code=400, detail="Policy query cannot be empty.")
 
-        policies = rag_retriever.retrieve_policy(request.query)
+        policies = await rag_retriever.aretrieve_policy(request.query)
         return {
             "query": request.query,
             "retrieved_policies": policies if policies else ["No relevant policy found."]
         }
+    except HTTPException:
+        raise
+    except PolicyRetrievalError as e:
+        retry_after = max(1, round(embeddings_upstream.breaker.retry_after()))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected Server Error: {str(e)}")
 
+@router.post("/admin/policies/reload")
+async def reload_policies():
+    """Re-ingests app/policies/retrievable/ (embedding only changed chunks) and recompiles the enforced rules, without a restart."""
+    try:
+        stats = await asyncio.to_thread(rag_retriever.reload_policies)
+        rules = await asyncio.to_thread(policy_engine.reload)
+        return {"message": "Policies reloaded.", **stats, "rules": rules}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Policy reload failed: {str(e)}")
+
 ### 🔹 **New Endpoints Added Below**
+# 🔹 Plain `def` endpoints: FastAPI runs them in its threadpool, so blocking DB calls don't stall the event loop
 @router.get("/conversation/latest")
-async def get_latest_conversation(db: Session = Depends(get_db)):
-    """Returns the latest full conversation."""
-    latest_message = (
-        db.query(Conversation.conversation_id)
-        .order_by(Conversation.timestamp.desc())
-        .first()
-    )
-    if not latest_message:
-        return {"message": "No conversations found."}
+def get_latest_conversation(conversation_id: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000),
+                            cursor: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """
+    Returns the latest conversation (or `conversation_id`), one page of messages at a time.
+
+    Messages are in chronological order; pass `conversation_id` and `next_cursor`
+    from the previous page to continue.
+    """
+    if conversation_id is None:
+        latest = (
+            db.query(ConversationSummary.conversation_id)
+            .order_by(ConversationSummary.last_timestamp.desc())
+            .first()
+        )
+        if not latest:
+            return {"message": "No conversations found."}
+        conversation_id = latest.conversation_id
 
-    conversation_id = latest_message.conversation_id
     messages = (
-        db.query(Conversation.sender, Conversation.content, Conversation.timestamp)
+        db.query(Conversation.id, Conversation.sender, Conversation.content, Conversation.timestamp)
         .filter(Conversation.conversation_id == conversation_id)
-        .order_by(Conversation.timestamp.asc())
+        .filter(after_cursor(Conversation.timestamp, Conversation.id, decode_cursor(cursor, int), descending=False))
+        .order_by(Conversation.timestamp.asc(), Conversation.id.asc())
+        .limit(limit + 1)
         .all()
     )
+    messages, next_cursor = page(messages, limit, lambda msg: encode_cursor(msg.timestamp, msg.id))
 
     return {
         "conversation_id": conversation_id,
-        "messages": [{"sender": msg[0], "content": msg[1], "timestamp": msg[2]} for msg in messages]
+        "messages": [{"sender": msg.sender, "content": msg.content, "timestamp": msg.timestamp} for msg in messages],
+        "next_cursor": next_cursor
     }
 
-@router.delete("/conversation/{conversation_id}")
-async def delete_conversation(conversation_id: str, db: Session = Depends(get_db)):
-    """Deletes all messages from a specific conversation."""
+def delete_rows(db: Session, conversation_id: str) -> int:
     deleted_rows = db.query(Conversation).filter(Conversation.conversation_id == conversation_id).delete()
+    db.query(ConversationSummary).filter(ConversationSummary.conversation_id == conversation_id).delete()
     db.commit()
+    return deleted_rows
+
+@router.delete("/conversation/{conversation_id}")
+async def delete_conversation(conversation_id: str, db: Session = Depends(get_db)):
+    """Deletes all messages from a specific conversation, including turns still queued for write-behind."""
+    await conversation_service.adiscard_queued(conversation_id)
+    deleted_rows = await asyncio.to_thread(delete_rows, db, conversation_id)
+    conversation_service.invalidate_history(conversation_id)
+    conversation_summarizer.invalidate(conversation_id)
     if deleted_rows:
         return {"message": f"Conversation {conversation_id} deleted."}
     else:
         raise HTTPException(status_code=404, detail="Conversation not found.")
 
 @router.get("/conversations/filter")
-async def filter_conversations(agent_type: Optional[str] = Query(None), db: Session = Depends(get_db)):
-    """Filters messages by agent type."""
+def filter_conversations(agent_type: Optional[str] = Query(None), limit: int = Query(10, ge=1, le=1000),
+                         cursor: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """Filters messages by agent type, newest first; pass `next_cursor` back as `cursor` for the next page."""
     query = db.query(Conversation)
 
     if agent_type:
         query = query.filter(Conversation.sender == agent_type)
 
-    messages = query.order_by(Conversation.timestamp.desc()).limit(10).all()
+    messages = (
+        query.filter(after_cursor(Conversation.timestamp, Conversation.id, decode_cursor(cursor, int)))
+        .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    messages, next_cursor = page(messages, limit, lambda msg: encode_cursor(msg.timestamp, msg.id))
+
+    return {
+        "filtered_messages": [{"sender": msg.sender, "content": msg.content, "timestamp": msg.timestamp} for msg in messages],
+        "next_cursor": next_cursor
+    }
 
-    return {"filtered_messages": [{"sender": msg.sender, "content": msg.content, "timestamp": msg.timestamp} for msg in messages]}
\ No newline at end of file
+@router.get("/conversations/export")
+def export_conversations(conversation_id: Optional[str] = Query(None), since: Optional[datetime] = Query(None),
+                         until: Optional[datetime] = Query(None), session_factory=Depends(get_session_factory)):
+    """
+    Streams messages as NDJSON (one JSON object per line) in `(timestamp, id)` order.
+
+    Rows are read from a server-side cursor in batches of `EXPORT_BATCH_SIZE`,
+    so memory stays flat however many messages match.
+    """
+    query = select(Conversation.id, Conversation.conversation_id, Conversation.sender, Conversation.content, Conversation.timestamp)
+    if conversation_id:
+        query = query.where(Conversation.conversation_id == conversation_id)
+    if since:
+        query = query.where(Conversation.timestamp >= since)
+    if until:
+        query = query.where(Conversation.timestamp < until)
+    query = query.order_by(Conversation.timestamp.asc(), Conversation.id.asc()).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    def rows():
+        # The session lives as long as the stream, not the request handler
+        with session_scope(session_factory) as session:
+            for row in session.execute(query):
+                yield json.dumps({**row._asdict(), "timestamp": row.timestamp.isoformat()}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+@router.get("/metrics")
+async def get_metrics():
+    """Returns cache and performance counters for monitoring."""
+    return {
+        "embedding_cache": rag_retriever.embedding_cache.stats(),
+        "response_cache": llm_service.response_cache.stats(),
+        "embedding_single_flight": rag_retriever.embedding_flight.stats(),
+        "embedding_micro_batch": rag_retriever.embedding_batcher.stats() if rag_retriever.embedding_batcher else None,
+        "completion_single_flight": llm_service.completion_flight.stats(),
+        "conversation_write_behind": conversation_service.write_behind.stats() if conversation_service.write_behind else None,
+        "history_cache": conversation_service.history_cache.stats() if conversation_service.history_cache else None,
+        "policy_rules": policy_engine.stats(),
+        "pipeline": pipeline.stats(),
+        "conversation_summaries": conversation_summarizer.stats(),
+        "prompt_budget": llm_service.prompt_builder.stats(),
+        "model_cascade": llm_service.cascade_stats(),
+        "upstream": upstream_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "admission": admission_controller.stats()
+    }
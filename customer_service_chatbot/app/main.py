@@ -1,64 +1,124 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from app.api.routes import router
-from app.models.database import SessionLocal, init_db  # ✅ Import init_db
-from app.models.conversation import Conversation
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Depends, Query
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select
+from app.api.routes import router, rag_retriever
+from app.api.health import router as health_router, warmup
+from app.api.pagination import after_cursor, decode_cursor, encode_cursor, page
+from app.models.database import get_db, init_db  # ✅ Import init_db
+from app.models.conversation import Conversation, ConversationSummary
+from app.services.conversation_service import conversation_service
+from app.services.llm_service import llm_service
+from app.services.summary_service import conversation_summarizer
+from app.policies.enforcement.rule_engine import policy_engine
+from config import POLICY_HOT_RELOAD, STARTUP_WAIT_FOR_WARMUP
+
+logger = logging.getLogger(__name__)
+
+# ✅ Warmup steps, run in order in the background at startup (progress reported by /readyz)
+warmup.add_step("database", init_db)  # Alembic migrations
+warmup.add_step("policy_rules", policy_engine.reload)
+
+def sync_policy_index():
+    """Opens the vector store and embeds only new or changed policy chunks."""
+    stats = rag_retriever.ensure_index()
+    if stats.get("error"):
+        raise RuntimeError(stats["error"])
+
+warmup.add_step("policy_index", sync_policy_index)
+warmup.add_step("llm_clients", lambda: (llm_service.client, llm_service.async_client))
+warmup.add_step("tokenizer", llm_service.warm_prompts)  # tiktoken encodings + system prompt token counts
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts background work on startup and drains it on shutdown."""
+    warmup.start()
+    if STARTUP_WAIT_FOR_WARMUP:
+        await warmup.wait()
+
+    # ✅ Optionally watch the policy directory and rules file and hot-reload changes
+    policy_watchers = []
+    if POLICY_HOT_RELOAD:
+        policy_watchers.append(asyncio.create_task(rag_retriever.awatch_policies()))
+        policy_watchers.append(asyncio.create_task(policy_engine.awatch_rules()))
+
+    # ✅ Batched write-behind for conversation turns (WRITE_BEHIND_ENABLED)
+    if conversation_service.write_behind:
+        conversation_service.write_behind.start()
+
+    yield
+
+    warmup.cancel()
+    for watcher in policy_watchers:
+        watcher.cancel()
+    await conversation_summarizer.stop()
+    if conversation_service.write_behind:
+        await conversation_service.write_behind.stop()  # Flushes queued conversation turns before the app exits
 
 app = FastAPI(
     title="Customer Service Chatbot API",
     description="API for handling customer service requests with specialized agents.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# ✅ Initialize Database on Startup
-@app.on_event("startup")
-def startup_event():
-    """Ensure the database tables are created before the app starts."""
-    init_db()
-
 app.include_router(router)
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+app.include_router(health_router)
 
 @app.get("/", tags=["Conversations"])
-async def root(db: Session = Depends(get_db)):
-    """Returns the 5 latest conversations with messages."""
+def root(limit: int = Query(5, ge=1, le=100), messages: int = Query(10, ge=1, le=100), cursor: Optional[str] = Query(None),
+         db: Session = Depends(get_db)):
+    """
+    Returns the latest conversations with their most recent messages.
 
-    # ✅ Fetch latest 5 distinct conversations
-    latest_conversation_ids = (
-        db.query(Conversation.conversation_id)
-        .distinct(Conversation.conversation_id)
-        .order_by(Conversation.conversation_id, desc(Conversation.timestamp))
-        .limit(5)
-        .all()
+    A single query: the `limit` newest conversations are a keyset read of the
+    indexed `conversation_summaries` table, and each one's last `messages`
+    messages come from the `(conversation_id, timestamp DESC)` index, so the
+    cost doesn't grow with the size of the `conversations` table. Pass
+    `next_cursor` back as `cursor` for older conversations.
+    """
+    latest = (
+        select(ConversationSummary)
+        .where(after_cursor(ConversationSummary.last_timestamp, ConversationSummary.conversation_id, decode_cursor(cursor, str)))
+        .order_by(ConversationSummary.last_timestamp.desc(), ConversationSummary.conversation_id.desc())
+        .limit(limit + 1)
+        .cte("latest")
     )
-
-    conversation_ids = [row[0] for row in latest_conversation_ids]
-
-    # ✅ Fetch all messages for these conversations
-    conversations = []
-    for conversation_id in conversation_ids:
-        messages = (
-            db.query(Conversation.sender, Conversation.content, Conversation.timestamp)
-            .filter(Conversation.conversation_id == conversation_id)
-            .order_by(Conversation.timestamp.asc())  # Chronological order
-            .all()
+    recent = aliased(Conversation)
+    recent_ids = (
+        select(recent.id)
+        .where(recent.conversation_id == latest.c.conversation_id)
+        .order_by(recent.timestamp.desc())
+        .limit(messages)
+        .correlate(latest)
+    )
+    rows = db.execute(
+        select(
+            latest.c.conversation_id, latest.c.agent, latest.c.last_timestamp, latest.c.message_count,
+            Conversation.sender, Conversation.content, Conversation.timestamp
         )
+        .select_from(latest)
+        .join(Conversation, Conversation.id.in_(recent_ids))
+        .order_by(latest.c.last_timestamp.desc(), latest.c.conversation_id.desc(), Conversation.timestamp.asc())
+    ).all()
 
-        conversations.append({
-            "conversation_id": conversation_id,
-            "latest_timestamp": messages[-1][2] if messages else None,
-            "messages": [{"sender": msg[0], "content": msg[1], "timestamp": msg[2]} for msg in messages]
+    # ✅ Rows arrive grouped by conversation (latest first), messages in chronological order
+    conversations = {}
+    for row in rows:
+        conversation = conversations.setdefault(row.conversation_id, {
+            "conversation_id": row.conversation_id,
+            "agent": row.agent,
+            "latest_timestamp": row.last_timestamp,
+            "message_count": row.message_count,
+            "messages": []
         })
+        conversation["messages"].append({"sender": row.sender, "content": row.content, "timestamp": row.timestamp})
 
-    # ✅ Sort conversations by latest message timestamp (descending)
-    sorted_conversations = sorted(conversations, key=lambda x: x["latest_timestamp"], reverse=True)
-
-    return {"latest_conversations": sorted_conversations}
\ No newline at end of file
+    latest_conversations, next_cursor = page(
+        list(conversations.values()), limit,
+        lambda conversation: encode_cursor(conversation["latest_timestamp"], conversation["conversation_id"])
+    )
+    return {"latest_conversations": latest_conversations, "next_cursor": next_cursor}
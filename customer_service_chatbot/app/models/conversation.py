@@ -1,15 +1,30 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func, create_engine
-from app.models.database import Base, engine
+from sqlalchemy import Column, Index, Integer, String, Text, TIMESTAMP, func
+from app.models.database import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
 
     id = Column(Integer, primary_key=True, autoincrement=True)  
-    conversation_id = Column(String(255), nullable=False, index=True) 
+    conversation_id = Column(String(255), nullable=False)
     sender = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
     timestamp = Column(TIMESTAMP, default=func.now(), nullable=False)
 
-# ✅ Initialize DB here as this is where `Conversation` is defined)
-def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# ✅ Hot queries read newest-first: a conversation's last N messages, and the newest messages overall
+# (schema changes go through Alembic: see migrations/)
+Index("ix_conversations_conversation_id_timestamp", Conversation.conversation_id, Conversation.timestamp.desc())
+Index("ix_conversations_timestamp", Conversation.timestamp.desc())
+
+class ConversationSummary(Base):
+    """One row per conversation, maintained on every write so listings never scan `conversations`."""
+    __tablename__ = "conversation_summaries"
+
+    conversation_id = Column(String(255), primary_key=True)
+    agent = Column(String(255), nullable=True)
+    last_timestamp = Column(TIMESTAMP, nullable=False, index=True)
+    message_count = Column(Integer, nullable=False, default=0)
+
+    # ✅ Rolling summary of the messages older than the recent window sent verbatim (see app/services/summary_service.py)
+    summary = Column(Text, nullable=True)
+    summarized_through = Column(TIMESTAMP, nullable=True)  # Timestamp of the newest message folded into `summary`
+    summarized_messages = Column(Integer, nullable=False, default=0, server_default="0")
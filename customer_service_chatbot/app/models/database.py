@@ -1,13 +1,81 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
 import config
 
 Base = declarative_base()
-engine = create_engine(config.DATABASE_URL)
+
+def engine_options(url: str) -> dict:
+    """Connection-pool settings for an engine URL (SQLite manages its own connections)."""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING
+    }
+
+engine = create_engine(config.DATABASE_URL, **engine_options(config.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ✅ Optional async engine (e.g. postgresql+asyncpg://...); without it, async callers use the sync engine on worker threads
+async_engine = None
+AsyncSessionLocal = None
+if config.ASYNC_DATABASE_URL:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(config.ASYNC_DATABASE_URL, **engine_options(config.ASYNC_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+@contextmanager
+def session_scope(session_factory=SessionLocal):
+    """One session per unit of work: commits on success, rolls back on error, always returns the connection to the pool."""
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+# ✅ FastAPI dependency: one session per request
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ✅ FastAPI dependency for responses that outlive the handler (e.g. streams) and open their own session
+def get_session_factory():
+    return SessionLocal
+
 # ✅ Ensure DB Initialization at Startup
-def init_db():
-    """Creates all database tables if they don’t exist."""
-    from app.models.conversation import Conversation  # Import models before creation
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+MIGRATIONS_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+# Databases created by `create_all` before migrations existed, identified by their newest table
+LEGACY_SCHEMA_REVISIONS = [("conversation_summaries", "0002"), ("conversations", "0001")]
+
+def init_db(bind=engine):
+    """Brings the database schema up to date by running the Alembic migrations."""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+
+    alembic_config = Config(MIGRATIONS_CONFIG)
+    alembic_config.attributes["configure_logger"] = False
+
+    with bind.begin() as connection:
+        alembic_config.attributes["connection"] = connection
+        if MigrationContext.configure(connection).get_current_revision() is None:
+            tables = inspect(connection).get_table_names()
+            legacy = next((revision for table, revision in LEGACY_SCHEMA_REVISIONS if table in tables), None)
+            if legacy:
+                command.stamp(alembic_config, legacy)
+        command.upgrade(alembic_config, "head")
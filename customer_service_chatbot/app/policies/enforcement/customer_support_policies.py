@@ -1,3 +1,5 @@
+from app.policies.enforcement.rule_engine import policy_engine
+
 class CustomerSupportPolicies:
     """Strictly enforced business rules for customer support inquiries."""
 
@@ -17,15 +19,24 @@ class CustomerSupportPolicies:
         """
         return order_number.startswith("ORD") and order_number[3:].isdigit()
 
+    @staticmethod
+    def can_cancel_from_input(user_input: str) -> bool:
+        """Rule check (rules.yaml) for cancellation requests."""
+        order_status = "shipped"  # Mock example
+        return CustomerSupportPolicies.can_cancel_order(order_status)
+
+    @staticmethod
+    def can_track_from_input(user_input: str) -> bool:
+        """Rule check (rules.yaml) for tracking requests."""
+        order_number = "ORD123"  # Mock input
+        return CustomerSupportPolicies.can_track_order(order_number)
+
     @staticmethod
     def requires_order_number(user_input: str) -> bool:
-        """Checks if a refund request explicitly requires an order number."""
-        refund_keywords = ["i want a refund", "can i return", "exchange my product", "request a refund"]
-        # Ensure it's a **request**, not just a mention
-        return any(phrase in user_input.lower() for phrase in refund_keywords)
+        """Checks if a refund request explicitly requires an order number (rule `requires_order_number`)."""
+        return policy_engine.matches("customer_support", "requires_order_number", user_input)
 
     @staticmethod
     def is_request_appropriate(user_input: str) -> bool:
-        """Checks if a customer request is appropriate (no offensive language)."""
-        offensive_keywords = ["scam", "fraud", "stupid", "idiot"]
-        return not any(keyword in user_input.lower() for keyword in offensive_keywords)
\ No newline at end of file
+        """Checks if a customer request is appropriate, i.e. rule `inappropriate_language` doesn't fire."""
+        return not policy_engine.matches("customer_support", "inappropriate_language", user_input)
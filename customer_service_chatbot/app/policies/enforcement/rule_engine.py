@@ -0,0 +1,298 @@
+import asyncio
+import importlib
+import logging
+import os
+import re
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from config import POLICY_RULES_PATH
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+ACTIONS = {"reject", "check", "flag"}
+CHECKS_PACKAGE = "app.policies.enforcement"
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over lowercase keywords.
+
+    `find` reports every (overlapping) occurrence of every keyword in one pass
+    over the text, so its cost depends on the text length and the number of
+    hits, not on how many keywords were compiled in.
+    """
+
+    def __init__(self, keywords: List[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]  # node -> [(keyword length, value)]
+
+        for keyword, value in keywords:
+            node = 0
+            for char in keyword:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(keyword), value))
+
+        # Breadth-first: link each node to the longest proper suffix that is also a prefix
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    fallback = self._fail[node]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def find(self, text: str):
+        """Yields (start, end, value) for every keyword occurrence in `text` (already lowercased)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in out[node]:
+                yield end - length, end, value
+
+@dataclass
+class Rule:
+    id: str
+    action: str
+    keywords: List[str] = field(default_factory=list)
+    patterns: List[str] = field(default_factory=list)
+    word_boundary: bool = False
+    response: Optional[str] = None
+    check: Optional[Callable[[str], bool]] = None
+
+@dataclass
+class PolicyDecision:
+    """Outcome of evaluating one input: the rejecting rule and response (if any) and the flags raised."""
+    response: Optional[str] = None
+    rule: Optional[str] = None
+    flags: List[str] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> bool:
+        return self.response is not None
+
+class CompiledRuleSet:
+    """One agent's rules, compiled into a keyword automaton and one combined regex."""
+
+    def __init__(self, agent: str, spec: dict):
+        self.agent = agent
+        self.empty_input_response = spec.get("empty_input_response")
+        self.rules = [self._parse_rule(raw) for raw in spec.get("rules") or []]
+        self.rule_index = {rule.id: index for index, rule in enumerate(self.rules)}
+        if len(self.rule_index) != len(self.rules):
+            raise ValueError(f"{agent}: duplicate rule ids")
+
+        # Keywords map back to (rule index, keyword as written) so responses can name the match
+        self.keywords = KeywordMatcher([
+            (keyword.lower(), (index, keyword)) for index, rule in enumerate(self.rules) for keyword in rule.keywords
+        ])
+
+        # One alternation of all patterns inside a lookahead, so matches can overlap (one per start position)
+        # (the named group wrapping each pattern is the last to close, so `lastgroup` names the rule)
+        self.pattern_rules = {
+            f"r{index}_{n}": index for index, rule in enumerate(self.rules) for n, _ in enumerate(rule.patterns)
+        }
+        groups = [f"(?P<r{index}_{n}>{pattern})" for index, rule in enumerate(self.rules) for n, pattern in enumerate(rule.patterns)]
+        self.pattern = re.compile(f"(?=(?:{'|'.join(groups)}))", re.IGNORECASE) if groups else None
+
+    def _parse_rule(self, raw: dict) -> Rule:
+        rule = Rule(
+            id=raw["id"],
+            action=raw.get("action", "reject"),
+            keywords=list(raw.get("keywords") or []),
+            patterns=list(raw.get("patterns") or []),
+            word_boundary=bool(raw.get("word_boundary", False)),
+            response=raw.get("response")
+        )
+        where = f"{self.agent}.{rule.id}"
+        if rule.action not in ACTIONS:
+            raise ValueError(f"{where}: unknown action '{rule.action}' (expected one of {sorted(ACTIONS)})")
+        if not rule.keywords and not rule.patterns:
+            raise ValueError(f"{where}: a rule needs keywords or patterns")
+        if rule.action != "flag" and not rule.response:
+            raise ValueError(f"{where}: '{rule.action}' rules need a response")
+        for pattern in rule.patterns:
+            if re.compile(pattern).groupindex:  # Also reports a bad pattern against its rule, not the combined regex
+                raise ValueError(f"{where}: patterns can't use named groups")
+        if rule.action == "check":
+            rule.check = self._resolve_check(where, raw.get("check"))
+        return rule
+
+    @staticmethod
+    def _resolve_check(where: str, reference: Optional[str]) -> Callable[[str], bool]:
+        """Resolves `module.Class.method` (relative to app.policies.enforcement) to a callable."""
+        if not reference:
+            raise ValueError(f"{where}: 'check' rules need a check")
+        module_name, _, attribute_path = reference.partition(".")
+        target = importlib.import_module(f"{CHECKS_PACKAGE}.{module_name}")
+        for attribute in attribute_path.split("."):
+            target = getattr(target, attribute)
+        if not callable(target):
+            raise ValueError(f"{where}: check '{reference}' is not callable")
+        return target
+
+    def match(self, user_input: str) -> Dict[int, str]:
+        """Rules fired by the input (rule index -> matched text), from one pass per matcher."""
+        fired: Dict[int, str] = {}
+        text = user_input.lower()
+        for start, end, (index, keyword) in self.keywords.find(text):
+            if index in fired:
+                continue
+            if self.rules[index].word_boundary and not _is_whole_word(text, start, end):
+                continue
+            fired[index] = keyword
+
+        if self.pattern is not None:
+            for found in self.pattern.finditer(user_input):
+                fired.setdefault(self.pattern_rules[found.lastgroup], found.group(found.lastgroup))
+        return fired
+
+    def evaluate(self, user_input: str) -> PolicyDecision:
+        """Applies the fired rules in declaration order; the first reject (or failed check) wins."""
+        decision = PolicyDecision()
+        if not user_input.strip():
+            decision.response = self.empty_input_response
+            decision.rule = "empty_input" if self.empty_input_response else None
+            return decision
+
+        fired = self.match(user_input)
+        for index in sorted(fired):
+            rule = self.rules[index]
+            if rule.action == "flag":
+                decision.flags.append(rule.id)
+            elif rule.action == "reject" or not rule.check(user_input):
+                decision.response = rule.response.replace("{match}", fired[index])
+                decision.rule = rule.id
+                break
+        return decision
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules),
+            "keywords": sum(len(rule.keywords) for rule in self.rules),
+            "patterns": sum(len(rule.patterns) for rule in self.rules)
+        }
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_")
+
+class PolicyEngine:
+    """
+    Enforced policy rules loaded from a YAML file (see rules.yaml).
+
+    Rules are compiled once per agent, so evaluating an input is one pass over
+    it no matter how many rules there are. The file is (re)compiled on first
+    use, by `reload`, and by `awatch_rules` when hot reload is on; a file that
+    fails to compile is logged and the previous rules stay in force.
+    """
+
+    def __init__(self, path: str = POLICY_RULES_PATH):
+        self.path = path
+        self._rulesets: Optional[Dict[str, CompiledRuleSet]] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.reloads = 0
+        self.evaluations = Counter()
+        self.rejections = Counter()
+        self.flags = Counter()
+
+    def compile(self) -> Dict[str, CompiledRuleSet]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            spec = yaml.safe_load(f) or {}
+        return {agent: CompiledRuleSet(agent, agent_spec or {}) for agent, agent_spec in spec.items()}
+
+    def reload(self) -> dict:
+        """Recompiles the rules file and swaps it in atomically."""
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            self._rulesets = self.compile()
+            self._mtime = mtime
+            self.reloads += 1
+        compiled = {agent: ruleset.stats() for agent, ruleset in self._rulesets.items()}
+        logger.info(f"🟢 Policy rules loaded from {self.path}: {compiled}")
+        return compiled
+
+    def reload_if_changed(self) -> bool:
+        """Reloads when the file changed since the last load; keeps the current rules if it fails to compile."""
+        try:
+            if self._rulesets is not None and os.path.getmtime(self.path) == self._mtime:
+                return False
+            self.reload()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Policy rules reload failed, keeping the previous rules: {e}")
+            return False
+
+    async def awatch_rules(self):
+        """Reloads the rules whenever the rules file changes (runs until cancelled)."""
+        from watchfiles import awatch
+
+        target = os.path.abspath(self.path)
+        logger.info(f"👀 Watching {self.path} for policy rule changes")
+        async for changes in awatch(os.path.dirname(target)):
+            if any(os.path.abspath(path) == target for _, path in changes):
+                await asyncio.to_thread(self.reload_if_changed)
+
+    def ruleset(self, agent: str) -> Optional[CompiledRuleSet]:
+        if self._rulesets is None:
+            self.reload()
+        return self._rulesets.get(agent)
+
+    def evaluate(self, agent: str, user_input: str) -> PolicyDecision:
+        """Evaluates an agent's rules against the input (agents without rules always pass)."""
+        ruleset = self.ruleset(agent)
+        if ruleset is None:
+            return PolicyDecision()
+
+        decision = ruleset.evaluate(user_input)
+        self.evaluations[agent] += 1
+        if decision.rejected:
+            self.rejections[decision.rule] += 1
+        if decision.flags:
+            self.flags.update(decision.flags)
+            logger.info(f"🚩 {agent} policy flags: {decision.flags}")
+        return decision
+
+    def matches(self, agent: str, rule_id: str, user_input: str) -> bool:
+        """Whether a single rule fires for the input, regardless of its action."""
+        ruleset = self.ruleset(agent)
+        index = ruleset.rule_index.get(rule_id) if ruleset else None
+        if index is None:
+            raise KeyError(f"No policy rule '{rule_id}' for agent '{agent}'")
+        return index in ruleset.match(user_input)
+
+    def stats(self) -> dict:
+        """Compiled rule counts and per-rule rejection/flag counters for monitoring."""
+        return {
+            "path": self.path,
+            "reloads": self.reloads,
+            "agents": {agent: ruleset.stats() for agent, ruleset in (self._rulesets or {}).items()},
+            "evaluations": dict(self.evaluations),
+            "rejections": dict(self.rejections),
+            "flags": dict(self.flags)
+        }
+
+policy_engine = PolicyEngine()
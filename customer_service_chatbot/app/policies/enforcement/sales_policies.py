@@ -1,6 +1,15 @@
+import re
+
 class SalesPolicies:
     """Strictly enforced business rules for sales inquiries."""
+    PRODUCTS = ("Limited Edition Sneakers", "Premium Plan", "Rare Collectible Watch")
     UNAVAILABLE_PRODUCTS = {"Limited Edition Sneakers", "Rare Collectible Watch"}
+    MAX_ORDER_QUANTITY = 10
+
+    # ✅ Compiled once: any catalog product as a whole phrase, and the first standalone number
+    PRODUCT_PATTERN = re.compile(r"\b(" + "|".join(re.escape(product.lower()) for product in PRODUCTS) + r")\b")
+    QUANTITY_PATTERN = re.compile(r"\b(\d+)\b")
+    _PRODUCT_NAMES = {product.lower(): product for product in PRODUCTS}
 
     @staticmethod
     def is_product_available(product_name: str) -> bool:
@@ -9,18 +18,23 @@ class SalesPolicies:
 
     @staticmethod
     def can_create_order(product_name: str, quantity: int) -> bool:
-        """
-        Orders must be for at least 1 unit and not exceed max stock (e.g., 10).
-        """
-        return SalesPolicies.is_product_available(product_name) and (1 <= quantity <= 10)
+        """Checks if the order quantity is valid."""
+        return SalesPolicies.is_product_available(product_name) and quantity <= SalesPolicies.MAX_ORDER_QUANTITY
 
     @staticmethod
-    def is_product_available(product_name: str) -> bool:
-        """Returns False if the product is in the unavailable list."""
-        return product_name not in SalesPolicies.UNAVAILABLE_PRODUCTS
+    def extract_product_name(user_input: str) -> str:
+        """Returns the first catalog product mentioned in the input, or "Unknown Product"."""
+        match = SalesPolicies.PRODUCT_PATTERN.search(user_input.lower())
+        return SalesPolicies._PRODUCT_NAMES[match.group(1)] if match else "Unknown Product"
 
     @staticmethod
-    def can_create_order(product_name: str, quantity: int) -> bool:
-        """Checks if the order quantity is valid."""
-        max_order_limit = 10  # Example threshold
-        return SalesPolicies.is_product_available(product_name) and quantity <= max_order_limit
\ No newline at end of file
+    def extract_quantity(user_input: str) -> int:
+        """Extracts quantity from user input. Defaults to 1 if none is found."""
+        match = SalesPolicies.QUANTITY_PATTERN.search(user_input)
+        return int(match.group(1)) if match else 1
+
+    @staticmethod
+    def can_order_from_input(user_input: str) -> bool:
+        """Rule check (rules.yaml): the product and quantity mentioned in the input make a valid order."""
+        return SalesPolicies.can_create_order(SalesPolicies.extract_product_name(user_input), SalesPolicies.extract_quantity(user_input))
+
@@ -1,3 +1,5 @@
+from app.policies.enforcement.rule_engine import policy_engine
+
 class TechSupportPolicies:
     """Strictly enforced business rules for technical support inquiries."""
 
@@ -18,6 +20,5 @@ class TechSupportPolicies:
 
     @staticmethod
     def requires_authentication(user_input: str) -> bool:
-        """Checks if an authentication step is required for a tech support request."""
-        sensitive_requests = ["reset my password", "change my email", "account recovery"]
-        return any(keyword in user_input.lower() for keyword in sensitive_requests)
\ No newline at end of file
+        """Checks if an authentication step is required for a tech support request (rule `requires_authentication`)."""
+        return policy_engine.matches("tech_support", "requires_authentication", user_input)
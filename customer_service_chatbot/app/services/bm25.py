@@ -0,0 +1,70 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i",
+    "if", "in", "is", "it", "me", "my", "of", "on", "or", "the", "their", "they", "this", "to",
+    "was", "we", "what", "when", "where", "which", "who", "why", "will", "with", "you", "your"
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 lexical index over policy chunks."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(doc index, term frequency)]
+        self._doc_lengths = []
+        self._avg_length = 0.0
+
+    def build(self, documents: Sequence[str]):
+        """(Re)builds the index from scratch."""
+        self.documents = list(documents)
+        self._postings = {}
+        self._doc_lengths = []
+
+        for index, document in enumerate(self.documents):
+            tokens = tokenize(document)
+            self._doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self._postings.setdefault(term, []).append((index, frequency))
+
+        self._avg_length = sum(self._doc_lengths) / len(self._doc_lengths) if self._doc_lengths else 0.0
+
+    def _idf(self, term: str) -> float:
+        doc_frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self.documents) - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    def query(self, text: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """Returns up to `top_k` `(document, score)` pairs with a positive score, best first."""
+        scores = {}
+        for term in set(tokenize(text)):
+            idf = self._idf(term)
+            for index, frequency in self._postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * self._doc_lengths[index] / self._avg_length
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.documents[index], score) for index, score in ranked]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], weights: Sequence[float] = None, k: int = 60) -> List[str]:
+    """
+    Fuses several ranked lists with (weighted) Reciprocal Rank Fusion.
+
+    RRF only looks at ranks, so cosine similarities and BM25 scores can be
+    combined without calibrating their very different scales.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, document in enumerate(ranking):
+            fused[document] = fused.get(document, 0.0) + weight / (k + rank + 1)
+
+    return sorted(fused, key=fused.get, reverse=True)
@@ -1,55 +1,404 @@
+import asyncio
 import logging
-from sqlalchemy.orm import Session
-from app.models.database import SessionLocal
-from app.models.conversation import Conversation
-from datetime import datetime
+from sqlalchemy import func, insert, or_, select, update
+from app.models.database import SessionLocal, AsyncSessionLocal, session_scope
+from app.models.conversation import Conversation, ConversationSummary
+from app.services.history_cache import HistoryCache
+from app.services.write_behind import WriteBehindQueue
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from config import (
+    WRITE_BEHIND_ENABLED, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_QUEUE,
+    HISTORY_CACHE_ENABLED, HISTORY_CACHE_MESSAGES, HISTORY_CACHE_MAX_CONVERSATIONS, HISTORY_CACHE_MAX_BYTES
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
 logger = logging.getLogger(__name__)
 
 class ConversationService:
-    """Service for managing conversations in the database."""
+    """
+    Service for managing conversations in the database.
 
-    def __init__(self, session: Session = None):
-        self.session = session or SessionLocal()
+    Every call opens its own short-lived session from the connection pool, so
+    concurrent requests never share a session. Async callers use the async
+    engine when `ASYNC_DATABASE_URL` is configured, and otherwise run the sync
+    calls on worker threads.
+
+    A turn (user message + bot reply) is written with one multi-row insert in
+    a single transaction. With `write_behind` enabled, async turn writes are
+    queued and flushed in batches instead; queued rows are merged into history
+    reads so a conversation always sees its own latest turn.
+
+    With a `history_cache`, recent messages of active conversations are kept in
+    per-conversation ring buffers: reads are served from memory, misses read
+    through to the database, and every write is appended to the buffer.
+    """
+
+    def __init__(self, session_factory=SessionLocal, async_session_factory=AsyncSessionLocal, write_behind: bool = False,
+                 write_behind_batch_size: int = 100, write_behind_flush_interval: float = 0.05, write_behind_max_queue: int = 10000,
+                 history_cache: Optional[HistoryCache] = None):
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.history_cache = history_cache
+        # Queued rows are already in the history cache, so flushes skip it
+        self.write_behind = WriteBehindQueue(
+            self._ainsert,
+            max_batch_size=write_behind_batch_size,
+            flush_interval=write_behind_flush_interval,
+            max_queue_size=write_behind_max_queue,
+            on_error=self._flush_failed
+        ) if write_behind else None
+
+    @staticmethod
+    def turn_rows(conversation_id: str, user_input: str, bot_response: str, user_timestamp: Optional[datetime] = None,
+                  bot_timestamp: Optional[datetime] = None, agent: Optional[str] = None) -> List[dict]:
+        """
+        The two message rows of a turn; the reply is always timestamped after the user message.
+
+        `agent` is recorded on the conversation summary, not on the messages.
+        """
+        user_timestamp = user_timestamp or datetime.utcnow()
+        bot_timestamp = max(bot_timestamp or datetime.utcnow(), user_timestamp + timedelta(microseconds=1))
+        return [
+            {"conversation_id": conversation_id, "sender": "user", "content": user_input, "timestamp": user_timestamp, "agent": agent},
+            {"conversation_id": conversation_id, "sender": "bot", "content": bot_response, "timestamp": bot_timestamp, "agent": agent}
+        ]
+
+    # 🔹 History cache bookkeeping
+    def _cache_written(self, rows: List[dict]):
+        """Appends freshly written rows to their conversations' ring buffers."""
+        if self.history_cache is None:
+            return
+        by_conversation = {}
+        for row in sorted(rows, key=lambda row: row["timestamp"]):
+            by_conversation.setdefault(row["conversation_id"], []).append(row)
+        for conversation_id, conversation_rows in by_conversation.items():
+            self.history_cache.append(conversation_id, conversation_rows)
+
+    def _flush_failed(self, rows: List[dict]):
+        """Queued rows that never reached the database must not linger in the history cache."""
+        if self.history_cache is not None:
+            for conversation_id in {row["conversation_id"] for row in rows}:
+                self.history_cache.invalidate(conversation_id)
+
+    def invalidate_history(self, conversation_id: str):
+        """Forgets the cached history of a conversation (e.g. after it was deleted)."""
+        if self.history_cache is not None:
+            self.history_cache.invalidate(conversation_id)
+
+    async def adiscard_queued(self, conversation_id: str):
+        """Drops turns of a conversation still waiting for write-behind (before it is deleted)."""
+        if self.write_behind is not None:
+            await self.write_behind.discard(conversation_id)
+
+    def _load_limit(self, n: int) -> int:
+        # Misses load a full ring buffer so the next reads can be served from memory
+        return max(n, self.history_cache.capacity) if self.history_cache is not None else n
+
+    def _pending(self, conversation_id: str) -> List[dict]:
+        return self.write_behind.pending(conversation_id) if self.write_behind is not None else []
+
+    def _with_pending(self, conversation_id: str, messages: list, pending_before: List[dict]) -> list:
+        """
+        Merges rows still waiting in the write-behind queue into `messages` (chronological).
+
+        Rows queued before the database read may have been flushed while it ran,
+        so rows already returned by the database are skipped.
+        """
+        pending = pending_before + self._pending(conversation_id)
+        if not pending:
+            return list(messages)
+
+        seen = {(msg.sender, msg.timestamp, msg.content) for msg in messages}
+        merged = list(messages)
+        for row in pending:
+            key = (row["sender"], row["timestamp"], row["content"])
+            if key not in seen:
+                seen.add(key)
+                merged.append(Conversation(**{key: value for key, value in row.items() if key != "agent"}))
+        return sorted(merged, key=lambda msg: msg.timestamp)
+
+    # 🔹 Writes
+    # RETURNING the inserted rows (ids included) keeps the statement a single multi-row INSERT
+    _INSERT = insert(Conversation).returning(
+        Conversation.id, Conversation.conversation_id, Conversation.sender, Conversation.content, Conversation.timestamp
+    )
+
+    @staticmethod
+    def _summary_deltas(rows: List[dict]) -> List[dict]:
+        """How the rows being written change each conversation's summary (agent, newest timestamp, message count)."""
+        deltas = {}
+        for row in rows:
+            delta = deltas.setdefault(row["conversation_id"], {
+                "conversation_id": row["conversation_id"], "agent": None, "last_timestamp": row["timestamp"], "message_count": 0
+            })
+            delta["agent"] = row.get("agent") or delta["agent"]
+            delta["last_timestamp"] = max(delta["last_timestamp"], row["timestamp"])
+            delta["message_count"] += 1
+        # Stable order so concurrent batches lock summary rows in the same sequence
+        return [deltas[conversation_id] for conversation_id in sorted(deltas)]
+
+    @staticmethod
+    def _summary_upsert(dialect: str, values: List[dict]):
+        """One multi-row upsert that bumps each conversation's summary, or None if the dialect has no upsert."""
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+            latest = func.greatest
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+            latest = func.max  # Scalar max(a, b) in SQLite
+        else:
+            return None
+
+        statement = upsert(ConversationSummary).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[ConversationSummary.conversation_id],
+            set_={
+                "agent": func.coalesce(statement.excluded.agent, ConversationSummary.agent),
+                "last_timestamp": latest(ConversationSummary.last_timestamp, statement.excluded.last_timestamp),
+                "message_count": ConversationSummary.message_count + statement.excluded.message_count
+            }
+        )
+
+    @staticmethod
+    def _summary_merge(session, values: List[dict]):
+        """
+        Portable fallback for `_summary_upsert`: reads the existing summaries (locking them where the
+        database supports it), then updates those and inserts the rest, in the caller's transaction.
+        """
+        existing = {
+            summary.conversation_id: summary for summary in session.execute(
+                select(ConversationSummary)
+                .where(ConversationSummary.conversation_id.in_([value["conversation_id"] for value in values]))
+                .with_for_update()
+            ).scalars()
+        }
+        for value in values:
+            summary = existing.get(value["conversation_id"])
+            if summary is None:
+                session.add(ConversationSummary(**value))
+                continue
+            summary.agent = value["agent"] or summary.agent
+            summary.last_timestamp = max(summary.last_timestamp, value["last_timestamp"])
+            summary.message_count += value["message_count"]
+        session.flush()
+
+    def _write(self, session, rows: List[dict]) -> List[dict]:
+        """Inserts messages and updates their conversation summaries in the session's transaction."""
+        messages = [{key: value for key, value in row.items() if key != "agent"} for row in rows]
+        stored = [dict(row) for row in session.execute(self._INSERT, messages).mappings()]
+        summaries = self._summary_deltas(rows)
+        statement = self._summary_upsert(session.get_bind().dialect.name, summaries)
+        if statement is not None:
+            session.execute(statement)
+        else:
+            self._summary_merge(session, summaries)
+        return stored
+
+    def _insert(self, rows: List[dict]) -> List[dict]:
+        with session_scope(self.session_factory) as session:
+            return self._write(session, rows)
+
+    async def _ainsert(self, rows: List[dict]) -> List[dict]:
+        if self.async_session_factory is None:
+            return await asyncio.to_thread(self._insert, rows)
+
+        async with self.async_session_factory() as session:
+            async with session.begin():
+                return await session.run_sync(self._write, rows)
+
+    def add_messages(self, rows: List[dict]) -> List[dict]:
+        """Inserts message rows with a single multi-row INSERT in one transaction and returns the stored rows (raises on failure)."""
+        if not rows:
+            return []
+        stored = self._insert(rows)
+        self._cache_written(stored)
+        return stored
+
+    async def aadd_messages(self, rows: List[dict]) -> List[dict]:
+        """Async variant of `add_messages`."""
+        if not rows:
+            return []
+        stored = await self._ainsert(rows)
+        self._cache_written(stored)
+        return stored
+
+    def add_turn(self, conversation_id: str, user_input: str, bot_response: str, user_timestamp: Optional[datetime] = None,
+                 bot_timestamp: Optional[datetime] = None, agent: Optional[str] = None):
+        """Stores a user message and the bot reply together."""
+        try:
+            self.add_messages(self.turn_rows(conversation_id, user_input, bot_response, user_timestamp, bot_timestamp, agent))
+            logger.info(f"✅ Stored turn for conversation {conversation_id}")
+        except Exception as e:
+            logger.error(f"❌ ERROR: Failed to store turn: {e}")
+
+    async def aadd_turn(self, conversation_id: str, user_input: str, bot_response: str, user_timestamp: Optional[datetime] = None,
+                        bot_timestamp: Optional[datetime] = None, agent: Optional[str] = None):
+        """Async variant of `add_turn`; queued for a batched write when write-behind is running."""
+        rows = self.turn_rows(conversation_id, user_input, bot_response, user_timestamp, bot_timestamp, agent)
+        if self.write_behind is not None and self.write_behind.running:
+            self._cache_written(rows)
+            return await self.write_behind.enqueue(rows)
+
+        try:
+            await self.aadd_messages(rows)
+            logger.info(f"✅ Stored turn for conversation {conversation_id}")
+        except Exception as e:
+            logger.error(f"❌ ERROR: Failed to store turn: {e}")
 
     def add_message(self, conversation_id: str, sender: str, content: str, timestamp: datetime):
         """Stores a new message in the database."""
         try:
             logger.info(f"🟢 Storing message -> [{sender}]: {content}")
-            new_message = Conversation(
-                conversation_id=conversation_id,
-                sender=sender,
-                content=content,
-                timestamp=timestamp
-            )
-            self.session.add(new_message)
-            self.session.commit()
-            self.session.refresh(new_message)
-            logger.info(f"✅ Stored message successfully: {new_message.content}")
+            self.add_messages([{"conversation_id": conversation_id, "sender": sender, "content": content, "timestamp": timestamp}])
+            logger.info(f"✅ Stored message successfully: {content}")
         except Exception as e:
-            self.session.rollback()
             logger.error(f"❌ ERROR: Failed to store message: {e}")
-        finally:
-            self.session.close()
 
-    def get_last_n_messages(self, conversation_id: str, n: int = 5):
-        """Retrieves the last N messages from a conversation."""
+    async def aadd_message(self, conversation_id: str, sender: str, content: str, timestamp: datetime):
+        """Async variant of `add_message`."""
         try:
+            await self.aadd_messages([{"conversation_id": conversation_id, "sender": sender, "content": content, "timestamp": timestamp}])
+            logger.info(f"✅ Stored message successfully: {content}")
+        except Exception as e:
+            logger.error(f"❌ ERROR: Failed to store message: {e}")
+
+    # 🔹 Reads
+    def _load_last_n(self, conversation_id: str, n: int) -> list:
+        with session_scope(self.session_factory) as session:
             messages = (
-                self.session.query(Conversation)
+                session.query(Conversation)
                 .filter(Conversation.conversation_id == conversation_id)
                 .order_by(Conversation.timestamp.desc())
                 .limit(n)
                 .all()
             )
+            session.expunge_all()  # Keep the loaded rows usable after the session closes
+        return messages[::-1]  # Chronological order
+
+    async def _aload_last_n(self, conversation_id: str, n: int) -> list:
+        if self.async_session_factory is None:
+            return await asyncio.to_thread(self._load_last_n, conversation_id, n)
+
+        async with self.async_session_factory() as session:
+            result = await session.execute(
+                select(Conversation)
+                .where(Conversation.conversation_id == conversation_id)
+                .order_by(Conversation.timestamp.desc())
+                .limit(n)
+            )
+            messages = result.scalars().all()
+        return messages[::-1]
+
+    def get_last_n_messages(self, conversation_id: str, n: int = 5):
+        """Retrieves the last N messages from a conversation."""
+        if self.history_cache is not None:
+            cached = self.history_cache.get(conversation_id, n)
+            if cached is not None:
+                return cached
+            token = self.history_cache.begin_load(conversation_id)
+
+        messages, complete = [], False
+        try:
+            pending_before = self._pending(conversation_id)
+            messages = self._with_pending(conversation_id, self._load_last_n(conversation_id, self._load_limit(n)), pending_before)
+            complete = True
             logger.info(f"🟡 Retrieved {len(messages)} messages from history")
-            return messages[::-1]  # Return messages in chronological order
+            return messages[-n:]
         except Exception as e:
             logger.error(f"❌ ERROR: Failed to retrieve messages: {e}")
             return []
         finally:
-            self.session.close()
+            if self.history_cache is not None:
+                self.history_cache.finish_load(conversation_id, token, messages, complete)
+
+    async def aget_last_n_messages(self, conversation_id: str, n: int = 5):
+        """Async variant of `get_last_n_messages`."""
+        if self.history_cache is not None:
+            cached = self.history_cache.get(conversation_id, n)
+            if cached is not None:
+                return cached
+            token = self.history_cache.begin_load(conversation_id)
+
+        messages, complete = [], False
+        try:
+            pending_before = self._pending(conversation_id)
+            messages = self._with_pending(conversation_id, await self._aload_last_n(conversation_id, self._load_limit(n)), pending_before)
+            complete = True
+            logger.info(f"🟡 Retrieved {len(messages)} messages from history")
+            return messages[-n:]
+        except Exception as e:
+            logger.error(f"❌ ERROR: Failed to retrieve messages: {e}")
+            return []
+        finally:
+            if self.history_cache is not None:
+                self.history_cache.finish_load(conversation_id, token, messages, complete)
+
+    # 🔹 Rolling summaries
+    async def _arun(self, fn, *args):
+        """Runs `fn(session, *args)` in one transaction, on the async engine or a worker thread."""
+        if self.async_session_factory is None:
+            def run():
+                with session_scope(self.session_factory) as session:
+                    return fn(session, *args)
+            return await asyncio.to_thread(run)
+
+        async with self.async_session_factory() as session:
+            async with session.begin():
+                return await session.run_sync(fn, *args)
+
+    @staticmethod
+    def _load_summary(session, conversation_id: str) -> Tuple[Optional[str], Optional[datetime]]:
+        row = session.execute(
+            select(ConversationSummary.summary, ConversationSummary.summarized_through)
+            .where(ConversationSummary.conversation_id == conversation_id)
+        ).first()
+        return (row.summary, row.summarized_through) if row else (None, None)
+
+    async def aget_summary(self, conversation_id: str) -> Tuple[Optional[str], Optional[datetime]]:
+        """The conversation's rolling summary and the timestamp of the newest message folded into it."""
+        return await self._arun(self._load_summary, conversation_id)
+
+    @staticmethod
+    def _load_after(session, conversation_id: str, after: Optional[datetime], limit: int) -> list:
+        query = select(Conversation).where(Conversation.conversation_id == conversation_id)
+        if after is not None:
+            query = query.where(Conversation.timestamp > after)
+        messages = session.execute(query.order_by(Conversation.timestamp).limit(limit)).scalars().all()
+        session.expunge_all()
+        return messages
+
+    async def aget_messages_after(self, conversation_id: str, after: Optional[datetime], limit: int) -> list:
+        """The oldest `limit` messages newer than `after` (chronological), including turns still queued for write-behind."""
+        pending_before = self._pending(conversation_id)
+        messages = self._with_pending(conversation_id, await self._arun(self._load_after, conversation_id, after, limit), pending_before)
+        return [msg for msg in messages if after is None or msg.timestamp > after][:limit]
+
+    @staticmethod
+    def _write_summary(session, conversation_id: str, summary: str, through: datetime, folded: int) -> bool:
+        result = session.execute(
+            update(ConversationSummary)
+            .where(ConversationSummary.conversation_id == conversation_id)
+            # Never move backwards if another worker already folded newer messages
+            .where(or_(ConversationSummary.summarized_through.is_(None), ConversationSummary.summarized_through < through))
+            .values(summary=summary, summarized_through=through,
+                    summarized_messages=ConversationSummary.summarized_messages + folded)
+        )
+        return result.rowcount == 1
+
+    async def asave_summary(self, conversation_id: str, summary: str, through: datetime, folded: int) -> bool:
+        """Stores an updated summary; False if the conversation isn't stored yet or the summary is already newer."""
+        return await self._arun(self._write_summary, conversation_id, summary, through, folded)
 
-conversation_service = ConversationService()
\ No newline at end of file
+conversation_service = ConversationService(
+    write_behind=WRITE_BEHIND_ENABLED,
+    write_behind_batch_size=WRITE_BEHIND_BATCH_SIZE,
+    write_behind_flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+    write_behind_max_queue=WRITE_BEHIND_MAX_QUEUE,
+    history_cache=HistoryCache(
+        capacity=HISTORY_CACHE_MESSAGES,
+        max_conversations=HISTORY_CACHE_MAX_CONVERSATIONS,
+        max_bytes=HISTORY_CACHE_MAX_BYTES
+    ) if HISTORY_CACHE_ENABLED else None
+)
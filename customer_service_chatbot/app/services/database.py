@@ -1,38 +1,21 @@
 import logging
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
-from app.models.database import Base, Conversation
-from config import DATABASE_URL
+from app.services.conversation_service import conversation_service
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
 logger = logging.getLogger(__name__)
 
-# Initialize Database Connection
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# 🚀 Ensure all tables exist in the container
-Base.metadata.create_all(bind=engine)
+# Engine, sessions and table creation live in app.models.database (tables are created at app startup)
 
 def store_message(conversation_id: str, sender: str, content: str, timestamp: str):
     """Stores a message in the database and logs it in real-time."""
-    session = SessionLocal()
     try:
-        message = Conversation(
-            conversation_id=conversation_id,
-            sender=sender,
-            content=content,
-            timestamp=timestamp
-        )
-        session.add(message)
-        session.commit()
-        session.refresh(message)
+        # Same write path as the API, so the conversation summary stays in sync
+        conversation_service.add_messages([
+            {"conversation_id": conversation_id, "sender": sender, "content": content, "timestamp": timestamp}
+        ])
 
-        logger.info(f"[{message.timestamp}] {message.sender} (Convo {message.conversation_id}): {message.content}")
+        logger.info(f"[{timestamp}] {sender} (Convo {conversation_id}): {content}")
     except SQLAlchemyError as e:
-        session.rollback()
         logger.error(f"❌ Error storing message: {e}")
-    finally:
-        session.close()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Bounded cache of query embeddings keyed by normalized text and model name.
+
+    The in-memory tier evicts by LRU order and TTL. When `persist_path` is set,
+    entries are also written to a SQLite file so the cache survives restarts;
+    memory misses fall through to that tier before going to the embeddings API.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 86400, persist_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (embedding, stored_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"✅ Embedding cache persisted to {persist_path}")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercases and collapses whitespace so trivially different queries share an entry."""
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    def make_key(self, text: str, model: str) -> str:
+        return f"{model}\x1f{self.normalize(text)}"
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self.clock() - stored_at > self.ttl_seconds
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Returns the cached embedding or None on a miss."""
+        key = self.make_key(text, model)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, stored_at = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT embedding, stored_at FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1]):
+                        embedding = array("f", row[0]).tolist()
+                        self._store_in_memory(key, embedding, row[1])
+                        self.hits += 1
+                        self.persistent_hits += 1
+                        return embedding
+                    self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, text: str, model: str, embedding: List[float]):
+        """Stores an embedding in memory and, if enabled, in the persistent tier."""
+        key = self.make_key(text, model)
+        stored_at = self.clock()
+
+        with self._lock:
+            self._store_in_memory(key, list(embedding), stored_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, embedding, stored_at) VALUES (?, ?, ?)",
+                    (key, array("f", embedding).tobytes(), stored_at)
+                )
+                self._db.commit()
+
+    def _store_in_memory(self, key: str, embedding: List[float], stored_at: float):
+        self._entries[key] = (embedding, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops every cached embedding from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import math
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+from app.services.openai_clients import embeddings_upstream, openai_client
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+class EmbeddingProvider(ABC):
+    """Turns texts into embedding vectors for policy retrieval."""
+
+    # Name used in cache keys and vector-store collection names
+    model_name: str = ""
+    # Default cosine-similarity cutoff suited to the provider's score distribution
+    similarity_threshold: float = 0.8
+    # Whether each call is a network round trip (worth micro-batching concurrent queries)
+    remote: bool = True
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a batch of texts."""
+        pass
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of `embed`; providers without a native async client run on a worker thread."""
+        return await asyncio.to_thread(self.embed, texts)
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API (remote round trip per call, with timeouts, retries and hedging)."""
+
+    similarity_threshold = 0.8
+
+    def __init__(self, model: str = "text-embedding-ada-002"):
+        self.model_name = model
+
+    @property
+    def client(self):
+        return openai_client()
+
+    @property
+    def async_client(self):
+        return openai_client(async_client=True)
+
+    def embed(self, texts):
+        response = embeddings_upstream.call_sync(
+            lambda timeout: self.client.embeddings.create(input=texts, model=self.model_name, timeout=timeout)
+        )
+        return [data.embedding for data in response.data]
+
+    async def aembed(self, texts):
+        response = await embeddings_upstream.call(
+            lambda timeout: self.async_client.embeddings.create(input=texts, model=self.model_name, timeout=timeout)
+        )
+        return [data.embedding for data in response.data]
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Fully local embeddings using the hashing trick.
+
+    Word unigrams/bigrams and character n-grams are hashed (with a stable CRC32,
+    so vectors are identical across processes) into a fixed number of signed
+    buckets, weighted by sublinear term frequency and L2-normalized. No model
+    download and no network: a query embeds in microseconds.
+    """
+
+    similarity_threshold = 0.25
+    remote = False
+
+    def __init__(self, dim: int = 1024, char_ngrams=(3, 5)):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.model_name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.lower())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+        return features
+
+    def _embed_one(self, text: str) -> List[float]:
+        counts = {}
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            bucket, sign = h % self.dim, (1.0 if h & 0x80000000 else -1.0)
+            counts[(bucket, sign)] = counts.get((bucket, sign), 0) + 1
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for (bucket, sign), count in counts.items():
+            vector[bucket] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed(self, texts):
+        return [self._embed_one(text) for text in texts]
+
+    async def aembed(self, texts):
+        # Pure CPU work measured in microseconds: not worth a thread hop
+        return self.embed(texts)
+
+def get_embedding_provider(provider: str, model: str = "text-embedding-ada-002", dim: int = 1024) -> EmbeddingProvider:
+    """Returns the embedding provider for the configured name (`openai` or `hashing`)."""
+    normalized = provider.lower()
+    if normalized == "openai":
+        return OpenAIEmbeddingProvider(model=model)
+    if normalized == "hashing":
+        return HashingEmbeddingProvider(dim=dim)
+
+    raise ValueError(f"Unknown embedding provider: {provider}. Valid providers: ['openai', 'hashing']")
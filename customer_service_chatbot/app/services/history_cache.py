@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Rough per-message bookkeeping cost (object headers, deque slot, timestamp) on top of the text itself
+MESSAGE_OVERHEAD_BYTES = 200
+
+@dataclass(frozen=True)
+class CachedMessage:
+    """Immutable snapshot of a stored message (same fields as the `Conversation` row)."""
+    id: Optional[int]
+    conversation_id: str
+    sender: str
+    content: str
+    timestamp: datetime
+
+    @classmethod
+    def from_row(cls, row) -> "CachedMessage":
+        if isinstance(row, dict):
+            return cls(row.get("id"), row["conversation_id"], row["sender"], row["content"], row["timestamp"])
+        return cls(row.id, row.conversation_id, row.sender, row.content, row.timestamp)
+
+    @property
+    def size(self) -> int:
+        return MESSAGE_OVERHEAD_BYTES + len(self.conversation_id) + len(self.sender) + len(self.content)
+
+class _Entry:
+    __slots__ = ("messages", "size")
+
+    def __init__(self, capacity: int):
+        self.messages = deque(maxlen=capacity)
+        self.size = 0
+
+class HistoryCache:
+    """
+    Recent messages of active conversations, one ring buffer per conversation.
+
+    Each buffer keeps the last `capacity` messages of its conversation. Buffers
+    are created from a database read (read-through on miss) and then extended
+    on every write, so an active conversation answers history lookups from
+    memory. Conversations are evicted least recently used first once there are
+    more than `max_conversations` of them or their estimated size exceeds
+    `max_bytes`.
+
+    A load started before a concurrent write to the same conversation is
+    discarded rather than cached, so a buffer never misses a message.
+    """
+
+    def __init__(self, capacity: int = 20, max_conversations: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._loading: Dict[str, List[int]] = {}  # conversation_id -> [in-flight loads, write epoch]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conversation_id: str, n: int) -> Optional[List[CachedMessage]]:
+        """The last `n` messages in chronological order, or None if the cache can't answer."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            # A full buffer may have dropped older messages, so it can only answer up to `capacity`
+            if entry is None or (n > self.capacity and len(entry.messages) == self.capacity):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            messages = list(entry.messages)
+        return messages[-n:] if n > 0 else []
+
+    def begin_load(self, conversation_id: str) -> int:
+        """Registers a read-through load; pass the returned token to `finish_load`."""
+        with self._lock:
+            loading = self._loading.setdefault(conversation_id, [0, 0])
+            loading[0] += 1
+            return loading[1]
+
+    def finish_load(self, conversation_id: str, token: int, rows: Iterable, complete: bool):
+        """
+        Caches rows read from the database (chronological order) unless a write raced the load.
+
+        `complete` means `rows` are the conversation's latest `capacity` messages, or all of them.
+        """
+        messages = [CachedMessage.from_row(row) for row in rows]
+        with self._lock:
+            loading = self._loading[conversation_id]
+            raced = loading[1] != token
+            loading[0] -= 1
+            if loading[0] == 0:
+                del self._loading[conversation_id]
+
+            if raced or not complete or conversation_id in self._entries:
+                return
+            entry = _Entry(self.capacity)
+            self._entries[conversation_id] = entry
+            self._append(entry, messages)
+            self._evict()
+
+    def append(self, conversation_id: str, rows: Iterable):
+        """Adds newly written messages to the conversation's buffer, if it is cached."""
+        messages = [CachedMessage.from_row(row) for row in rows]
+        with self._lock:
+            loading = self._loading.get(conversation_id)
+            if loading is not None:
+                loading[1] += 1
+
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            self._entries.move_to_end(conversation_id)
+            self._append(entry, messages)
+            self._evict()
+
+    def _append(self, entry: _Entry, messages: List[CachedMessage]):
+        for message in messages:
+            if len(entry.messages) == entry.messages.maxlen:
+                dropped = entry.messages[0].size
+                entry.size -= dropped
+                self._bytes -= dropped
+            entry.messages.append(message)
+            entry.size += message.size
+            self._bytes += message.size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_conversations or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def invalidate(self, conversation_id: str):
+        """Drops a conversation's buffer (and voids loads in flight for it)."""
+        with self._lock:
+            loading = self._loading.get(conversation_id)
+            if loading is not None:
+                loading[1] += 1
+            entry = self._entries.pop(conversation_id, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self):
+        """Drops every buffer."""
+        with self._lock:
+            for loading in self._loading.values():
+                loading[1] += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and memory usage for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "conversations": len(self._entries),
+            "max_conversations": self.max_conversations,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -1,6 +1,21 @@
+import asyncio
 import logging
-import openai
-from config import OPENAI_API_KEY
+import time
+from typing import Optional
+from app.services.embeddings import HashingEmbeddingProvider
+from app.services.model_cascade import EscalationPolicy, ModelCascade
+from app.services.openai_clients import chat_upstream, openai_client, openai_error
+from app.services.prompt_builder import NO_POLICY_CONTEXT, POLICY_SEPARATOR, POLICY_UNAVAILABLE, ROLES, Prompt, PromptBuilder
+from app.services.resilience import UpstreamUnavailable
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from config import (
+    RESPONSE_CACHE_AGENTS, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+    PROMPT_TOKEN_BUDGETS, PROMPT_TOKEN_BUDGET_DEFAULT, PROMPT_HISTORY_RESERVE_TOKENS,
+    CONVERSATION_SUMMARY_MODEL, CONVERSATION_SUMMARY_MAX_TOKENS,
+    LLM_DEFAULT_MODEL, LLM_MODEL_CASCADES, CASCADE_MIN_RESPONSE_CHARS, CASCADE_ESCALATION_MARKERS, CASCADE_REFUSAL_PATTERN,
+    CASCADE_LATENCY_BUDGET_SECONDS, CASCADE_STREAM_PEEK_CHARS
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
@@ -59,10 +74,154 @@ class LLMService:
         """
     }
 
+    SUMMARY_PROMPT = """You maintain the running summary of a customer service conversation.
+        - Merge the new messages into the current summary; never drop facts that are still relevant.
+        - Keep what the agent may need later: the customer's goal, products, order numbers, steps already tried, promises made, and open questions.
+        - Be concise and factual, in the third person. Do not add anything that was not said.
+        - Reply with the updated summary only.
+        """
+
+    # Sent when the last tier fails (retries exhausted, circuit open, or out of time)
+    FALLBACK_RESPONSE = "I'm sorry, I can't complete your request right now. Please try again in a few minutes."
+    FALLBACK_POLICY_RESPONSE = "I'm sorry, I can't give you a full answer right now. Here is the policy that applies to your request:\n\n{policy}"
+
     def __init__(self):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        # Cache completions for repeated (agent, input, policy context) turns
+        self.response_cache = ResponseCache(
+            max_size=RESPONSE_CACHE_SIZE,
+            ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+            agents=RESPONSE_CACHE_AGENTS,
+            semantic_threshold=RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+            embed_fn=HashingEmbeddingProvider().embed
+        )
+
+        # Identical turns arriving together share one completion call
+        self.completion_flight = SingleFlight("completions")
+
+        # Prompts are packed into a per-model token budget
+        self.prompt_builder = PromptBuilder(PROMPT_TOKEN_BUDGETS, PROMPT_TOKEN_BUDGET_DEFAULT, PROMPT_HISTORY_RESERVE_TOKENS)
+
+        # Per-agent model cascades: a cheap model answers first and escalates to a larger one on demand
+        self.escalation_policy = EscalationPolicy(
+            min_response_chars=CASCADE_MIN_RESPONSE_CHARS,
+            markers=CASCADE_ESCALATION_MARKERS,
+            refusal_pattern=CASCADE_REFUSAL_PATTERN or None,
+            latency_budget=CASCADE_LATENCY_BUDGET_SECONDS or None
+        )
+        self.cascades = {agent: ModelCascade(agent, models, self.escalation_policy) for agent, models in LLM_MODEL_CASCADES.items()}
+
+    def cascade_stats(self) -> dict:
+        """Per-agent, per-tier latency and escalation counters."""
+        return {key: cascade.stats() for key, cascade in self.cascades.items()}
+
+    @property
+    def client(self):
+        return openai_client()
+
+    @property
+    def async_client(self):
+        return openai_client(async_client=True)
+
+    def build_prompt(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.",
+                     history=None, model: str = LLM_DEFAULT_MODEL, summary: Optional[str] = None, instruction: str = "") -> Prompt:
+        """Builds the chat messages (system prompt + policy context + conversation summary + history + user input) within the model's token budget."""
+        system_prompt = self.SYSTEM_PROMPTS.get(agent_type, "You are an AI assistant. Provide helpful and professional responses.")
+        return self.prompt_builder.build(model, system_prompt + instruction, user_input, policy_context, history, summary)
+
+    def build_messages(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.",
+                       history=None, model: str = LLM_DEFAULT_MODEL, summary: Optional[str] = None):
+        """Chat messages for a request (see `build_prompt`)."""
+        return self.build_prompt(agent_type, user_input, policy_context, history, model, summary).messages
+
+    def warm_prompts(self, models=None):
+        """Loads the tokenizers and counts the system prompts before the first request."""
+        models = models or sorted({model for cascade in self.cascades.values() for model in cascade.models} | {LLM_DEFAULT_MODEL})
+        self.prompt_builder.warm(models, list(self.SYSTEM_PROMPTS.values()))
+
+    def fallback_response(self, policy_context: Optional[str] = None) -> str:
+        """Reply used while the completions API is unavailable: the most relevant retrieved policy, quoted verbatim."""
+        policies = [policy for policy in (policy_context or "").split(POLICY_SEPARATOR)
+                    if policy.strip() and policy not in (NO_POLICY_CONTEXT, POLICY_UNAVAILABLE, "No specific policies applied.")]
+        return self.FALLBACK_POLICY_RESPONSE.format(policy=policies[0].strip()) if policies else self.FALLBACK_RESPONSE
 
-    def generate_response(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.", model: str = "gpt-4", temperature: float = 0.5):
+    def _failed(self, cascade: ModelCascade, tier: int, error: Exception) -> Optional[str]:
+        """Why a failed tier call is escalated, or None on the last tier (which then falls back)."""
+        if cascade.is_final(tier):
+            logger.error(f"❌ OpenAI API error: {error}")
+            return None
+        return "latency" if chat_upstream.is_timeout(error.__cause__ or error) else "error"
+
+    def cascade_for(self, agent_type: str, model: Optional[str] = None) -> ModelCascade:
+        """The agent's model cascade, or a single tier when the caller asks for a specific model."""
+        key = agent_type if model is None else f"{agent_type}:{model}"
+        cascade = self.cascades.get(key)
+        if cascade is None:
+            cascade = self.cascades.setdefault(key, ModelCascade(agent_type, [model or LLM_DEFAULT_MODEL], self.escalation_policy))
+        return cascade
+
+    def _tier_prompt(self, cascade: ModelCascade, tier: int, agent_type, user_input, policy_context, history, summary) -> Prompt:
+        return self.build_prompt(agent_type, user_input, policy_context, history, cascade.models[tier], summary, cascade.instruction(tier))
+
+    @staticmethod
+    def _report(report: Optional[dict], prompt: Prompt):
+        if report is not None:
+            report.update(prompt.tokens)
+
+    def _cacheable(self, agent_type: str, prompt: Prompt) -> bool:
+        """
+        Only prompts without conversation history (or its summary) are cached.
+
+        A reply that depends on earlier turns may only be reused for the exact same
+        conversation, which practically never repeats, so caching those would just
+        evict reusable first-turn answers. (Single-flight still keys on the history.)
+        """
+        return not prompt.conversational and self.response_cache.enabled_for(agent_type)
+
+    def _cached_response(self, agent_type, user_input, prompt, model, temperature, use_cache):
+        """Returns a cached response when caching applies to this prompt and wasn't bypassed."""
+        if not (use_cache and self._cacheable(agent_type, prompt)):
+            return None
+        return self.response_cache.get(agent_type, model, temperature, user_input, prompt.cache_context)
+
+    def _store_response(self, agent_type, user_input, prompt, model, temperature, response_text):
+        """Caches a successful response (bypassed requests still refresh the cache)."""
+        if response_text and self._cacheable(agent_type, prompt):
+            self.response_cache.set(agent_type, model, temperature, user_input, prompt.cache_context, response_text)
+
+    def _cascade(self, cascade: ModelCascade, prompt: Prompt, agent_type, user_input, policy_context, history, summary,
+                 temperature, report):
+        """
+        Walks the tiers of a completion cascade, shared by the sync and async paths.
+
+        A generator: it yields `(model, prompt, timeout, retry)` for each tier
+        call, is sent back the completion or the API error, and returns the
+        reply (a tier's accepted answer, or the fallback when the last tier
+        fails). Escalation checks, per-tier stats, the token report and the
+        response cache are handled here.
+        """
+        for tier, tier_model in enumerate(cascade.models):
+            tier_prompt = prompt if tier == 0 else self._tier_prompt(cascade, tier, agent_type, user_input, policy_context, history, summary)
+            start = time.perf_counter()
+            result = yield tier_model, tier_prompt, cascade.latency_budget(tier), cascade.is_final(tier)
+            if isinstance(result, Exception):
+                reason = self._failed(cascade, tier, result)
+                if reason is None:
+                    cascade.record(tier_model, time.perf_counter() - start, "failed")
+                    return self.fallback_response(policy_context)
+            else:
+                choice = result.choices[0]
+                response_text = choice.message.content
+                reason = None if cascade.is_final(tier) else cascade.policy.reason(response_text, choice.finish_reason)
+
+            cascade.record(tier_model, time.perf_counter() - start, reason or "answered")
+            if reason is None:
+                self._report(report, tier_prompt)
+                self._store_response(agent_type, user_input, prompt, cascade.name, temperature, response_text)
+                return response_text
+            logger.info(f"↗️ Escalating {agent_type} turn from {tier_model} ({reason})")
+
+    def generate_response(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.", model: Optional[str] = None, temperature: float = 0.5, use_cache: bool = True,
+                          history=None, report: Optional[dict] = None, summary: Optional[str] = None):
         """
         Generates a response from OpenAI's LLM while enforcing professionalism and patience.
 
@@ -70,28 +229,211 @@ class LLMService:
             agent_type (str): The type of agent (e.g., 'customer_support', 'sales', 'tech_support').
             user_input (str): The customer's message.
             policy_context (str): Specific policy instructions for the agent.
-            model (str): The LLM model to use (default: gpt-4).
+            model (str): The LLM model to use (default: the agent's model cascade, see `LLM_MODEL_CASCADES`).
             temperature (float): Controls randomness (default: 0.5).
+            use_cache (bool): Set to False to bypass the response cache lookup.
+            history: Recent conversation messages (oldest first), packed newest first into the token budget.
+            summary (str): Rolling summary of the turns older than `history`.
+            report (dict): Filled with the prompt's token breakdown, if given.
 
         Returns:
             str: The AI-generated response.
         """
-        system_prompt = self.SYSTEM_PROMPTS.get(agent_type, "You are an AI assistant. Provide helpful and professional responses.")
+        cascade = self.cascade_for(agent_type, model)
+        prompt = self._tier_prompt(cascade, 0, agent_type, user_input, policy_context, history, summary)
+        self._report(report, prompt)
+        cached = self._cached_response(agent_type, user_input, prompt, cascade.name, temperature, use_cache)
+        if cached is not None:
+            return cached
+
+        def complete():
+            steps = self._cascade(cascade, prompt, agent_type, user_input, policy_context, history, summary, temperature, report)
+            tier_model, tier_prompt, budget, retry = next(steps)
+            while True:
+                try:
+                    # Escalating tiers get one attempt within their latency budget; the last tier retries
+                    result = chat_upstream.call_sync(lambda timeout: self.client.chat.completions.create(
+                        model=tier_model,
+                        messages=tier_prompt.messages,
+                        temperature=temperature,
+                        timeout=timeout
+                    ), timeout=budget, retry=retry)
+                except (UpstreamUnavailable, openai_error()) as e:
+                    result = e
+                try:
+                    tier_model, tier_prompt, budget, retry = steps.send(result)
+                except StopIteration as done:
+                    return done.value
+
+        flight_key = self.response_cache.make_key(agent_type, cascade.name, temperature, user_input, prompt.cache_context)
+        return self.completion_flight.do_sync(flight_key, complete)
+
+    async def agenerate_response(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.", model: Optional[str] = None, temperature: float = 0.5, use_cache: bool = True,
+                                 history=None, report: Optional[dict] = None, summary: Optional[str] = None):
+        """
+        Async variant of `generate_response`.
+
+        Uses `openai.AsyncOpenAI`, so the event loop keeps serving other
+        conversations while the completion is in flight.
+        """
+        cascade = self.cascade_for(agent_type, model)
+        prompt = self._tier_prompt(cascade, 0, agent_type, user_input, policy_context, history, summary)
+        self._report(report, prompt)
+        cached = self._cached_response(agent_type, user_input, prompt, cascade.name, temperature, use_cache)
+        if cached is not None:
+            return cached
+
+        async def complete():
+            steps = self._cascade(cascade, prompt, agent_type, user_input, policy_context, history, summary, temperature, report)
+            tier_model, tier_prompt, budget, retry = next(steps)
+            while True:
+                try:
+                    result = await chat_upstream.call(lambda timeout: self.async_client.chat.completions.create(
+                        model=tier_model,
+                        messages=tier_prompt.messages,
+                        temperature=temperature,
+                        timeout=timeout
+                    ), timeout=budget, retry=retry)
+                except (UpstreamUnavailable, openai_error()) as e:
+                    result = e
+                try:
+                    tier_model, tier_prompt, budget, retry = steps.send(result)
+                except StopIteration as done:
+                    return done.value
+
+        flight_key = self.response_cache.make_key(agent_type, cascade.name, temperature, user_input, prompt.cache_context)
+        return await self.completion_flight.do(flight_key, complete)
+
+    async def _apeek(self, stream, budget: Optional[float]):
+        """
+        Reads the start of a streamed reply: `CASCADE_STREAM_PEEK_CHARS` characters,
+        or up to the end of the stream (then also returns its finish reason).
+        Raises `asyncio.TimeoutError` once `budget` seconds have passed.
+        """
+        deadline = time.perf_counter() + budget if budget else None
+        chunks, iterator = [], stream.__aiter__()
+        while sum(map(len, chunks)) < CASCADE_STREAM_PEEK_CHARS:
+            next_chunk = iterator.__anext__()
+            try:
+                chunk = await (asyncio.wait_for(next_chunk, deadline - time.perf_counter()) if deadline else next_chunk)
+            except StopAsyncIteration:
+                return chunks, iterator, True, None
+            if chunk.choices:
+                if chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                if chunk.choices[0].finish_reason:
+                    return chunks, iterator, True, chunk.choices[0].finish_reason
+        return chunks, iterator, False, None
+
+    async def astream_response(self, agent_type: str, user_input: str, policy_context: str = "No specific policies applied.", model: Optional[str] = None, temperature: float = 0.5, use_cache: bool = True,
+                               history=None, report: Optional[dict] = None, summary: Optional[str] = None):
+        """
+        Streams the LLM response token by token.
+
+        On a tier that can escalate, the start of the reply is held back until
+        it can be judged (escalation marker, refusal, or a cut-off short reply),
+        so a discarded answer never reaches the client.
+
+        Yields:
+            str: Content deltas as they arrive from OpenAI's streaming API
+            (a cached response is yielded as a single chunk).
+        """
+        cascade = self.cascade_for(agent_type, model)
+        prompt = self._tier_prompt(cascade, 0, agent_type, user_input, policy_context, history, summary)
+        self._report(report, prompt)
+        cached = self._cached_response(agent_type, user_input, prompt, cascade.name, temperature, use_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        for tier, tier_model in enumerate(cascade.models):
+            tier_prompt = prompt if tier == 0 else self._tier_prompt(cascade, tier, agent_type, user_input, policy_context, history, summary)
+            budget = cascade.latency_budget(tier)
+            start = time.perf_counter()
+            chunks, streamed, stream = [], False, None
+            try:
+                # A stream is never hedged: its tokens may already be on their way to the client
+                stream = await chat_upstream.call(lambda timeout: self.async_client.chat.completions.create(
+                    model=tier_model,
+                    messages=tier_prompt.messages,
+                    temperature=temperature,
+                    stream=True,
+                    timeout=timeout
+                ), timeout=budget, retry=cascade.is_final(tier), hedge=False)
+                iterator = stream
+                if not cascade.is_final(tier):
+                    chunks, iterator, finished, finish_reason = await self._apeek(stream, budget and budget - (time.perf_counter() - start))
+                    text = "".join(chunks)
+                    reason = cascade.policy.reason(text, finish_reason) if finished else cascade.policy.early_reason(text)
+                    if reason is not None:
+                        cascade.record(tier_model, time.perf_counter() - start, reason)
+                        logger.info(f"↗️ Escalating {agent_type} turn from {tier_model} ({reason})")
+                        continue
 
+                self._report(report, tier_prompt)
+                streamed = True
+                for chunk in chunks:
+                    yield chunk
+                async for chunk in iterator:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunks.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                cascade.record(tier_model, time.perf_counter() - start)
+                self._store_response(agent_type, user_input, prompt, cascade.name, temperature, "".join(chunks))
+                return
+
+            except asyncio.TimeoutError:
+                cascade.record(tier_model, time.perf_counter() - start, "latency")
+                logger.info(f"↗️ Escalating {agent_type} turn from {tier_model} (latency)")
+            except (UpstreamUnavailable, openai_error()) as e:
+                reason = None if streamed else self._failed(cascade, tier, e)  # Tokens already sent can't be taken back
+                if reason is None:
+                    cascade.record(tier_model, time.perf_counter() - start, "failed")
+                    if streamed:
+                        logger.error(f"❌ OpenAI API error mid-stream: {e}")
+                        yield "\n\n⚠️ The response was interrupted. Please try again."
+                    else:
+                        yield self.fallback_response(policy_context)
+                    return
+                cascade.record(tier_model, time.perf_counter() - start, reason)
+                logger.info(f"↗️ Escalating {agent_type} turn from {tier_model} ({reason})")
+            finally:
+                # Escalated, timed out, failed or abandoned by the client: stop the upstream generation and free the connection
+                if stream is not None:
+                    await self._aclose(stream)
+
+    @staticmethod
+    async def _aclose(stream):
+        """Closes a completion stream (`AsyncStream.close`, or `aclose` for plain async generators)."""
+        close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+        if close is None:
+            return
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": f"{system_prompt}\n\nPolicy Context: {policy_context}"},
-                    {"role": "user", "content": user_input}
-                ],
-                temperature=temperature
-            )
-            return response.choices[0].message.content
-
-        except openai.OpenAIError as e:
-            logger.error(f"❌ OpenAI API error: {e}")
-            return "⚠️ Error: Unable to generate a response at the moment."
+            await close()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close completion stream: {e}")
+
+    async def asummarize(self, summary: Optional[str], messages, model: str = CONVERSATION_SUMMARY_MODEL,
+                         max_tokens: int = CONVERSATION_SUMMARY_MAX_TOKENS) -> str:
+        """
+        Folds `messages` (oldest first) into the rolling conversation `summary`.
+
+        `max_tokens` bounds the summary, so prompts that include it stay the same
+        size however long the conversation gets. API errors are raised, so a
+        failed update never overwrites the stored summary.
+        """
+        transcript = "\n".join(f"{ROLES.get(msg.sender, 'user')}: {msg.content}" for msg in messages)
+        response = await chat_upstream.call(lambda timeout: self.async_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": self.SUMMARY_PROMPT},
+                {"role": "user", "content": f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0,
+            max_tokens=max_tokens,
+            timeout=timeout
+        ))
+        return (response.choices[0].message.content or "").strip()
 
 # Singleton instance
 llm_service = LLMService()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Awaitable, Callable, List
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+class _Batch:
+    """Items collected for the next upstream call on one event loop."""
+
+    def __init__(self):
+        self.items = []  # (item, future, enqueued_at)
+        self.timer = None
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item calls into one batched upstream call.
+
+    The first `submit` opens a batch and starts a `window_ms` timer; every
+    `submit` until the timer fires (or until `max_batch_size` items are
+    waiting) joins that batch. `batch_fn` is then called once with all items
+    and each caller receives its own result, or the batch's exception.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]], window_ms: float = 5.0,
+                 max_batch_size: int = 64, name: str = "batch"):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._batches = weakref.WeakKeyDictionary()  # event loop -> open _Batch
+
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch_size = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """Adds one item to the open batch and waits for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._batches.get(loop)
+        if batch is None:
+            batch = self._batches[loop] = _Batch()
+            batch.timer = loop.call_later(self.window, self._dispatch, loop)
+        batch.items.append((item, future, time.perf_counter()))
+
+        if len(batch.items) >= self.max_batch_size:
+            self._dispatch(loop)
+
+        return await future
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop):
+        """Closes the open batch and sends it upstream in the background."""
+        batch = self._batches.pop(loop, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        loop.create_task(self._run(batch.items))
+
+    async def _run(self, items: list):
+        dispatched_at = time.perf_counter()
+        delays = [dispatched_at - enqueued_at for _, _, enqueued_at in items]
+        self.batches += 1
+        self.items += len(items)
+        self.max_seen_batch_size = max(self.max_seen_batch_size, len(items))
+        self.total_delay += sum(delays)
+        self.max_delay = max(self.max_delay, max(delays))
+
+        try:
+            results = await self.batch_fn([item for item, _, _ in items])
+            if len(results) != len(items):
+                raise ValueError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+        except Exception as e:
+            logger.error(f"❌ {self.name} batch of {len(items)} failed: {e}")
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(items, results):
+            if not future.done():  # The caller may have been cancelled meanwhile
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """Batch sizes and the queueing delay added while waiting for a batch to fill."""
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.max_seen_batch_size,
+            "avg_queue_delay_ms": round(self.total_delay / self.items * 1000.0, 3) if self.items else 0.0,
+            "max_queue_delay_ms": round(self.max_delay * 1000.0, 3)
+        }
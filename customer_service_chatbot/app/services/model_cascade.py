@@ -0,0 +1,109 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Appended to the system prompt of every tier that can escalate, so the model can hand off explicitly
+ESCALATION_INSTRUCTION = (
+    "\n\nIf the request conflicts with the policy context, needs information or authority you don't have, "
+    "or you are not confident in the answer, reply with exactly: {marker}"
+)
+
+@dataclass
+class EscalationPolicy:
+    """
+    Signals that a tier's answer should be retried on the next, larger model.
+
+    - `length`: the reply was cut off (`finish_reason == "length"`) or is shorter than `min_response_chars`.
+    - `policy_conflict`: the reply contains an escalation marker (the model was told to answer with one).
+    - `refusal`: the reply matches `refusal_pattern`.
+    - `latency`: the tier took longer than `latency_budget` seconds (enforced by the caller).
+    - `error`: the API call failed.
+    """
+    min_response_chars: int = 1
+    markers: Tuple[str, ...] = ("ESCALATE",)
+    refusal_pattern: Optional[str] = None
+    latency_budget: Optional[float] = None
+    _refusal: Optional[re.Pattern] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self._refusal = re.compile(self.refusal_pattern, re.IGNORECASE) if self.refusal_pattern else None
+
+    @property
+    def instruction(self) -> str:
+        return ESCALATION_INSTRUCTION.format(marker=self.markers[0]) if self.markers else ""
+
+    def reason(self, text: Optional[str], finish_reason: Optional[str] = None) -> Optional[str]:
+        """Why `text` should be escalated, or None to accept it."""
+        text = (text or "").strip()
+        if finish_reason == "length" or len(text) < self.min_response_chars:
+            return "length"
+        if any(marker in text for marker in self.markers):
+            return "policy_conflict"
+        if self._refusal is not None and self._refusal.search(text):
+            return "refusal"
+        return None
+
+    def early_reason(self, prefix: str) -> Optional[str]:
+        """Escalation signals that can be decided from the start of a streamed reply."""
+        prefix = prefix.strip()
+        if any(marker in prefix for marker in self.markers):
+            return "policy_conflict"
+        if self._refusal is not None and self._refusal.search(prefix):
+            return "refusal"
+        return None
+
+class ModelCascade:
+    """
+    Models of one agent, cheapest first.
+
+    Every tier but the last answers with the escalation instruction in its
+    system prompt; an answer that trips the `policy` moves on to the next tier,
+    and the last tier's answer is always accepted. Per-tier latency and
+    escalation counts are kept for `/metrics`.
+    """
+
+    def __init__(self, agent: str, models: Sequence[str], policy: EscalationPolicy):
+        if not models:
+            raise ValueError(f"Model cascade for '{agent}' has no models")
+        self.agent = agent
+        self.models: List[str] = list(models)
+        self.policy = policy
+        self.name = ">".join(self.models)  # Part of response cache keys
+
+        self._tiers: Dict[str, List[float]] = {model: [0, 0.0, 0.0] for model in self.models}  # calls, total, max seconds
+        self.outcomes: Counter = Counter()  # (model, "answered" | "failed" | escalation reason) -> count
+
+    def is_final(self, tier: int) -> bool:
+        return tier == len(self.models) - 1
+
+    def latency_budget(self, tier: int) -> Optional[float]:
+        return None if self.is_final(tier) else self.policy.latency_budget
+
+    def instruction(self, tier: int) -> str:
+        return "" if self.is_final(tier) else self.policy.instruction
+
+    def record(self, model: str, seconds: float, outcome: str = "answered"):
+        """Records one tier call: "answered", "failed" (last tier only), or the reason it was escalated."""
+        stats = self._tiers[model]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        self.outcomes[(model, outcome)] += 1
+
+    def stats(self) -> dict:
+        """Per-tier call latency, answers and escalations (by reason)."""
+        tiers = {}
+        for model, (calls, total, longest) in self._tiers.items():
+            escalated = {outcome: count for (tier, outcome), count in self.outcomes.items() if tier == model}
+            answered, failed = escalated.pop("answered", 0), escalated.pop("failed", 0)
+            tiers[model] = {
+                "calls": calls,
+                "answered": answered,
+                "failed": failed,
+                "escalated": escalated,
+                "escalation_rate": round(sum(escalated.values()) / calls, 4) if calls else 0.0,
+                "avg_ms": round(total / calls * 1000, 3) if calls else 0.0,
+                "max_ms": round(longest * 1000, 3)
+            }
+        return {"models": self.models, "tiers": tiers}
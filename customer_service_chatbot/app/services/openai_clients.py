@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from app.services.resilience import CircuitBreaker, ResilientCaller, RetryPolicy
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_TIMEOUT_SECONDS, OPENAI_MAX_ATTEMPTS, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY,
+    OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RECOVERY_SECONDS, OPENAI_HEDGE_EMBEDDINGS, OPENAI_HEDGE_COMPLETIONS,
+    OPENAI_HEDGE_QUANTILE
+)
+
+# Importing `openai` takes about half a second, so clients are created on first use instead of at import
+_clients = {}
+_lock = threading.Lock()
+
+def openai_client(async_client: bool = False):
+    """The shared OpenAI client (`openai.OpenAI`, or `openai.AsyncOpenAI` with `async_client=True`)."""
+    key = "async" if async_client else "sync"
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import openai
+                client_class = openai.AsyncOpenAI if async_client else openai.OpenAI
+                # Retries are handled by the upstream callers below (jittered, deadline-aware, behind a circuit breaker)
+                client = _clients[key] = client_class(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+                                                   timeout=OPENAI_TIMEOUT_SECONDS, max_retries=0)
+    return client
+
+def openai_error() -> type:
+    """`openai.OpenAIError`, for `except` clauses (evaluated only when an exception is raised)."""
+    import openai
+    return openai.OpenAIError
+
+def openai_timeout_error() -> type:
+    """`openai.APITimeoutError` (a subclass of `openai_error()`)."""
+    import openai
+    return openai.APITimeoutError
+
+def openai_timed_out(error: Exception) -> bool:
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError, openai_timeout_error()))
+
+def openai_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx responses are worth retrying; other API errors are not."""
+    import openai
+    return openai_timed_out(error) or isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+def upstream(name: str, hedge: bool) -> ResilientCaller:
+    return ResilientCaller(
+        name,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        retry=RetryPolicy(OPENAI_MAX_ATTEMPTS, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY),
+        breaker=CircuitBreaker(name, OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RECOVERY_SECONDS),
+        hedge=hedge,
+        hedge_quantile=OPENAI_HEDGE_QUANTILE,
+        retryable=openai_retryable,
+        timeout_error=openai_timed_out
+    )
+
+# ✅ One breaker per OpenAI endpoint: an embeddings outage doesn't stop completions, and vice versa
+chat_upstream = upstream("chat_completions", hedge=OPENAI_HEDGE_COMPLETIONS)
+embeddings_upstream = upstream("embeddings", hedge=OPENAI_HEDGE_EMBEDDINGS)
+
+def upstream_stats() -> dict:
+    return {caller.name: caller.stats() for caller in (chat_upstream, embeddings_upstream)}
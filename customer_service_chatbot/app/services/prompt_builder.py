@@ -0,0 +1,236 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+# Chat format overhead (OpenAI cookbook, gpt-3.5-turbo / gpt-4): per message, plus priming of the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Retrieved policy chunks never contain blank lines, so the joined context splits back into them losslessly
+POLICY_SEPARATOR = "\n\n"
+NO_POLICY_CONTEXT = "No relevant policy found."
+# Sent instead of policies when retrieval failed, so the model doesn't mistake missing policies for "none apply"
+POLICY_UNAVAILABLE = "Policy lookup is temporarily unavailable. Do not promise refunds, discounts or exceptions; offer to follow up instead."
+SUMMARY_HEADER = "\n\nSummary of the earlier conversation: "
+
+ROLES = {"user": "user", "bot": "assistant"}
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tiktoken encoding.
+
+    The encoding is loaded on first use (tiktoken downloads its BPE file the
+    first time; set TIKTOKEN_CACHE_DIR to ship it with the image). Without it,
+    counts fall back to a ~4 characters per token estimate, and `estimated` is True.
+    Counts of static texts such as system prompts are cached.
+    """
+
+    def __init__(self, model: str, use_tiktoken: bool = True):
+        self.model = model
+        self._encoding = None
+        self._loaded = not use_tiktoken
+        self._lock = threading.Lock()
+        self._static_counts: Dict[str, int] = {}
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"⚠️ tiktoken encoding for {self.model} unavailable, estimating token counts: {e}")
+            self._loaded = True
+
+    @property
+    def estimated(self) -> bool:
+        if not self._loaded:
+            self._load()
+        return self._encoding is None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.estimated:
+            return math.ceil(len(text) / 4)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def count_static(self, text: str) -> int:
+        """Token count of a text that never changes (computed once per counter)."""
+        count = self._static_counts.get(text)
+        if count is None:
+            count = self._static_counts[text] = self.count(text)
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` within `max_tokens`."""
+        if max_tokens <= 0:
+            return ""
+        if self.estimated:
+            return text[:max_tokens * 4]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+
+@dataclass
+class Prompt:
+    """Chat messages packed into a token budget, with the per-section token breakdown."""
+    messages: List[dict]
+    cache_context: str  # Everything besides the user input that shaped the prompt (for cache keys)
+    history_messages: int
+    tokens: dict = field(default_factory=dict)
+
+    @property
+    def conversational(self) -> bool:
+        """Whether earlier turns (raw messages or their summary) shaped the prompt."""
+        return bool(self.history_messages or self.tokens.get("summary"))
+
+class PromptBuilder:
+    """
+    Packs a system prompt, retrieved policies, the conversation summary and
+    history, and the user input into a per-model token budget.
+
+    Priority: the system prompt and the user input are always sent (the input
+    is truncated if it alone exceeds the budget). Policy snippets come next, in
+    retrieval rank order, but leave `history_reserve` tokens for the
+    conversation when there is one. The rolling summary of older turns follows
+    (cut short if it doesn't fit), and recent history fills what is left, newest
+    message first. Snippets and messages are included whole or dropped, never
+    cut mid-way.
+    """
+
+    def __init__(self, budgets: Dict[str, int], default_budget: int = 6000, history_reserve: int = 500,
+                 use_tiktoken: bool = True):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.history_reserve = history_reserve
+        self.use_tiktoken = use_tiktoken
+        self._counters: Dict[str, TokenCounter] = {}
+
+        self.prompts = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.dropped_policies = 0
+        self.dropped_history = 0
+        self.truncated_inputs = 0
+
+    def budget_for(self, model: str) -> int:
+        return self.budgets.get(model, self.default_budget)
+
+    def counter(self, model: str) -> TokenCounter:
+        counter = self._counters.get(model)
+        if counter is None:
+            counter = self._counters.setdefault(model, TokenCounter(model, use_tiktoken=self.use_tiktoken))
+        return counter
+
+    def build(self, model: str, system_prompt: str, user_input: str, policy_context: Optional[str] = None,
+              history: Optional[Sequence] = None, summary: Optional[str] = None) -> Prompt:
+        counter = self.counter(model)
+        budget = self.budget_for(model)
+
+        system_text = f"{system_prompt}\n\nPolicy Context: "
+        system_tokens = counter.count_static(system_text)
+        fixed = system_tokens + 2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+        user_tokens = counter.count(user_input)
+        truncated = fixed + user_tokens > budget
+        if truncated:
+            user_input = counter.truncate(user_input, budget - fixed)
+            user_tokens = counter.count(user_input)
+        remaining = budget - fixed - user_tokens
+
+        # ✅ Policies in rank order, keeping room for the conversation when there is one
+        history = [message for message in (history or []) if message.content]
+        policy_room = remaining - (min(self.history_reserve, remaining) if history or summary else 0)
+        snippets = [snippet.strip() for snippet in (policy_context or "").split(POLICY_SEPARATOR) if snippet.strip()]
+        packed_policies, policy_tokens = [], 0
+        for snippet in snippets:
+            cost = counter.count(snippet) + (counter.count_static(POLICY_SEPARATOR) if packed_policies else 0)
+            if policy_tokens + cost <= policy_room:
+                packed_policies.append(snippet)
+                policy_tokens += cost
+        policy_text = POLICY_SEPARATOR.join(packed_policies) or NO_POLICY_CONTEXT
+        if not packed_policies:
+            policy_tokens = counter.count_static(NO_POLICY_CONTEXT)
+        remaining -= policy_tokens
+
+        # ✅ Summary of the turns older than the history window
+        summary_text, summary_tokens = "", 0
+        if summary:
+            header_tokens = counter.count_static(SUMMARY_HEADER)
+            summary = counter.truncate(summary, remaining - header_tokens)
+            if summary:
+                summary_text = SUMMARY_HEADER + summary
+                summary_tokens = header_tokens + counter.count(summary)
+                remaining -= summary_tokens
+
+        # ✅ History newest first, whole messages only, then back in chronological order
+        packed_history, history_tokens = [], 0
+        for message in reversed(history):
+            cost = counter.count(message.content) + TOKENS_PER_MESSAGE
+            if history_tokens + cost > remaining:
+                break
+            packed_history.append({"role": ROLES.get(message.sender, "user"), "content": message.content})
+            history_tokens += cost
+        packed_history.reverse()
+
+        messages = [{"role": "system", "content": system_text + policy_text + summary_text}, *packed_history, {"role": "user", "content": user_input}]
+        total = fixed + policy_tokens + summary_tokens + history_tokens + user_tokens
+
+        tokens = {
+            "model": model,
+            "budget": budget,
+            "total": total,
+            "system": system_tokens,
+            "policies": policy_tokens,
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "user": user_tokens,
+            "overhead": fixed - system_tokens,
+            "policies_used": len(packed_policies),
+            "policies_dropped": len(snippets) - len(packed_policies),
+            "history_used": len(packed_history),
+            "history_dropped": len(history) - len(packed_history),
+            "user_truncated": truncated,
+            "estimated": counter.estimated
+        }
+        self._record(tokens)
+
+        history_key = "\n".join(f"{message['role']}: {message['content']}" for message in packed_history)
+        cache_context = policy_text + summary_text + (f"\x1e{history_key}" if history_key else "")
+        return Prompt(messages=messages, cache_context=cache_context, history_messages=len(packed_history), tokens=tokens)
+
+    def _record(self, tokens: dict):
+        self.prompts += 1
+        self.total_tokens += tokens["total"]
+        self.max_tokens = max(self.max_tokens, tokens["total"])
+        self.dropped_policies += tokens["policies_dropped"]
+        self.dropped_history += tokens["history_dropped"]
+        self.truncated_inputs += int(tokens["user_truncated"])
+
+    def warm(self, models: Sequence[str], static_texts: Sequence[str] = ()):
+        """Loads the tokenizers (and counts static texts) ahead of the first request."""
+        for model in models:
+            counter = self.counter(model)
+            for text in static_texts:
+                counter.count_static(f"{text}\n\nPolicy Context: ")
+
+    def stats(self) -> dict:
+        """Prompt sizes and how often budgets forced content out."""
+        return {
+            "prompts": self.prompts,
+            "avg_tokens": round(self.total_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "max_tokens": self.max_tokens,
+            "dropped_policies": self.dropped_policies,
+            "dropped_history": self.dropped_history,
+            "truncated_inputs": self.truncated_inputs,
+            "budgets": {**self.budgets, "default": self.default_budget}
+        }
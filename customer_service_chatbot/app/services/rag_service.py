@@ -1,100 +1,361 @@
+import asyncio
+import hashlib
 import logging
 import os
-import chromadb
-import openai
-from chromadb.utils import embedding_functions
-from llama_index.core import SimpleDirectoryReader
-from config import OPENAI_API_KEY
+import re
+import threading
+from app.services.bm25 import BM25Index, reciprocal_rank_fusion
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embeddings import get_embedding_provider
+from app.services.micro_batcher import MicroBatcher
+from app.services.single_flight import SingleFlight
+from app.services.vector_store import get_vector_store
+from config import (
+    EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL_SECONDS, EMBEDDING_CACHE_PATH, VECTOR_STORE_BACKEND, VECTOR_STORE_PATH,
+    EMBEDDING_PROVIDER, EMBEDDING_MODEL, HASHING_EMBEDDING_DIM, RAG_HYBRID_SEARCH, RAG_BM25_WEIGHT,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_CHARS, EMBEDDING_MICRO_BATCH_WINDOW_MS, EMBEDDING_MICRO_BATCH_MAX_SIZE
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
 logger = logging.getLogger(__name__)
 
+class PolicyRetrievalError(RuntimeError):
+    """Policies could not be retrieved (embedding backend or vector store failure)."""
+
 class RAGPolicyRetriever:
-    """Retrieves policies dynamically using ChromaDB-based similarity search."""
+    """
+    Retrieves policies dynamically using vector similarity search (ChromaDB or an
+    in-process NumPy index), optionally fused with a BM25 lexical index.
+    """
 
-    def __init__(self, policy_dir="app/policies/retrievable/"):
+    def __init__(self, policy_dir="app/policies/retrievable/", backend=VECTOR_STORE_BACKEND, db_path=VECTOR_STORE_PATH,
+                 embedding_provider=EMBEDDING_PROVIDER, hybrid_search=RAG_HYBRID_SEARCH, bm25_weight=RAG_BM25_WEIGHT):
         self.policy_dir = policy_dir
-        self.db_path = "chroma_db"
-        self.collection_name = "policy_embeddings"
+        self.db_path = db_path
+
+        # Initialize the embedding provider (OpenAI API or a fully local backend)
+        self.embedding_provider = get_embedding_provider(embedding_provider, model=EMBEDDING_MODEL, dim=HASHING_EMBEDDING_DIM)
+        self.embedding_model = self.embedding_provider.model_name
+
+        # Vectors from different providers aren't comparable, so each gets its own collection
+        self.collection_name = "policy_embeddings" if embedding_provider == "openai" else f"policy_embeddings_{self.embedding_model}"
 
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(path=self.db_path)
+        # The vector store (and the chromadb import) is opened on first use, not at import time
+        self.backend = backend
+        self._vector_store = None
 
-        # Ensure the collection exists
-        self.collection = self.client.get_or_create_collection(name=self.collection_name)
+        # BM25 over the same documents, fused with vector results when hybrid search is on
+        self.hybrid_search = hybrid_search
+        self.bm25_weight = bm25_weight
+        self.lexical_index = BM25Index()
 
-        # Initialize OpenAI API client
-        self.openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        # Cache query embeddings: support traffic repeats the same questions constantly
+        self.embedding_cache = EmbeddingCache(
+            max_size=EMBEDDING_CACHE_SIZE,
+            ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+            persist_path=EMBEDDING_CACHE_PATH
+        )
+
+        # Concurrent misses for the same query share one embeddings call
+        self.embedding_flight = SingleFlight("embeddings")
+
+        # Concurrent misses for different queries are grouped into one batched call (remote providers only)
+        self.embedding_batcher = MicroBatcher(
+            lambda texts: self.embedding_provider.aembed(texts),
+            window_ms=EMBEDDING_MICRO_BATCH_WINDOW_MS,
+            max_batch_size=EMBEDDING_MICRO_BATCH_MAX_SIZE,
+            name="embeddings"
+        ) if EMBEDDING_MICRO_BATCH_WINDOW_MS > 0 and self.embedding_provider.remote else None
 
         self.documents = []
+        self.chunk_ids = []
+        self._reload_lock = threading.Lock()
+        self._store_lock = threading.Lock()
+
+    @property
+    def vector_store(self):
+        """The vector store, opened on first use (the collection is created if it doesn't exist)."""
+        if self._vector_store is None:
+            with self._store_lock:
+                if self._vector_store is None:
+                    self._vector_store = get_vector_store(self.backend, path=self.db_path, collection_name=self.collection_name)
+        return self._vector_store
+
+    @staticmethod
+    def chunk_id(source: str, text: str) -> str:
+        """Content hash of a chunk: unchanged chunks keep their id, so they're never re-embedded."""
+        return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()[:32]
 
     def load_policies(self):
-        """Loads policies from .txt files into memory and removes empty ones."""
-        self.documents = []
-        reader = SimpleDirectoryReader(input_dir=self.policy_dir)
-        docs = reader.load_data()
+        """
+        Loads policies from .txt files and splits them into one chunk per policy section, dropping empty ones.
+
+        The chunks and a new BM25 index are built aside and swapped in at the end,
+        so concurrent searches see either the old index or the new one, never a
+        partly built one. Callers hold `_reload_lock`.
+        """
+        documents, chunk_ids = [], []
+        # Plain text files, read directly (no document-loader framework needed for .txt)
+        docs = {}
+        for entry in sorted(os.scandir(self.policy_dir), key=lambda entry: entry.name):
+            if entry.is_file() and not entry.name.startswith("."):
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    docs[entry.name] = f.read()
+        if not docs:
+            raise ValueError(f"No policy files found in {self.policy_dir}")
+
+        for source, text in docs.items():
+            # Sections ("Policy: ...") are separated by blank lines
+            for chunk in re.split(r"\n\s*\n", text):
+                chunk = chunk.strip()
+                if chunk:
+                    documents.append(chunk)
+                    chunk_ids.append(self.chunk_id(source, chunk))
+
+        lexical_index = BM25Index(self.lexical_index.k1, self.lexical_index.b)
+        lexical_index.build(documents)
+        self.documents, self.chunk_ids, self.lexical_index = documents, chunk_ids, lexical_index
 
-        # Filter out empty policies
-        self.documents = [doc.text.strip() for doc in docs if doc.text.strip()]
+        logger.info(f"✅ Loaded {len(self.documents)} policy chunks from {len(docs)} files after filtering empty ones.")
 
-        logger.info(f"✅ Loaded {len(self.documents)} policy documents after filtering empty files.")
+    def _embedding_batches(self, texts):
+        """Splits texts into batches that respect the embeddings API request-size limits."""
+        batch, batch_chars = [], 0
+        for text in texts:
+            if batch and (len(batch) >= EMBEDDING_BATCH_SIZE or batch_chars + len(text) > EMBEDDING_BATCH_MAX_CHARS):
+                yield batch
+                batch, batch_chars = [], 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            yield batch
 
     def create_vector_store(self):
-        """Creates ChromaDB vector store from policies."""
+        """
+        Incrementally syncs the vector store with the loaded policy chunks.
+
+        Only chunks whose content hash is not stored yet are embedded (in batches);
+        stored chunks that no longer exist are deleted. Re-ingest cost therefore
+        scales with the size of the change, not the size of the corpus.
+        """
         if not self.documents:
             raise ValueError("No policies found. Run `load_policies()` first.")
 
-        stored_data = self.collection.get(include=["documents"])
-        if stored_data and "documents" in stored_data and stored_data["documents"]:
-            logger.warning(f"⚠️ ChromaDB already contains {len(stored_data['documents'])} policies. Skipping reinsertion.")
-            return
+        stored_ids = set(self.vector_store.get_ids())
+        current = dict(zip(self.chunk_ids, self.documents))
 
-        doc_ids = [f"policy_{i}" for i in range(len(self.documents))]
+        new_ids = [chunk_id for chunk_id in current if chunk_id not in stored_ids]
+        stale_ids = [chunk_id for chunk_id in stored_ids if chunk_id not in current]
+        stats = {"added": 0, "deleted": len(stale_ids), "unchanged": len(current) - len(new_ids)}
 
         try:
-            logger.info(f"🟡 Sending {len(self.documents)} policies to OpenAI embeddings API")
-
-            embeddings_response = self.openai_client.embeddings.create(
-                input=self.documents,
-                model="text-embedding-ada-002"
-            )
+            if new_ids:
+                logger.info(f"🟡 Embedding {len(new_ids)} new or changed policy chunks with {self.embedding_model}")
+                new_docs = [current[chunk_id] for chunk_id in new_ids]
 
-            vector_embeddings = [data.embedding for data in embeddings_response.data]
+                offset = 0
+                for batch in self._embedding_batches(new_docs):
+                    vector_embeddings = self.embedding_provider.embed(batch)
+                    self.vector_store.add(
+                        ids=new_ids[offset:offset + len(batch)],
+                        documents=batch,
+                        embeddings=vector_embeddings
+                    )
+                    offset += len(batch)
+                    stats["added"] += len(batch)
 
-            self.collection.add(
-                ids=doc_ids,
-                documents=self.documents,
-                embeddings=vector_embeddings
-            )
+            # Delete after adding, so a failed embedding call never leaves the store empty
+            self.vector_store.delete(stale_ids)
 
-            logger.info(f"🟢 ChromaDB now contains {len(self.documents)} policies.")
+            logger.info(f"🟢 Vector store synced: {stats}")
         except Exception as e:
-            logger.error(f"❌ Error adding to ChromaDB: {str(e)}")
+            logger.error(f"❌ Error adding to vector store: {str(e)}")
+            stats["error"] = str(e)
+
+        return stats
+
+    def reload_policies(self):
+        """Re-reads the policy directory and applies only the changed chunks to the indexes."""
+        with self._reload_lock:
+            self.load_policies()
+            return self.create_vector_store()
+
+    def ensure_index(self):
+        """Loads the policies (building the BM25 index) and syncs the vector store with them."""
+        return self.reload_policies()
+
+    async def awatch_policies(self):
+        """Reloads the policies whenever a file in the policy directory changes (runs until cancelled)."""
+        from watchfiles import awatch
+
+        logger.info(f"👀 Watching {self.policy_dir} for policy changes")
+        async for changes in awatch(self.policy_dir):
+            logger.info(f"🔄 Policy files changed ({len(changes)}), reloading")
+            try:
+                await asyncio.to_thread(self.reload_policies)
+            except Exception as e:
+                logger.error(f"❌ Policy reload failed: {e}")
+
+    def _lexical(self) -> BM25Index:
+        """The BM25 index, loading the policies on first use (under the reload lock, so only one thread builds it)."""
+        if not self.lexical_index.documents:
+            with self._reload_lock:
+                if not self.lexical_index.documents:
+                    self.load_policies()
+        return self.lexical_index
+
+    def _rank(self, query, query_embedding, top_k, similarity_threshold):
+        """
+        Ranks policies for a query.
+
+        Vector matches below the threshold are dropped. With hybrid search on, the
+        remaining vector ranking is fused with the BM25 ranking; if the embedding
+        is unavailable (`query_embedding` is None), BM25 results are used alone.
+        """
+        vector_docs = []
+        if query_embedding is not None:
+            matches = self.vector_store.query(query_embedding, top_k=top_k)
+            vector_docs = [doc for doc, similarity in matches if similarity >= similarity_threshold]
+
+        if self.hybrid_search:
+            lexical_docs = [doc for doc, _ in self._lexical().query(query, top_k=top_k)]
+            filtered_docs = reciprocal_rank_fusion([vector_docs, lexical_docs], weights=[1.0, self.bm25_weight])[:top_k]
+        else:
+            filtered_docs = vector_docs
+
+        if not filtered_docs:
+            logger.warning("❌ No relevant policy found (below threshold).")
+            return ["No relevant policy found."]
+
+        logger.info(f"✅ Retrieved {len(filtered_docs)} policies above threshold.")
+        return filtered_docs
+
+    def embed_query(self, query: str):
+        """
+        Returns the query embedding, serving repeated queries from the cache.
+
+        Concurrent cache misses for the same normalized query are coalesced
+        into a single embeddings call.
+        """
+        cached = self.embedding_cache.get(query, self.embedding_model)
+        if cached is not None:
+            return cached
+
+        def fetch():
+            query_embedding = self.embedding_provider.embed([query])[0]
+            self.embedding_cache.set(query, self.embedding_model, query_embedding)
+            return query_embedding
+
+        return self.embedding_flight.do_sync(self.embedding_cache.make_key(query, self.embedding_model), fetch)
+
+    async def aembed_query(self, query: str):
+        """Async variant of `embed_query`."""
+        cached = self.embedding_cache.get(query, self.embedding_model)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            if self.embedding_batcher is not None:
+                query_embedding = await self.embedding_batcher.submit(query)
+            else:
+                query_embedding = (await self.embedding_provider.aembed([query]))[0]
+            self.embedding_cache.set(query, self.embedding_model, query_embedding)
+            return query_embedding
+
+        return await self.embedding_flight.do(self.embedding_cache.make_key(query, self.embedding_model), fetch)
+
+    async def aembed_queries(self, queries):
+        """
+        Embeddings for many queries, aligned with `queries`.
+
+        Cached queries are served from the cache; the distinct misses are
+        embedded together, one embeddings call per batch of up to
+        `EMBEDDING_BATCH_SIZE` texts, instead of one call per query.
+        """
+        embeddings = [self.embedding_cache.get(query, self.embedding_model) for query in queries]
+        misses = {}
+        for query, embedding in zip(queries, embeddings):
+            if embedding is None:
+                misses.setdefault(self.embedding_cache.make_key(query, self.embedding_model), query)
+
+        fetched = {}
+        for batch in self._embedding_batches(list(misses.values())):
+            for query, embedding in zip(batch, await self.embedding_provider.aembed(batch)):
+                self.embedding_cache.set(query, self.embedding_model, embedding)
+                fetched[self.embedding_cache.make_key(query, self.embedding_model)] = embedding
+
+        return [embedding if embedding is not None else fetched[self.embedding_cache.make_key(query, self.embedding_model)]
+                for query, embedding in zip(queries, embeddings)]
+
+    def _embedding_failed(self, error: Exception):
+        """Hybrid search degrades to BM25-only when the embedding backend fails; otherwise the error propagates."""
+        if not self.hybrid_search:
+            raise error
+        logger.warning(f"⚠️ Embedding failed, falling back to lexical retrieval: {error}")
+
+    def retrieve_policy(self, query, top_k=3, similarity_threshold=None):
+        """Retrieves relevant policies based on user query (raises `PolicyRetrievalError` when retrieval fails)."""
+        if similarity_threshold is None:
+            similarity_threshold = self.embedding_provider.similarity_threshold
 
-    def retrieve_policy(self, query, top_k=3, similarity_threshold=0.8):
-        """Retrieves relevant policies based on user query."""
         try:
-            query_embedding_response = self.openai_client.embeddings.create(
-                input=[query],
-                model="text-embedding-ada-002"
-            )
+            try:
+                query_embedding = self.embed_query(query)
+            except Exception as e:
+                self._embedding_failed(e)
+                query_embedding = None
 
-            query_embedding = query_embedding_response.data[0].embedding
+            return self._rank(query, query_embedding, top_k, similarity_threshold)
+        except Exception as e:
+            logger.error(f"❌ Error retrieving from vector store: {str(e)}")
+            raise PolicyRetrievalError(f"Error retrieving policy: {e}") from e
 
-            results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
+    async def aretrieve_policy(self, query, top_k=3, similarity_threshold=None):
+        """Async variant of `retrieve_policy`: awaits the embedding call and runs the search off the event loop."""
+        if similarity_threshold is None:
+            similarity_threshold = self.embedding_provider.similarity_threshold
 
-            retrieved_docs = results.get("documents", [[]])[0]
-            similarities = results.get("distances", [[]])[0]
+        try:
+            try:
+                query_embedding = await self.aembed_query(query)
+            except Exception as e:
+                self._embedding_failed(e)
+                query_embedding = None
 
-            filtered_docs = [doc for doc, similarity in zip(retrieved_docs, similarities) if similarity >= similarity_threshold]
+            return await asyncio.to_thread(self._rank, query, query_embedding, top_k, similarity_threshold)
+        except Exception as e:
+            logger.error(f"❌ Error retrieving from vector store: {str(e)}")
+            raise PolicyRetrievalError(f"Error retrieving policy: {e}") from e
+
+    async def aretrieve_policies(self, queries, top_k=3, similarity_threshold=None):
+        """
+        Batch variant of `aretrieve_policy`: embeds all queries in batched calls, returns one result list per query.
 
-            if not filtered_docs:
-                logger.warning("❌ No relevant policy found (below threshold).")
-                return ["No relevant policy found."]
+        Raises `PolicyRetrievalError` when the batch can't be embedded; a query whose
+        search fails gets None instead of a result list.
+        """
+        if similarity_threshold is None:
+            similarity_threshold = self.embedding_provider.similarity_threshold
 
-            logger.info(f"✅ Retrieved {len(filtered_docs)} policies above threshold.")
-            return filtered_docs
+        try:
+            query_embeddings = await self.aembed_queries(queries)
         except Exception as e:
-            logger.error(f"❌ Error retrieving from ChromaDB: {str(e)}")
-            return ["Error retrieving policy."]
\ No newline at end of file
+            try:
+                self._embedding_failed(e)
+            except Exception:
+                logger.error(f"❌ Error retrieving from vector store: {str(e)}")
+                raise PolicyRetrievalError(f"Error retrieving policy: {e}") from e
+            query_embeddings = [None] * len(queries)
+
+        def rank_all():
+            results = []
+            for query, query_embedding in zip(queries, query_embeddings):
+                try:
+                    results.append(self._rank(query, query_embedding, top_k, similarity_threshold))
+                except Exception as e:
+                    logger.error(f"❌ Error retrieving from vector store: {str(e)}")
+                    results.append(None)
+            return results
+
+        return await asyncio.to_thread(rank_all)
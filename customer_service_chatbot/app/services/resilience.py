@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class UpstreamUnavailable(Exception):
+    """An upstream call failed for good: retries exhausted, circuit open, or out of time."""
+
+class CircuitOpenError(UpstreamUnavailable):
+    """The upstream's circuit breaker is open, so the call was not attempted."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceeded(UpstreamUnavailable):
+    """The request deadline passed before the upstream answered."""
+
+# 🔹 Request deadlines
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Upstream calls made inside the block must finish by `deadline` (a `time.monotonic()` value; None for no deadline)."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request deadline (None without one)."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def is_timeout(error: Exception) -> bool:
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError))
+
+def is_transient(error: Exception) -> bool:
+    return is_timeout(error) or isinstance(error, ConnectionError)
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter (so clients don't retry in lockstep)."""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0, rng: Callable[[], float] = random.random):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+
+    def delay(self, retry: int) -> float:
+        """Sleep before the `retry`-th retry (1-based)."""
+        return self.rng() * min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+
+class CircuitBreaker:
+    """
+    Fails calls fast while an upstream is unhealthy.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open the
+    circuit. Open: calls are rejected for `recovery_seconds`. Half-open: one
+    trial call goes through; its success closes the circuit, its failure opens
+    it again. A trial that never reports back is replaced after `recovery_seconds`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.clock = clock
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if now - self.opened_at < self.recovery_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = "half_open"
+                self._trial_started = None
+            if self._trial_started is not None and now - self._trial_started < self.recovery_seconds:
+                self.rejected += 1
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"✅ Circuit '{self.name}' closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = self.clock()
+                self._trial_started = None
+                self.opened += 1
+                logger.warning(f"⚠️ Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures")
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call may go through."""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.recovery_seconds - (self.clock() - self.opened_at))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for hedging delays and monitoring."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class ResilientCaller:
+    """
+    Calls one upstream with timeouts, jittered retries, optional hedging and a circuit breaker.
+
+    Every attempt gets the smaller of `timeout` and the time left before the
+    request deadline (`deadline_scope`), and no retry starts once the deadline
+    would pass during its backoff. Only `retryable` errors (timeouts, connection
+    errors, rate limits, 5xx) are retried and count against the breaker (except
+    timeouts of attempts cut short by a caller's cap or the deadline); other
+    errors are raised as-is. Once retries are exhausted, the breaker is open
+    or the deadline passed, `UpstreamUnavailable` is raised.
+
+    With `hedge`, an attempt still running after the upstream's recent
+    `hedge_quantile` latency gets a second, identical request; whichever
+    answers first wins and the other is cancelled. Hedging only starts after
+    `hedge_min_samples` successful calls, and only for idempotent calls.
+    """
+
+    def __init__(self, name: str, timeout: float = 20.0, retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = False, hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 retryable: Callable[[Exception], bool] = is_transient, timeout_error: Callable[[Exception], bool] = is_timeout):
+        self.name = name
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.is_timeout = timeout_error
+        self.latency = LatencyWindow()
+
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.short_circuited = 0
+        self.deadline_exceeded = 0
+
+    def _admit(self):
+        self.calls += 1
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.name}: circuit open", self.breaker.retry_after())
+
+    def _attempt_timeout(self, cap: Optional[float]) -> float:
+        timeout = min(self.timeout, cap) if cap else self.timeout
+        left = remaining_time()
+        if left is not None:
+            if left <= 0:
+                self.deadline_exceeded += 1
+                raise DeadlineExceeded(f"{self.name}: request deadline exceeded")
+            timeout = min(timeout, left)
+        return timeout
+
+    def _failed(self, error: Exception, attempt: int, retry: bool, capped: bool) -> float:
+        """Records a failed attempt and returns the backoff before the next one (raises when there is none)."""
+        if not self.retryable(error):
+            self.breaker.record_success()  # The upstream answered; the request itself was bad
+            raise error
+        self.failures += 1
+        if not (capped and self.is_timeout(error)):
+            self.breaker.record_failure()  # A timeout we shortened says nothing about the upstream's health
+        if not retry or attempt >= self.retry.attempts:
+            raise UpstreamUnavailable(f"{self.name}: {error}") from error
+        delay = self.retry.delay(attempt)
+        left = remaining_time()
+        if left is not None and left <= delay:
+            self.deadline_exceeded += 1
+            raise DeadlineExceeded(f"{self.name}: request deadline exceeded after {error}") from error
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.name}: circuit open after {error}", self.breaker.retry_after()) from error
+        self.retries += 1
+        logger.warning(f"⚠️ {self.name} attempt {attempt} failed ({error}); retrying in {delay:.2f}s")
+        return delay
+
+    def _succeeded(self, seconds: float):
+        self.breaker.record_success()
+        self.latency.add(seconds)
+
+    async def call(self, fn: Callable[[float], Awaitable[T]], timeout: Optional[float] = None, retry: bool = True,
+                   hedge: Optional[bool] = None) -> T:
+        """Awaits `fn(timeout)` (a fresh call per attempt); `timeout` caps each attempt, `retry=False` allows one attempt."""
+        self._admit()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_timeout = self._attempt_timeout(timeout)
+            start = time.monotonic()
+            try:
+                result = await self._attempt(fn, attempt_timeout, self.hedge if hedge is None else hedge)
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt, retry, attempt_timeout < self.timeout))
+                continue
+            self._succeeded(time.monotonic() - start)
+            return result
+
+    async def _attempt(self, fn: Callable[[float], Awaitable[T]], timeout: float, hedge: bool) -> T:
+        delay = self.latency.percentile(self.hedge_quantile) if hedge and len(self.latency) >= self.hedge_min_samples else None
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(fn(timeout), timeout)
+
+        deadline = time.monotonic() + timeout
+        first = asyncio.ensure_future(fn(timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        second = asyncio.ensure_future(fn(max(0.001, deadline - time.monotonic())))
+        pending = {first, second}
+        try:
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is second
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (first, second):
+                if not task.done():
+                    task.cancel()
+
+    def call_sync(self, fn: Callable[[float], T], timeout: Optional[float] = None, retry: bool = True) -> T:
+        """Blocking variant of `call` (no hedging): `fn(timeout)` must enforce the timeout itself."""
+        self._admit()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_timeout = self._attempt_timeout(timeout)
+            start = time.monotonic()
+            try:
+                result = fn(attempt_timeout)
+            except Exception as e:
+                time.sleep(self._failed(e, attempt, retry, attempt_timeout < self.timeout))
+                continue
+            self._succeeded(time.monotonic() - start)
+            return result
+
+    def stats(self) -> dict:
+        """Call, retry, hedging and breaker counters, with recent latency percentiles."""
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "short_circuited": self.short_circuited,
+            "deadline_exceeded": self.deadline_exceeded,
+            "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "breaker": self.breaker.stats()
+        }
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+from app.services.embedding_cache import EmbeddingCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Cache of LLM completions keyed on agent, model, normalized user input and policy context.
+
+    Lookups first try an exact match on the canonicalized key. If a
+    `semantic_threshold` and `embed_fn` are configured, a miss then compares the
+    input's embedding with cached inputs that share the same agent, model and
+    policy context, and reuses the best answer above the threshold.
+    Entries expire after `ttl_seconds` and the least recently used are evicted
+    beyond `max_size`.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 3600, agents: Optional[Iterable[str]] = None,
+                 semantic_threshold: Optional[float] = None, embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.agents = set(agents) if agents is not None else None  # None = every agent
+        self.semantic_threshold = semantic_threshold
+        self.embed_fn = embed_fn
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (response, stored_at, scope, embedding)
+        self._scopes = {}  # scope -> set of keys sharing agent/model/policy context
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold is not None and self.embed_fn is not None
+
+    def enabled_for(self, agent_type: str) -> bool:
+        """Whether responses for this agent may be cached."""
+        return self.agents is None or agent_type in self.agents
+
+    @staticmethod
+    def _scope(agent_type: str, model: str, temperature: float, policy_context: str) -> str:
+        canonical = json.dumps([agent_type, model, temperature, policy_context.strip()], ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def make_key(self, agent_type: str, model: str, temperature: float, user_input: str, policy_context: str) -> str:
+        """Canonical cache key: everything that influences the completion, with the user input normalized."""
+        scope = self._scope(agent_type, model, temperature, policy_context)
+        return hashlib.sha256(f"{scope}\x1f{EmbeddingCache.normalize(user_input)}".encode("utf-8")).hexdigest()
+
+    def _embed(self, user_input: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn([EmbeddingCache.normalize(user_input)])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self.clock() - stored_at > self.ttl_seconds
+
+    def _remove(self, key: str):
+        _, _, scope, _ = self._entries.pop(key)
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+
+    def get(self, agent_type: str, model: str, temperature: float, user_input: str, policy_context: str) -> Optional[str]:
+        """Returns a cached response or None on a miss."""
+        key = self.make_key(agent_type, model, temperature, user_input, policy_context)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+
+            if not self.semantic_enabled:
+                self.misses += 1
+                return None
+
+            scope = self._scope(agent_type, model, temperature, policy_context)
+            candidates = list(self._scopes.get(scope, ()))
+
+        if candidates:
+            query_vector = self._embed(user_input)
+            with self._lock:
+                best_key, best_score = None, self.semantic_threshold
+                for candidate in candidates:
+                    entry = self._entries.get(candidate)
+                    if entry is None or self._expired(entry[1]):
+                        continue
+                    score = float(entry[3] @ query_vector)
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self._entries[best_key][0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, agent_type: str, model: str, temperature: float, user_input: str, policy_context: str, response: str):
+        """Stores a response, evicting the least recently used entries beyond `max_size`."""
+        key = self.make_key(agent_type, model, temperature, user_input, policy_context)
+        scope = self._scope(agent_type, model, temperature, policy_context)
+        embedding = self._embed(user_input) if self.semantic_enabled else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, self.clock(), scope, embedding)
+            self._scopes.setdefault(scope, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
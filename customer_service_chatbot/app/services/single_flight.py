@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _SyncCall:
+    """An in-flight synchronous call that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single upstream call.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it is in flight wait for and share its result or exception. Once the
+    call completes, the key is released and the next caller starts a new call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._async_calls: Dict[Hashable, asyncio.Task] = {}
+        self._sync_calls: Dict[Hashable, _SyncCall] = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits `fn()` once per key among concurrent async callers."""
+        task = self._async_calls.get(key)
+        if task is not None and not task.done():
+            with self._lock:
+                self.collapsed += 1
+        else:
+            # Run the call as its own task so a cancelled leader doesn't cancel its followers
+            task = asyncio.ensure_future(fn())
+            self._async_calls[key] = task
+            with self._lock:
+                self.calls += 1
+            task.add_done_callback(lambda finished: self._release(key, finished))
+
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter was cancelled
+
+    def do_sync(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Calls `fn()` once per key among concurrent threads."""
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SyncCall()
+                self._sync_calls[key] = call
+                self.calls += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._sync_calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Upstream calls made vs. calls collapsed into an in-flight one."""
+        total = self.calls + self.collapsed
+        return {
+            "upstream_calls": self.calls,
+            "collapsed_calls": self.collapsed,
+            "in_flight": len(self._async_calls) + len(self._sync_calls),
+            "collapse_rate": round(self.collapsed / total, 4) if total else 0.0
+        }
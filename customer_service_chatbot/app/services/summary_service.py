@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from app.services.conversation_service import conversation_service
+from app.services.llm_service import llm_service
+from app.services.resilience import deadline_scope
+from config import (
+    CONVERSATION_SUMMARY_ENABLED, CONVERSATION_SUMMARY_BATCH_MESSAGES, CONVERSATION_SUMMARY_CACHE_SIZE,
+    PROMPT_HISTORY_MESSAGES
+)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+SummaryState = Tuple[Optional[str], Optional[datetime]]  # (summary, timestamp of the newest folded message)
+
+class ConversationSummarizer:
+    """
+    Keeps a rolling summary of each conversation's older messages.
+
+    Prompts carry the last `recent_messages` messages verbatim plus this
+    summary, so their size stays flat however long a conversation runs. After
+    a turn is stored, `schedule` updates the summary in a background task, so
+    the reply is never delayed: the messages that left the recent window since
+    the last update are folded into the summary with one small LLM call, and
+    the result is stored on the conversation's `conversation_summaries` row
+    with the timestamp of the newest folded message.
+
+    Updates of one conversation never overlap; a turn stored while an update
+    runs triggers one more pass afterwards. Summaries are cached per process
+    (least recently used evicted first), like the history cache.
+    """
+
+    def __init__(self, conversations, summarize: Callable[[Optional[str], list], Awaitable[str]], recent_messages: int = 10,
+                 batch_messages: int = 40, cache_size: int = 10000, enabled: bool = True):
+        self.conversations = conversations
+        self.summarize = summarize
+        self.recent_messages = recent_messages
+        self.batch_messages = batch_messages
+        self.cache_size = cache_size
+        self.enabled = enabled
+
+        self._cache: "OrderedDict[str, SummaryState]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._again: Set[str] = set()
+
+        self.updates = 0
+        self.folded_messages = 0
+        self.failures = 0
+        self.update_seconds = 0.0
+
+    # 🔹 Cache
+    def _cached(self, conversation_id: str) -> Optional[SummaryState]:
+        state = self._cache.get(conversation_id)
+        if state is not None:
+            self._cache.move_to_end(conversation_id)
+        return state
+
+    def _remember(self, conversation_id: str, state: SummaryState):
+        self._cache[conversation_id] = state
+        self._cache.move_to_end(conversation_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, conversation_id: str):
+        """Forgets the cached summary of a conversation (e.g. after it was deleted)."""
+        self._cache.pop(conversation_id, None)
+
+    async def _state(self, conversation_id: str) -> SummaryState:
+        state = self._cached(conversation_id)
+        if state is None:
+            state = await self.conversations.aget_summary(conversation_id)
+            self._remember(conversation_id, state)
+        return state
+
+    # 🔹 Reads
+    async def aget(self, conversation_id: str) -> Optional[str]:
+        """The conversation's summary, or None if nothing has left the recent window yet (never raises)."""
+        if not self.enabled:
+            return None
+        try:
+            return (await self._state(conversation_id))[0]
+        except Exception as e:
+            logger.error(f"❌ ERROR: Failed to load conversation summary: {e}")
+            return None
+
+    # 🔹 Updates
+    def schedule(self, conversation_id: str) -> Optional[asyncio.Task]:
+        """Updates the summary in the background (or once more after the update already running)."""
+        if not self.enabled:
+            return None
+
+        task = self._tasks.get(conversation_id)
+        if task is not None and not task.done():
+            self._again.add(conversation_id)
+            return task
+
+        task = asyncio.create_task(self._run(conversation_id))
+        self._tasks[conversation_id] = task
+        task.add_done_callback(lambda done: self._tasks.pop(conversation_id, None) if self._tasks.get(conversation_id) is done else None)
+        return task
+
+    async def _run(self, conversation_id: str):
+        with deadline_scope(None):  # The task inherits the scheduling turn's context, but not its deadline
+            await self._update_until_caught_up(conversation_id)
+
+    async def _update_until_caught_up(self, conversation_id: str):
+        while True:
+            self._again.discard(conversation_id)
+            try:
+                folded = await self.update(conversation_id)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"❌ ERROR: Failed to update summary of conversation {conversation_id}: {e}")
+                return
+            # Keep going while there is a backlog (more than one batch) or a newer turn arrived
+            if folded < self.batch_messages and conversation_id not in self._again:
+                return
+
+    async def update(self, conversation_id: str) -> int:
+        """Folds the messages that left the recent window into the summary and returns how many were folded."""
+        summary, through = await self._state(conversation_id)
+        messages = await self.conversations.aget_messages_after(conversation_id, through, self.batch_messages + self.recent_messages)
+        fold = messages[:min(self.batch_messages, len(messages) - self.recent_messages)]
+        if not fold:
+            return 0
+
+        start = time.perf_counter()
+        summary = await self.summarize(summary, fold)
+        if not summary:
+            return 0
+        through = fold[-1].timestamp
+        if not await self.conversations.asave_summary(conversation_id, summary, through, len(fold)):
+            self.invalidate(conversation_id)  # Not stored yet, or another worker got further: re-read next time
+            return 0
+
+        self._remember(conversation_id, (summary, through))
+        self.updates += 1
+        self.folded_messages += len(fold)
+        self.update_seconds += time.perf_counter() - start
+        logger.info(f"✅ Folded {len(fold)} messages into the summary of conversation {conversation_id}")
+        return len(fold)
+
+    async def stop(self):
+        """Cancels running updates (the next turn of each conversation catches up)."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Update counters for monitoring."""
+        return {
+            "enabled": self.enabled,
+            "recent_messages": self.recent_messages,
+            "running": sum(not task.done() for task in self._tasks.values()),
+            "updates": self.updates,
+            "folded_messages": self.folded_messages,
+            "failures": self.failures,
+            "avg_update_ms": round(self.update_seconds / self.updates * 1000, 3) if self.updates else 0.0,
+            "cached": len(self._cache)
+        }
+
+conversation_summarizer = ConversationSummarizer(
+    conversation_service,
+    llm_service.asummarize,
+    recent_messages=PROMPT_HISTORY_MESSAGES,
+    batch_messages=CONVERSATION_SUMMARY_BATCH_MESSAGES,
+    cache_size=CONVERSATION_SUMMARY_CACHE_SIZE,
+    enabled=CONVERSATION_SUMMARY_ENABLED
+)
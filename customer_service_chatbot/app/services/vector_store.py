@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+class VectorStore(ABC):
+    """Storage and similarity search for policy embeddings."""
+
+    @abstractmethod
+    def add(self, ids: List[str], documents: List[str], embeddings: List[List[float]]):
+        """Adds documents with their embeddings."""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Removes documents by id."""
+        pass
+
+    @abstractmethod
+    def get_ids(self) -> List[str]:
+        """Returns the ids of all stored documents."""
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        """Returns the number of stored documents."""
+        pass
+
+    @abstractmethod
+    def query(self, embedding: List[float], top_k: int = 3) -> List[Tuple[str, float]]:
+        """Returns up to `top_k` `(document, cosine_similarity)` pairs, most similar first."""
+        pass
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a persistent ChromaDB collection."""
+
+    def __init__(self, path: str = "chroma_db", collection_name: str = "policy_embeddings"):
+        import chromadb
+
+        self.db_path = path
+        self.collection_name = collection_name
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    def add(self, ids, documents, embeddings):
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings)
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def get_ids(self):
+        return self.collection.get(include=[])["ids"]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def _to_similarity(self, distance: float) -> float:
+        """Converts a Chroma distance to cosine similarity (embeddings are unit-normalized)."""
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "l2":
+            return 1.0 - distance / 2.0  # squared L2 between unit vectors = 2 - 2cos
+        return 1.0 - distance  # cosine / ip distances
+
+    def query(self, embedding, top_k=3):
+        results = self.collection.query(query_embeddings=[embedding], n_results=top_k)
+
+        documents = results.get("documents", [[]])[0]
+        distances = results.get("distances", [[]])[0]
+        return [(doc, self._to_similarity(distance)) for doc, distance in zip(documents, distances)]
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store for small corpora.
+
+    Embeddings live in one contiguous, L2-normalized float32 matrix, so a query is a
+    single matrix-vector product followed by a partial sort. The matrix is saved as
+    `.npy` and opened with `mmap_mode="r"`, letting worker processes share its pages.
+    """
+
+    def __init__(self, path: str = "vector_index", collection_name: str = "policy_embeddings"):
+        self.index_dir = path
+        self.matrix_path = os.path.join(path, f"{collection_name}.npy")
+        self.meta_path = os.path.join(path, f"{collection_name}.json")
+        self._lock = threading.Lock()
+
+        # (matrix, ids, documents) is swapped as one tuple so readers always see a consistent index
+        self._index = (np.zeros((0, 0), dtype=np.float32), [], [])
+        self._load()
+
+    def _load(self):
+        """Memory-maps the persisted index if one exists."""
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.meta_path)):
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self._index = (np.load(self.matrix_path, mmap_mode="r"), meta["ids"], meta["documents"])
+        logger.info(f"✅ Loaded {len(meta['ids'])} vectors from {self.matrix_path}")
+
+    def _persist(self, matrix: np.ndarray, ids: List[str], documents: List[str]):
+        """Writes the index atomically, then re-opens it memory-mapped."""
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        tmp_matrix_path = f"{self.matrix_path}.tmp.npy"
+        tmp_meta_path = f"{self.meta_path}.tmp"
+        np.save(tmp_matrix_path, matrix)
+        with open(tmp_meta_path, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents}, f)
+
+        os.replace(tmp_matrix_path, self.matrix_path)
+        os.replace(tmp_meta_path, self.meta_path)
+
+        self._index = (np.load(self.matrix_path, mmap_mode="r"), ids, documents)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, ids, documents, embeddings):
+        new_vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            matrix, stored_ids, stored_documents = self._index
+            matrix = np.vstack([matrix, new_vectors]) if stored_ids else new_vectors
+            self._persist(np.ascontiguousarray(matrix, dtype=np.float32), stored_ids + list(ids), stored_documents + list(documents))
+
+    def delete(self, ids):
+        to_delete = set(ids)
+        with self._lock:
+            matrix, stored_ids, stored_documents = self._index
+            keep = [i for i, doc_id in enumerate(stored_ids) if doc_id not in to_delete]
+            if len(keep) == len(stored_ids):
+                return
+            self._persist(
+                np.ascontiguousarray(matrix[keep], dtype=np.float32),
+                [stored_ids[i] for i in keep],
+                [stored_documents[i] for i in keep]
+            )
+
+    def get_ids(self):
+        return list(self._index[1])
+
+    def count(self) -> int:
+        return len(self._index[1])
+
+    def query(self, embedding, top_k=3):
+        matrix, _, documents = self._index
+        if not documents:
+            return []
+
+        query_vector = self._normalize(np.asarray(embedding, dtype=np.float32))
+        scores = matrix @ query_vector
+
+        k = min(top_k, len(documents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(documents[i], float(scores[i])) for i in top]
+
+def get_vector_store(backend: str, path: str, collection_name: str = "policy_embeddings") -> VectorStore:
+    """Returns the vector store for the configured backend (`chroma` or `numpy`)."""
+    backends = {
+        "chroma": ChromaVectorStore,
+        "numpy": NumpyVectorStore
+    }
+    store_class = backends.get(backend.lower())
+    if not store_class:
+        raise ValueError(f"Unknown vector store backend: {backend}. Valid backends: {list(backends.keys())}")
+
+    return store_class(path=path, collection_name=collection_name)
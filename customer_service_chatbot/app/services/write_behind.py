@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="🔹 %(message)s")
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class _Turn:
+    """The rows of one turn; they are always written together."""
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+        self.conversation_ids = {row["conversation_id"] for row in rows}
+        self.discarded = False
+        self.writing = False
+
+class WriteBehindQueue:
+    """
+    Buffers conversation turns in memory and writes them in batches.
+
+    A background task collects turns until they hold `max_batch_size` rows or
+    `flush_interval` seconds have passed since the first one, then hands their
+    rows to `flush_fn` (one transaction, one multi-row insert), so a turn is
+    never split across transactions. The queue holds at most `max_queue_size`
+    turns: when it is full, `enqueue` waits, pushing back on request handlers
+    instead of growing without bound. `stop` drains and flushes everything
+    still queued. Rows of a batch that fails to write are logged, counted and
+    passed to `on_error`. `discard` drops a conversation's queued turns (e.g.
+    when it is deleted).
+    """
+
+    def __init__(self, flush_fn: Callable[[List[dict]], Awaitable[None]], max_batch_size: int = 100,
+                 flush_interval: float = 0.05, max_queue_size: int = 10000,
+                 on_error: Optional[Callable[[List[dict]], None]] = None):
+        self.flush_fn = flush_fn
+        self.on_error = on_error
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, List[_Turn]] = {}  # conversation_id -> turns queued but not yet written
+        self._flushing: Set[str] = set()  # Conversations in the batch being written
+        self._flushed: Optional[asyncio.Future] = None  # Resolved when that batch is done
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.discarded_rows = 0
+        self.backpressure_waits = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts the background flusher on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Write-behind queue started (batch={self.max_batch_size}, interval={self.flush_interval}s)")
+
+    async def stop(self):
+        """Flushes every queued row, then stops the background flusher."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("✅ Write-behind queue flushed and stopped")
+
+    async def enqueue(self, rows: List[dict]):
+        """Queues the rows of one turn for writing, waiting for room when the queue is full."""
+        turn = _Turn(rows)
+        for conversation_id in turn.conversation_ids:
+            self._pending.setdefault(conversation_id, []).append(turn)
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(turn)
+
+    def pending(self, conversation_id: str) -> List[dict]:
+        """Rows of a conversation that are queued but not yet written (for read-your-writes)."""
+        return [row for turn in self._pending.get(conversation_id, ()) for row in turn.rows if row["conversation_id"] == conversation_id]
+
+    async def discard(self, conversation_id: str):
+        """
+        Drops the queued turns of a conversation so they are never written.
+
+        Waits for a batch with that conversation that is already being written,
+        so a delete that follows can't be undone by it.
+        """
+        for turn in self._pending.pop(conversation_id, ()):
+            if not turn.discarded and not turn.writing:
+                turn.discarded = True
+                self.discarded_rows += len(turn.rows)
+        if conversation_id in self._flushing:
+            await asyncio.shield(self._flushed)
+
+    def _forget(self, turn: _Turn):
+        for conversation_id in turn.conversation_ids:
+            turns = self._pending.get(conversation_id)
+            if turns is not None and turn in turns:
+                turns.remove(turn)
+                if not turns:
+                    del self._pending[conversation_id]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+
+            batch, size = [item], len(item.rows)
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while size < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item.rows)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[_Turn]):
+        turns = [turn for turn in batch if not turn.discarded]
+        rows = [row for turn in turns for row in turn.rows]
+        if not rows:
+            return
+
+        for turn in turns:
+            turn.writing = True
+        self._flushing = set().union(*(turn.conversation_ids for turn in turns))
+        self._flushed = asyncio.get_running_loop().create_future()
+        try:
+            await self.flush_fn(rows)
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+        except Exception as e:
+            self.failed_rows += len(rows)
+            logger.error(f"❌ ERROR: Failed to flush {len(rows)} queued messages: {e}")
+            if self.on_error is not None:
+                self.on_error(rows)
+        finally:
+            for turn in turns:
+                self._forget(turn)
+            self._flushing = set()
+            self._flushed.set_result(None)
+
+    def stats(self) -> dict:
+        """Queue depth and flush counters for monitoring."""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "discarded_rows": self.discarded_rows,
+            "avg_batch_size": round(self.flushed_rows / self.flushes, 2) if self.flushes else 0.0,
+            "backpressure_waits": self.backpressure_waits
+        }
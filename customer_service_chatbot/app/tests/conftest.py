@@ -0,0 +1,15 @@
+import pytest
+from app.api.admission import rate_limiter
+from app.services.openai_clients import chat_upstream, embeddings_upstream
+
+@pytest.fixture(autouse=True)
+def fresh_limits():
+    """
+    Every test starts with closed circuit breakers (tests that reach the real API
+    without network access open them) and full rate-limit buckets (all test
+    clients share one address).
+    """
+    for caller in (chat_upstream, embeddings_upstream):
+        caller.breaker.record_success()
+    rate_limiter.clear()
+    yield
@@ -0,0 +1,136 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.admission import AdmissionController, ClientIdentifier, RateLimiter, client_key
+
+client = TestClient(app)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+PRIORITIES = {"tech_support": 0, "customer_support": 1, "sales": 2}
+
+# 🟢 **Rate Limiting**
+def test_token_bucket_per_client():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock)
+    for _ in range(3):
+        limiter.check("key:a")
+    with pytest.raises(HTTPException) as error:
+        limiter.check("key:a")
+    assert error.value.status_code == 429 and error.value.headers["Retry-After"] == "1"
+
+    limiter.check("key:b")  # Other clients have their own bucket
+    clock.now = 0.5
+    limiter.check("key:a")  # One token refilled
+    assert limiter.stats()["limited"] == 1
+
+    clock.now = 10
+    limiter.check("key:a", cost=50)  # A batch larger than the burst drains the bucket instead of never fitting
+    with pytest.raises(HTTPException):
+        limiter.check("key:a")
+
+def test_endpoint_answers_429_with_retry_after():
+    limiter = RateLimiter(rate=0.5, burst=1)
+    with patch("app.api.routes.rate_limiter", limiter), patch.object(client_key, "api_keys", {"k1", "k2"}), \
+         patch("app.api.routes.rag_retriever.aretrieve_policy", new_callable=AsyncMock, return_value=["Refunds take 14 days."]):
+        assert client.post("/retrieve_policy", json={"query": "refunds"}, headers={"X-API-Key": "k1"}).status_code == 200
+        response = client.post("/retrieve_policy", json={"query": "refunds"}, headers={"X-API-Key": "k1"})
+        assert response.status_code == 429 and response.headers["Retry-After"] == "2"
+        assert client.post("/retrieve_policy", json={"query": "refunds"}, headers={"X-API-Key": "k2"}).status_code == 200
+
+def test_client_key_only_trusts_known_keys_and_proxies():
+    def request(peer, api_key=None, forwarded=None):
+        headers = {"x-forwarded-for": forwarded} if forwarded else {}
+        return MagicMock(client=MagicMock(host=peer), headers=headers), api_key
+
+    identify = ClientIdentifier(api_keys={"team-a"}, trusted_proxies={"10.0.0.2"})
+    assert identify(*request("1.2.3.4", "team-a")) == "key:team-a"
+    assert identify(*request("1.2.3.4", "made-up")) == "ip:1.2.3.4"  # Unknown keys don't get their own bucket
+    assert identify(*request("10.0.0.2", forwarded="9.9.9.9, 5.6.7.8")) == "ip:5.6.7.8"  # Rightmost hop added by our proxy
+    assert identify(*request("1.2.3.4", forwarded="5.6.7.8")) == "ip:1.2.3.4"  # Only trusted proxies may forward
+
+    assert ClientIdentifier(trusted_proxies={"*"})(*request("172.18.0.5", forwarded="5.6.7.8")) == "ip:5.6.7.8"
+
+# 🟢 **In-Flight Caps & Priorities**
+def test_queue_is_served_by_priority_and_agent_caps():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2, agent_limits={"sales": 1}, priorities=PRIORITIES, slo_seconds=5)
+        first = await admission.acquire("sales")
+        second = await admission.acquire("customer_support")
+        order = []
+
+        async def turn(agent):
+            async with admission.slot(agent):
+                order.append(agent)
+
+        waiting = [asyncio.create_task(turn(agent)) for agent in ("sales", "customer_support", "tech_support")]
+        await asyncio.sleep(0)
+        assert admission.stats()["queued_now"] == 3
+
+        admission.release(second)  # sales is still at its cap, so tech_support goes first
+        await asyncio.gather(*waiting[1:])
+        admission.release(first)
+        await waiting[0]
+        return order, admission.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["tech_support", "customer_support", "sales"]
+    assert stats["in_flight"] == 0 and stats["queued"] == 3
+
+# 🟢 **Load Shedding**
+def test_full_queue_sheds_lower_priority_turns():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, priorities=PRIORITIES, max_queue=1, slo_seconds=5)
+        running = await admission.acquire("tech_support")
+        sales = asyncio.create_task(admission.acquire("sales"))
+        await asyncio.sleep(0)
+        tech = asyncio.create_task(admission.acquire("tech_support"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as shed:
+            await sales
+        with pytest.raises(HTTPException) as full:
+            await admission.acquire("sales")  # Nothing of lower priority left to displace
+        admission.release(running)
+        admission.release(await tech)
+        return shed.value, full.value, admission.stats()
+
+    shed, full, stats = asyncio.run(scenario())
+    assert shed.status_code == 503 and "Retry-After" in shed.headers
+    assert full.status_code == 503
+    assert stats["rejected"] == {"shed": 1, "queue_full": 1}
+
+def test_expected_wait_over_the_slo_is_rejected_at_once():
+    async def scenario():
+        clock = FakeClock()
+        admission = AdmissionController(max_in_flight=1, priorities=PRIORITIES, slo_seconds=1, clock=clock)
+        ticket = await admission.acquire("sales")
+        clock.now = 3
+        admission.release(ticket)  # Turns take ~3s, so a queued turn would wait longer than the SLO
+
+        await admission.acquire("sales")
+        with pytest.raises(HTTPException) as error:
+            await admission.acquire("sales")
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503 and error.headers["Retry-After"] == "3"
+
+def test_queued_turn_times_out_after_the_slo():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, slo_seconds=0.05)
+        await admission.acquire("sales")
+        with pytest.raises(HTTPException):
+            await admission.acquire("sales")
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == {"timeout": 1} and stats["queued_now"] == 0
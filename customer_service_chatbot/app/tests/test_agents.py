@@ -0,0 +1,57 @@
+import asyncio
+import time
+from unittest.mock import patch, AsyncMock
+from app.agents.base import BaseAgent
+from app.agents.agent_factory import AgentFactory
+
+# 🟢 **Async Agent Tests**
+def test_async_policy_rejection_skips_llm():
+    """Async agents enforce policies without calling the LLM."""
+    agent = AgentFactory.get_agent("tech_support")
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock) as mock_llm:
+        result = asyncio.run(agent.ahandle_request("Can you reset my password?", context={"policy": "No relevant policy found."}))
+
+    assert "❌" in result["response"]
+    mock_llm.assert_not_called()
+
+def test_async_agent_uses_async_llm_client():
+    """Async agents await the async LLM service instead of the blocking client."""
+    agent = AgentFactory.get_agent("sales")
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Premium Plan is 10% off.") as mock_llm, \
+         patch("app.agents.base.llm_service.generate_response") as mock_sync_llm:
+        result = asyncio.run(agent.ahandle_request("Any deals on the Premium Plan?", context={"policy": "Discounts apply."}))
+
+    assert result == {"agent": "sales", "response": "Premium Plan is 10% off."}
+    mock_llm.assert_awaited_once()
+    mock_sync_llm.assert_not_called()
+
+def test_sync_only_agent_runs_in_worker_thread():
+    """Agents that only implement `handle_request` keep working through the async entry point."""
+    class EchoAgent(BaseAgent):
+        def __init__(self):
+            super().__init__("echo")
+
+        def handle_request(self, user_input, context=None):
+            return {"agent": self.name, "response": user_input}
+
+    result = asyncio.run(EchoAgent().ahandle_request("hello"))
+    assert result == {"agent": "echo", "response": "hello"}
+
+def test_concurrent_async_requests_overlap():
+    """Several in-flight LLM calls share one event loop instead of running one at a time."""
+    agent = AgentFactory.get_agent("customer_support")
+
+    async def slow_llm(**kwargs):
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    async def run_many():
+        return await asyncio.gather(*[agent.ahandle_request("Where is my order?", context={}) for _ in range(10)])
+
+    with patch("app.agents.base.llm_service.agenerate_response", side_effect=slow_llm):
+        start = time.perf_counter()
+        results = asyncio.run(run_many())
+        elapsed = time.perf_counter() - start
+
+    assert all(r["response"] == "ok" for r in results)
+    assert elapsed < 1.0  # 10 sequential calls would take >= 2s
@@ -0,0 +1,75 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.embeddings import HashingEmbeddingProvider
+from app.services.rag_service import RAGPolicyRetriever
+
+client = TestClient(app)
+
+# 🟢 **Batched Embeddings**
+def test_queries_are_embedded_in_batches(tmp_path):
+    """Distinct cache misses share one embeddings call per batch; duplicates and cached queries aren't re-embedded."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing")
+    retriever.embedding_cache.set("Cached question", retriever.embedding_model, HashingEmbeddingProvider().embed(["Cached question"])[0])
+
+    with patch.object(retriever.embedding_provider, "aembed", wraps=retriever.embedding_provider.aembed) as mock_embed, \
+         patch("app.services.rag_service.EMBEDDING_BATCH_SIZE", 2):
+        queries = ["Cancel my order", "cancel my order ", "Reset password", "Refund status", "Cached question"]
+        embeddings = asyncio.run(retriever.aembed_queries(queries))
+
+    assert [len(call.args[0]) for call in mock_embed.call_args_list] == [2, 1]
+    assert embeddings[0] == embeddings[1]
+    assert len(embeddings) == len(queries)
+
+# 🟢 **Batch Endpoint**
+def test_batch_endpoint_orders_turns_and_isolates_errors():
+    calls = []
+    in_flight = peak = 0
+
+    async def fake_llm(agent_type, user_input, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        calls.append(user_input)
+        in_flight -= 1
+        return f"answer to {user_input}"
+
+    items = [{"conversation_id": f"batch_conv_{i % 3}", "agent_type": "sales", "user_input": f"question {i}"} for i in range(9)]
+    items += [
+        {"conversation_id": "batch_bad_1", "agent_type": "billing", "user_input": "Who handles this?"},
+        {"conversation_id": "batch_bad_2", "agent_type": "sales", "user_input": "   "}
+    ]
+
+    with patch("app.api.routes.rag_retriever.aretrieve_policies", new_callable=AsyncMock,
+               side_effect=lambda queries: [["No relevant policy found."]] * len(queries)) as mock_retrieve, \
+         patch("app.api.routes.conversation_service.aget_last_n_messages", new_callable=AsyncMock, return_value=[]), \
+         patch("app.api.routes.conversation_service.aadd_turn", new_callable=AsyncMock), \
+         patch("app.services.llm_service.llm_service.agenerate_response", side_effect=fake_llm):
+        response = client.post("/conversation/batch", json={"items": items, "max_concurrency": 2})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (9, 2)
+    assert mock_retrieve.await_count == 1  # Retrieval for the whole batch in one call
+
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(11))
+    assert results[4]["agent_response"] == "answer to question 4"
+    assert results[9]["status"] == "error" and results[9]["status_code"] == 400
+    assert results[10]["detail"] == "User input cannot be empty."
+
+    # Turns of one conversation ran in request order; at most 2 LLM calls at a time
+    for conversation in range(3):
+        expected = [f"question {i}" for i in range(conversation, 9, 3)]
+        assert [c for c in calls if c in expected] == expected
+    assert peak <= 2
+
+def test_batch_size_limit():
+    with patch("app.api.routes.BATCH_MAX_ITEMS", 1):
+        response = client.post("/conversation/batch", json={"items": [
+            {"conversation_id": "c", "agent_type": "sales", "user_input": "a"},
+            {"conversation_id": "c", "agent_type": "sales", "user_input": "b"}
+        ]})
+    assert response.status_code == 413
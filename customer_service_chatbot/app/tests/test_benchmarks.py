@@ -0,0 +1,71 @@
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.fake_openai import FakeOpenAI, Latency, create_app
+from benchmarks.load_test import parse_mix
+from benchmarks.report import Recorder, compare, percentile
+
+def fake_client(**kwargs):
+    fake = FakeOpenAI(chat_latency="fixed:0", embedding_latency="fixed:0", token_latency="fixed:0", seed=1, **kwargs)
+    http_client = TestClient(create_app(fake))
+    return fake, openai.OpenAI(api_key="benchmark", base_url="http://testserver/v1", http_client=http_client, max_retries=0)
+
+# 🟢 **Fake OpenAI Server**
+def test_fake_server_speaks_the_openai_api():
+    fake, client = fake_client(reply_words=6)
+    completion = client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Refund?"}])
+    assert len(completion.choices[0].message.content.split()) == 6
+
+    stream = client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Refund?"}], stream=True)
+    chunks = [chunk.choices[0].delta.content for chunk in stream if chunk.choices[0].delta.content]
+    assert "".join(chunks) == completion.choices[0].message.content
+
+    vectors = client.embeddings.create(input=["cancel my order", "cancel the order", "router firmware"], model="text-embedding-ada-002")
+    a, b, c = (item.embedding for item in vectors.data)
+    dot = lambda x, y: sum(p * q for p, q in zip(x, y))
+    assert len(a) == 1536 and dot(a, b) > dot(a, c)  # Similar texts stay similar
+    assert fake.stats()["requests"] == {"chat": 1, "chat_stream": 1, "embeddings": 1}
+
+def test_fake_server_injects_errors_and_escalations():
+    _, client = fake_client(error_rate=1.0)
+    with pytest.raises((openai.RateLimitError, openai.InternalServerError)):
+        client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+
+    _, client = fake_client(escalation_rate=1.0)
+    messages = [{"role": "system", "content": "Be helpful. If unsure, reply with exactly: ESCALATE"}, {"role": "user", "content": "Hi"}]
+    assert client.chat.completions.create(model="gpt-3.5-turbo", messages=messages).choices[0].message.content == "ESCALATE"
+
+def test_latency_specs():
+    assert Latency("fixed:250").sample() == 0.25
+    assert 0.1 <= Latency("uniform:100,200").sample() <= 0.2
+    with pytest.raises(ValueError):
+        Latency("pareto:1,2")
+
+# 🟢 **Reports**
+def test_percentiles_and_summary():
+    assert percentile(list(range(1, 101)), 95) == 95 and percentile([7], 99) == 7 and percentile([], 50) is None
+
+    recorder = Recorder()
+    for ms in range(1, 101):
+        recorder.record("retrieve_policy", 200, ms / 1000)
+    recorder.record("retrieve_policy", 429, 0.001)
+    recorder.record("retrieve_policy", 0, 60)
+    results = recorder.summary(elapsed=10)
+
+    endpoint = results["endpoints"]["retrieve_policy"]
+    assert endpoint["latency_ms"]["p99"] == 99.0 and endpoint["throughput_rps"] == 10.0
+    assert results["overall"]["rejected"] == 1 and results["overall"]["failed"] == 1
+
+def test_compare_flags_tail_latency_regressions():
+    def report(p99, ok=100):
+        latency = {"p50": 10.0, "p95": 20.0, "p99": p99, "mean": 12.0, "max": p99}
+        return {"results": {"endpoints": {"root": {"requests": 100, "ok": ok, "throughput_rps": 10.0, "latency_ms": latency}}}}
+
+    assert compare(report(30.0), report(32.0))[0]["regressed"] == []
+    assert compare(report(30.0), report(40.0))[0]["regressed"] == ["p99"]
+    assert compare(report(30.0), report(30.0, ok=90))[0]["regressed"] == ["error_rate"]
+
+def test_mix_is_normalized():
+    assert parse_mix("conversation=3,retrieve_policy=1,root=0") == {"conversation": 0.75, "retrieve_policy": 0.25}
+    with pytest.raises(ValueError):
+        parse_mix("checkout=1")
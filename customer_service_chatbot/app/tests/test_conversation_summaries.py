@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.database import Base, engine_options, get_db, init_db, session_scope
+from app.models.conversation import Conversation, ConversationSummary
+from app.services.conversation_service import ConversationService
+
+T0 = datetime(2025, 1, 1)
+
+@pytest.fixture
+def sqlite_factory(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def api(sqlite_factory):
+    """TestClient whose DB endpoints use the throwaway SQLite database."""
+    def sqlite_db():
+        db = sqlite_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def summary(factory, conversation_id):
+    with session_scope(factory) as session:
+        row = session.get(ConversationSummary, conversation_id)
+        return row and (row.agent, row.last_timestamp, row.message_count)
+
+# 🟢 **Summary Maintenance**
+def test_turns_update_summary(sqlite_factory):
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+    service.add_turn("conv_s", "Hi", "Hello!", T0, T0 + timedelta(seconds=1), agent="sales")
+    service.add_message("conv_s", "user", "Anyone?", T0 + timedelta(seconds=5))
+
+    assert summary(sqlite_factory, "conv_s") == ("sales", T0 + timedelta(seconds=5), 3)
+
+def test_async_batch_spanning_conversations(sqlite_factory):
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+    rows = (service.turn_rows("conv_a", "q", "a", T0, T0, agent="tech_support")
+            + service.turn_rows("conv_b", "q", "a", T0 + timedelta(minutes=1), None, agent="sales"))
+    asyncio.run(service.aadd_messages(rows))
+
+    assert summary(sqlite_factory, "conv_a")[::2] == ("tech_support", 2)
+    assert summary(sqlite_factory, "conv_b")[::2] == ("sales", 2)
+
+def test_databases_without_upsert_fall_back_to_select_then_write(sqlite_factory):
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+    with patch.object(ConversationService, "_summary_upsert", return_value=None):  # As on a dialect without ON CONFLICT
+        service.add_messages(service.turn_rows("conv_f", "Hi", "Hello!", T0, None, agent="sales"))
+        service.add_messages(service.turn_rows("conv_f", "Refund?", "Sure.", T0 + timedelta(minutes=1), None)
+                             + service.turn_rows("conv_g", "Hi", "Hello!", T0, None, agent="tech_support"))
+
+    assert summary(sqlite_factory, "conv_f")[::2] == ("sales", 4)
+    assert summary(sqlite_factory, "conv_f")[1] > T0 + timedelta(minutes=1)
+    assert summary(sqlite_factory, "conv_g")[::2] == ("tech_support", 2)
+
+def test_init_db_backfills_existing_messages(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url, **engine_options(url))
+    with engine.begin() as conn:
+        # Schema as created by `create_all` before migrations existed
+        conn.exec_driver_sql(
+            "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id VARCHAR(255) NOT NULL, "
+            "sender VARCHAR(255) NOT NULL, content TEXT NOT NULL, timestamp TIMESTAMP NOT NULL)"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_conversations_conversation_id ON conversations (conversation_id)")
+        conn.execute(insert(Conversation), [
+            {"conversation_id": "old", "sender": "user", "content": f"m{i}", "timestamp": T0 + timedelta(seconds=i)} for i in range(3)
+        ])
+
+    init_db(engine)
+    assert summary(sessionmaker(bind=engine), "old") == (None, T0 + timedelta(seconds=2), 3)
+    engine.dispose()
+
+# 🟢 **Latest Conversations Endpoint**
+def test_root_returns_newest_conversations_in_one_query(api, sqlite_factory):
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+    # "a-old" sorts first alphabetically but is the oldest conversation
+    for minute, conversation_id in enumerate(["a-old", "z-mid", "m-new"]):
+        for turn in range(4):
+            at = T0 + timedelta(minutes=minute, seconds=turn * 2)
+            service.add_turn(conversation_id, f"q{turn}", f"a{turn}", at, at + timedelta(seconds=1), agent="sales")
+
+    statements = []
+    engine = sqlite_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    body = api.get("/", params={"limit": 2, "messages": 3}).json()
+
+    assert len(statements) == 1
+    conversations = body["latest_conversations"]
+    assert [c["conversation_id"] for c in conversations] == ["m-new", "z-mid"]
+    assert conversations[0]["message_count"] == 8 and conversations[0]["agent"] == "sales"
+    assert [m["content"] for m in conversations[0]["messages"]] == ["a2", "q3", "a3"]
+
+def test_delete_removes_summary(api, sqlite_factory):
+    ConversationService(session_factory=sqlite_factory, async_session_factory=None).add_turn("conv_del", "q", "a")
+
+    assert api.delete("/conversation/conv_del").status_code == 200
+    assert summary(sqlite_factory, "conv_del") is None
+    assert api.get("/conversation/latest").json() == {"message": "No conversations found."}
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.models.database import Base, engine_options, session_scope
+from app.models.conversation import Conversation
+from app.services.conversation_service import ConversationService
+
+@pytest.fixture
+def sqlite_factory(tmp_path):
+    """A throwaway SQLite database with the conversation schema."""
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+# 🟢 **Session Management Tests**
+def test_pool_options_only_for_server_databases():
+    """Pool sizing applies to Postgres; SQLite gets thread-safe connect args instead."""
+    assert "pool_size" in engine_options("postgresql://user:pw@db/chatbot_db")
+    assert engine_options("postgresql://user:pw@db/chatbot_db")["pool_pre_ping"] is True
+    assert engine_options("sqlite:///chatbot.db") == {"connect_args": {"check_same_thread": False}}
+
+def test_session_scope_rolls_back_on_error(sqlite_factory):
+    with pytest.raises(RuntimeError):
+        with session_scope(sqlite_factory) as session:
+            session.add(Conversation(conversation_id="c1", sender="user", content="lost", timestamp=datetime.utcnow()))
+            session.flush()
+            raise RuntimeError("boom")
+
+    with session_scope(sqlite_factory) as session:
+        assert session.query(Conversation).count() == 0
+
+def test_concurrent_writers_use_separate_sessions(sqlite_factory):
+    """Many threads writing through one service instance don't corrupt each other's sessions."""
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+
+    def write(i):
+        service.add_message(f"conv_{i % 4}", "user", f"message {i}", datetime.utcnow())
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with session_scope(sqlite_factory) as session:
+        assert session.execute(text("SELECT COUNT(*) FROM conversations")).scalar() == 40
+    assert len(service.get_last_n_messages("conv_1", n=5)) == 5
+
+def test_async_calls_without_async_engine(sqlite_factory):
+    """Async helpers fall back to the sync engine on worker threads."""
+    service = ConversationService(session_factory=sqlite_factory, async_session_factory=None)
+
+    async def run():
+        await asyncio.gather(*[service.aadd_message("conv_async", "user", f"m{i}", datetime(2025, 1, 1, 0, 0, i)) for i in range(5)])
+        return await service.aget_last_n_messages("conv_async", n=3)
+
+    messages = asyncio.run(run())
+    assert [m.content for m in messages] == ["m2", "m3", "m4"]
+
+def test_async_engine(tmp_path):
+    """With an async engine configured, reads and writes go through AsyncSession."""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async def run():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        service = ConversationService(session_factory=None, async_session_factory=async_sessionmaker(async_engine, expire_on_commit=False))
+        await service.aadd_message("conv_a", "user", "hello", datetime(2025, 1, 1, 0, 0, 0))
+        await service.aadd_message("conv_a", "bot", "hi!", datetime(2025, 1, 1, 0, 0, 1))
+        messages = await service.aget_last_n_messages("conv_a", n=5)
+        await async_engine.dispose()
+        return messages
+
+    assert [(m.sender, m.content) for m in asyncio.run(run())] == [("user", "hello"), ("bot", "hi!")]
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+from app.services.embedding_cache import EmbeddingCache
+from app.api.routes import rag_retriever
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+# 🟢 **Embedding Cache Tests**
+def test_normalized_text_shares_entry():
+    """Case and whitespace differences hit the same cache entry."""
+    cache = EmbeddingCache(max_size=10)
+    cache.set("Where is my order?", "ada", [0.1, 0.2])
+
+    assert cache.get("  where IS my   order? ", "ada") == [0.1, 0.2]
+    assert cache.get("Where is my order?", "other-model") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_lru_eviction():
+    """The least recently used entry is evicted once the cache is full."""
+    cache = EmbeddingCache(max_size=2)
+    cache.set("a", "ada", [1.0])
+    cache.set("b", "ada", [2.0])
+    cache.get("a", "ada")  # "b" is now least recently used
+    cache.set("c", "ada", [3.0])
+
+    assert cache.get("b", "ada") is None
+    assert cache.get("a", "ada") == [1.0]
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry():
+    """Entries older than the TTL are treated as misses."""
+    clock = FakeClock()
+    cache = EmbeddingCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.set("reset my password", "ada", [0.5])
+
+    clock.now += 30
+    assert cache.get("reset my password", "ada") == [0.5]
+    clock.now += 31
+    assert cache.get("reset my password", "ada") is None
+
+def test_persistent_tier_survives_restart(tmp_path):
+    """Embeddings written to the persistent tier are served by a fresh cache instance."""
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(persist_path=path).set("track my order", "ada", [0.25, -0.5])
+
+    restarted = EmbeddingCache(persist_path=path)
+    assert restarted.get("track my order", "ada") == [0.25, -0.5]
+    assert restarted.stats()["persistent_hits"] == 1
+
+def test_retriever_embeds_repeated_query_once():
+    """Repeated queries skip the embeddings API after the first call."""
+    rag_retriever.embedding_cache.clear()
+
+    provider = rag_retriever.embedding_provider
+    with patch.object(provider, "embed", return_value=[[0.1, 0.2, 0.3]]) as mock_sync, \
+         patch.object(provider, "aembed", new_callable=AsyncMock, return_value=[[0.1, 0.2, 0.3]]) as mock_async:
+        rag_retriever.embed_query("My internet is slow")
+        rag_retriever.embed_query("my internet is SLOW")
+        asyncio.run(rag_retriever.aembed_query("My internet is slow "))
+
+    assert mock_sync.call_count == 1
+    mock_async.assert_not_called()
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.database import Base, engine_options, get_db
+from app.services.conversation_service import ConversationService
+from app.services.history_cache import HistoryCache
+
+T0 = datetime(2025, 1, 1)
+
+def row(conversation_id, i, content="message"):
+    return {"id": i, "conversation_id": conversation_id, "sender": "user", "content": f"{content} {i}", "timestamp": T0 + timedelta(seconds=i)}
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+def count_selects(engine):
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    return statements
+
+# 🟢 **Ring Buffers**
+def test_ring_buffer_keeps_last_messages():
+    cache = HistoryCache(capacity=3)
+    cache.finish_load("c", cache.begin_load("c"), [], complete=True)
+    cache.append("c", [row("c", i) for i in range(5)])
+
+    assert [m.content for m in cache.get("c", 3)] == ["message 2", "message 3", "message 4"]
+    assert cache.get("c", 4) is None  # The buffer may have dropped older messages
+    assert [m.content for m in cache.get("c", 2)] == ["message 3", "message 4"]
+
+def test_writes_to_uncached_conversation_are_not_cached():
+    """Without a read-through load the cache can't know the older messages."""
+    cache = HistoryCache(capacity=3)
+    cache.append("c", [row("c", 1)])
+    assert cache.get("c", 2) is None
+
+def test_load_racing_a_write_is_discarded():
+    cache = HistoryCache(capacity=5)
+    token = cache.begin_load("c")
+    cache.append("c", [row("c", 9)])  # Written while the database read was in flight
+    cache.finish_load("c", token, [row("c", 1)], complete=True)
+    assert cache.get("c", 5) is None
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = HistoryCache(capacity=5, max_conversations=2)
+    for conversation_id in ["a", "b", "c"]:
+        cache.finish_load(conversation_id, cache.begin_load(conversation_id), [row(conversation_id, 1)], complete=True)
+    assert cache.get("a", 1) is None and cache.get("c", 1) is not None
+
+    budget = HistoryCache(capacity=5, max_bytes=1000)
+    budget.finish_load("a", budget.begin_load("a"), [row("a", 1, "x" * 300)], complete=True)
+    budget.finish_load("b", budget.begin_load("b"), [row("b", 1, "y" * 300)], complete=True)
+    assert budget.get("a", 1) is None
+    assert budget.stats()["bytes"] <= 1000 and budget.stats()["evictions"] == 1
+
+# 🟢 **Service Integration**
+def test_active_conversation_reads_skip_database(sqlite_engine):
+    selects = count_selects(sqlite_engine)
+    service = ConversationService(session_factory=sessionmaker(bind=sqlite_engine), async_session_factory=None,
+                                  history_cache=HistoryCache(capacity=10))
+
+    async def run():
+        assert await service.aget_last_n_messages("conv_hot", n=5) == []  # Miss: one read-through
+        for i in range(3):
+            await service.aadd_turn("conv_hot", f"q{i}", f"a{i}")
+            await service.aget_last_n_messages("conv_hot", n=5)
+        return await service.aget_last_n_messages("conv_hot", n=4)
+
+    history = asyncio.run(run())
+    assert [m.content for m in history] == ["q1", "a1", "q2", "a2"]
+    assert all(m.id is not None for m in history)
+    assert len(selects) == 1
+
+def test_delete_endpoint_invalidates_cached_history(sqlite_engine):
+    from app.api.routes import conversation_service
+
+    def sqlite_db():
+        db = sessionmaker(bind=sqlite_engine)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    try:
+        with patch.object(conversation_service, "history_cache", HistoryCache(capacity=5)) as cache:
+            cache.finish_load("conv_deleted", cache.begin_load("conv_deleted"), [row("conv_deleted", 1)], complete=True)
+            TestClient(app).delete("/conversation/conv_deleted")
+            assert cache.get("conv_deleted", 5) is None
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from app.services.bm25 import BM25Index, reciprocal_rank_fusion
+from app.services.embeddings import HashingEmbeddingProvider
+from app.services.rag_service import RAGPolicyRetriever
+
+# 🟢 **Local Embedding & Hybrid Retrieval Tests**
+def test_hashing_embeddings_are_stable_and_normalized():
+    """Local embeddings are deterministic unit vectors, no network involved."""
+    provider = HashingEmbeddingProvider(dim=256)
+    first, second = provider.embed(["Reset my password", "Reset my password"])
+
+    assert first == second
+    assert len(first) == 256
+    assert abs(sum(x * x for x in first) - 1.0) < 1e-5
+
+def test_bm25_ranks_matching_policy_first():
+    """BM25 scores documents by shared terms and ignores unrelated queries."""
+    index = BM25Index()
+    index.build(["Orders can be canceled before shipping.", "Passwords require authentication.", "Refunds take 5 days."])
+
+    assert index.query("How do I cancel my orders?")[0][0] == "Orders can be canceled before shipping."
+    assert index.query("What is the best pizza topping?") == []
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """Documents ranked by both retrievers come first."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+
+def test_local_hybrid_retrieval(tmp_path):
+    """The hashing provider and BM25 retrieve the cancellation policy fully in-process."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing", hybrid_search=True)
+    retriever.ensure_index()
+
+    policies = retriever.retrieve_policy("Can I cancel my order?")
+    assert any("canceled" in policy for policy in policies)
+    assert retriever.retrieve_policy("What is the best pizza topping?") == ["No relevant policy found."]
+
+def test_hybrid_retrieval_degrades_to_bm25(tmp_path):
+    """When the embedding backend fails, hybrid search still answers from BM25."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing", hybrid_search=True)
+    retriever.ensure_index()
+
+    with patch.object(retriever.embedding_provider, "aembed", side_effect=TimeoutError("embedding API timed out")):
+        policies = asyncio.run(retriever.aretrieve_policy("I want to reset my password"))
+
+    assert any("password" in policy.lower() for policy in policies)
+
+def test_searches_never_see_a_half_built_lexical_index(tmp_path):
+    """The lazy BM25 load takes the reload lock, and reloads swap in a fully built index."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing", hybrid_search=True)
+    builds = []
+    build = BM25Index.build
+
+    def slow_build(index, documents):
+        builds.append(len(documents))
+        time.sleep(0.05)  # Widen the window in which a reader could catch the index mid-build
+        build(index, documents)
+
+    with patch.object(BM25Index, "build", slow_build), ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: retriever._rank("Can I cancel my order?", None, 3, 0.0), range(8)))
+        reloading = pool.submit(retriever.reload_policies)  # Readers keep using the previous index meanwhile
+        during = list(pool.map(lambda _: retriever._rank("Can I cancel my order?", None, 3, 0.0), range(8)))
+        reloading.result()
+
+    assert len(builds) == 2  # One lazy load for all concurrent readers, plus the reload
+    assert all(any("canceled" in policy for policy in policies) for policies in results + during)
@@ -0,0 +1,61 @@
+import asyncio
+from unittest.mock import patch
+from app.services.micro_batcher import MicroBatcher
+from app.services.rag_service import RAGPolicyRetriever
+
+def make_batcher(calls, **kwargs):
+    async def embed(texts):
+        calls.append(list(texts))
+        return [f"vector:{text}" for text in texts]
+
+    return MicroBatcher(embed, **kwargs)
+
+# 🟢 **Micro-Batching**
+def test_concurrent_calls_share_one_batch():
+    calls = []
+    batcher = make_batcher(calls, window_ms=20)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit(f"q{i}") for i in range(5)])
+
+    assert asyncio.run(run()) == [f"vector:q{i}" for i in range(5)]
+    assert calls == [[f"q{i}" for i in range(5)]]
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["avg_batch_size"] == 5.0
+    assert 0 < stats["max_queue_delay_ms"] < 1000
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    calls = []
+    batcher = make_batcher(calls, window_ms=10_000, max_batch_size=3)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*[batcher.submit(f"q{i}") for i in range(6)]), timeout=2)
+
+    asyncio.run(run())
+    assert [len(batch) for batch in calls] == [3, 3]
+
+def test_batch_failure_reaches_every_caller():
+    async def failing(texts):
+        raise TimeoutError("embedding API timed out")
+
+    batcher = MicroBatcher(failing, window_ms=5)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit(f"q{i}") for i in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, TimeoutError) for result in asyncio.run(run()))
+
+def test_retriever_batches_concurrent_query_embeddings(tmp_path):
+    """Concurrent retrievals for different queries cost one embeddings call."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing")
+    assert retriever.embedding_batcher is None  # Local embeddings aren't batched by default
+    retriever.embedding_batcher = MicroBatcher(lambda texts: retriever.embedding_provider.aembed(texts), window_ms=20)
+
+    with patch.object(retriever.embedding_provider, "aembed", wraps=retriever.embedding_provider.aembed) as mock_embed:
+        async def run():
+            return await asyncio.gather(*[retriever.aembed_query(q) for q in ["Cancel order", "Reset password", "Refund status"]])
+
+        embeddings = asyncio.run(run())
+
+    assert mock_embed.call_count == 1
+    assert embeddings[1] == retriever.embedding_provider.embed(["Reset password"])[0]
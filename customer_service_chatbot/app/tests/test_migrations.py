@@ -0,0 +1,40 @@
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+from app.models.database import Base, engine_options, init_db
+
+def sqlite_engine(tmp_path, name="chatbot.db"):
+    url = f"sqlite:///{tmp_path / name}"
+    return create_engine(url, **engine_options(url))
+
+def current_revision(engine):
+    with engine.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+def test_fresh_database_matches_models(tmp_path):
+    """Running every migration yields exactly the schema declared by the models."""
+    engine = sqlite_engine(tmp_path)
+    init_db(engine)
+
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+    assert current_revision(engine) == "0004"
+    engine.dispose()
+
+def test_legacy_create_all_database_is_upgraded(tmp_path):
+    """A database created by `create_all` before migrations is stamped, then upgraded in place."""
+    engine = sqlite_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id VARCHAR(255) NOT NULL, "
+            "sender VARCHAR(255) NOT NULL, content TEXT NOT NULL, timestamp TIMESTAMP NOT NULL)"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_conversations_conversation_id ON conversations (conversation_id)")
+
+    init_db(engine)
+    init_db(engine)  # Idempotent on restart
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("conversations")}
+    assert indexes == {"ix_conversations_conversation_id_timestamp", "ix_conversations_timestamp"}
+    assert current_revision(engine) == "0004"
+    engine.dispose()
@@ -0,0 +1,147 @@
+import asyncio
+from unittest.mock import patch, MagicMock
+from app.services.llm_service import LLMService
+from app.services.model_cascade import EscalationPolicy
+
+REFUSALS = r"\b(I'?m sorry,? but I can(no|')t|as an AI)\b"
+
+def completion(text, finish_reason="stop"):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text), finish_reason=finish_reason)])
+
+def stream_chunk(text, finish_reason=None):
+    return MagicMock(choices=[MagicMock(delta=MagicMock(content=text), finish_reason=finish_reason)])
+
+async def fake_stream(*texts):
+    for text in texts:
+        yield stream_chunk(text)
+    yield stream_chunk(None, "stop")
+
+CASCADES = {"customer_support": ["gpt-3.5-turbo", "gpt-4"], "sales": ["gpt-3.5-turbo", "gpt-4"]}
+
+def make_service():
+    with patch("app.services.llm_service.LLM_MODEL_CASCADES", CASCADES):
+        service = LLMService()
+    service.response_cache.agents = set()  # Every call reaches the models
+    return service
+
+# 🟢 **Escalation Signals**
+def test_escalation_signals():
+    policy = EscalationPolicy(min_response_chars=5, refusal_pattern=REFUSALS)
+    assert policy.reason("The Premium Plan costs $100 per month.") is None
+    assert policy.reason("The Premium Plan costs", finish_reason="length") == "length"
+    assert policy.reason("Yes") == "length"
+    assert policy.reason("ESCALATE") == "policy_conflict"
+    assert policy.reason("I'm sorry, but I can't help with refunds.") == "refusal"
+    assert policy.early_reason("As an AI, I") == "refusal"
+
+# 🟢 **Cascade Routing**
+def test_cheap_model_answers_unless_it_escalates():
+    service = make_service()
+    with patch.object(service.client.chat.completions, "create",
+                      side_effect=[completion("We offer 10% off annual plans."), completion("ESCALATE"), completion("Refunds take 14 days.")]) as mock_create:
+        assert service.generate_response("sales", "Any discounts?", "Policy") == "We offer 10% off annual plans."
+        report = {}
+        assert service.generate_response("sales", "Can I get a refund on a used plan?", "Policy", report=report) == "Refunds take 14 days."
+
+    assert [call.kwargs["model"] for call in mock_create.call_args_list] == ["gpt-3.5-turbo", "gpt-3.5-turbo", "gpt-4"]
+    assert "ESCALATE" in mock_create.call_args_list[0].kwargs["messages"][0]["content"]
+    assert "ESCALATE" not in mock_create.call_args_list[2].kwargs["messages"][0]["content"]  # The last tier always answers
+    assert report["model"] == "gpt-4"
+
+    tiers = service.cascade_stats()["sales"]["tiers"]
+    assert tiers["gpt-3.5-turbo"]["answered"] == 1 and tiers["gpt-3.5-turbo"]["escalated"] == {"policy_conflict": 1}
+    assert tiers["gpt-3.5-turbo"]["escalation_rate"] == 0.5
+    assert tiers["gpt-4"]["answered"] == 1
+
+def test_agents_without_a_cascade_and_explicit_models_use_one_tier():
+    service = make_service()
+    with patch.object(service.client.chat.completions, "create", return_value=completion("ESCALATE")) as mock_create:
+        assert service.generate_response("tech_support", "My router blinks", "Policy") == "ESCALATE"
+        service.generate_response("sales", "Any discounts?", "Policy", model="gpt-4o")
+
+    assert [call.kwargs["model"] for call in mock_create.call_args_list] == ["gpt-4", "gpt-4o"]
+
+def test_cascades_are_opt_in():
+    with patch.object(LLMService().client.chat.completions, "create", return_value=completion("We offer 10% off.")) as mock_create:
+        LLMService().generate_response("sales", "Any discounts?", "Policy", use_cache=False)
+    assert [call.kwargs["model"] for call in mock_create.call_args_list] == ["gpt-4"]
+
+def test_latency_budget_escalates_slow_tiers():
+    service = make_service()
+    service.escalation_policy.latency_budget = 0.05
+
+    async def create(model, **kwargs):
+        await asyncio.sleep(1 if model == "gpt-3.5-turbo" else 0)
+        return completion(f"Answer from {model}.")
+
+    with patch.object(service.async_client.chat.completions, "create", side_effect=create):
+        assert asyncio.run(service.agenerate_response("customer_support", "Where is my order?", "Policy")) == "Answer from gpt-4."
+    assert service.cascade_stats()["customer_support"]["tiers"]["gpt-3.5-turbo"]["escalated"] == {"latency": 1}
+
+# 🟢 **Streaming**
+def test_stream_holds_back_escalated_replies():
+    service = make_service()
+
+    async def create(model, **kwargs):
+        if model == "gpt-3.5-turbo":
+            return fake_stream("I'm sorry, but I can't ", "discuss that.")
+        return fake_stream("Our refund ", "window is 14 days.")
+
+    async def collect():
+        return [token async for token in service.astream_response("customer_support", "Refund?", "Policy")]
+
+    with patch.object(service.async_client.chat.completions, "create", side_effect=create):
+        assert asyncio.run(collect()) == ["Our refund ", "window is 14 days."]
+
+    async def cheap_answers(model, **kwargs):
+        return fake_stream("Sure, ", "happy to help.")
+
+    with patch.object(service.async_client.chat.completions, "create", side_effect=cheap_answers):
+        assert asyncio.run(collect()) == ["Sure, ", "happy to help."]
+    tiers = service.cascade_stats()["customer_support"]["tiers"]
+    assert tiers["gpt-3.5-turbo"]["escalated"] == {"refusal": 1} and tiers["gpt-3.5-turbo"]["answered"] == 1
+
+class FakeStream:
+    """Completion stream that records whether it was closed."""
+
+    def __init__(self, *texts, delay=0.0):
+        self.texts = texts
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for text in self.texts:
+            await asyncio.sleep(self.delay)
+            yield stream_chunk(text)
+        yield stream_chunk(None, "stop")
+
+    async def close(self):
+        self.closed = True
+
+def test_abandoned_streams_are_closed():
+    service = make_service()
+    service.escalation_policy.latency_budget = 0.05
+    cheap = [FakeStream("ESCALATE"), FakeStream("Slow", delay=1)]  # Escalates on its reply, then on the latency budget
+    larger = []
+
+    async def create(model, **kwargs):
+        if model == "gpt-3.5-turbo":
+            return cheap[len(larger)]
+        larger.append(FakeStream("Our refund ", "window is 14 days."))
+        return larger[-1]
+
+    async def collect():
+        return [token async for token in service.astream_response("customer_support", "Refund?", "Policy")]
+
+    async def disconnect():
+        tokens = service.astream_response("customer_support", "Refund?", "Policy", model="gpt-4")
+        await tokens.__anext__()
+        await tokens.aclose()  # The client went away mid-stream
+
+    with patch.object(service.async_client.chat.completions, "create", side_effect=create):
+        assert asyncio.run(collect()) == ["Our refund ", "window is 14 days."]
+        assert asyncio.run(collect()) == ["Our refund ", "window is 14 days."]
+        asyncio.run(disconnect())
+
+    assert all(stream.closed for stream in cheap + larger)
+    assert service.cascade_stats()["customer_support"]["tiers"]["gpt-3.5-turbo"]["escalated"] == {"policy_conflict": 1, "latency": 1}
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.pagination import encode_cursor
+from app.models.database import engine_options, get_db, get_session_factory, init_db
+from app.services.conversation_service import ConversationService
+
+T0 = datetime(2025, 1, 1)
+
+@pytest.fixture
+def api(tmp_path):
+    """TestClient backed by a migrated SQLite database holding 4 conversations of 3 turns each."""
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    init_db(engine)
+    factory = sessionmaker(bind=engine)
+
+    service = ConversationService(session_factory=factory, async_session_factory=None)
+    for turn in range(3):
+        for i in range(4):
+            at = T0 + timedelta(minutes=turn * 10 + i)
+            service.add_turn(f"conv_{i}", f"q{turn}", f"a{turn}", at, at + timedelta(seconds=1), agent="sales")
+
+    def sqlite_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    app.dependency_overrides[get_session_factory] = lambda: factory
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+def collect(api, path, key, **params):
+    """Follows `next_cursor` until the last page; returns every item and the number of pages."""
+    items, pages, cursor = [], 0, None
+    while True:
+        body = api.get(path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        items += body[key]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items, pages
+
+# 🟢 **Keyset Pagination**
+def test_filter_pages_cover_every_message_once(api):
+    messages, pages = collect(api, "/conversations/filter", "filtered_messages", limit=5)
+
+    assert pages == 5 and len(messages) == 24
+    timestamps = [m["timestamp"] for m in messages]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(set(timestamps)) == 24
+
+def test_latest_conversation_pages_in_chronological_order(api):
+    first = api.get("/conversation/latest", params={"limit": 4}).json()
+    assert first["conversation_id"] == "conv_3"
+
+    messages, pages = collect(api, "/conversation/latest", "messages", conversation_id="conv_3", limit=4)
+    assert pages == 2
+    assert [m["content"] for m in messages] == ["q0", "a0", "q1", "a1", "q2", "a2"]
+
+def test_root_pages_through_conversations(api):
+    conversations, pages = collect(api, "/", "latest_conversations", limit=3, messages=2)
+
+    assert pages == 2
+    assert [c["conversation_id"] for c in conversations] == ["conv_3", "conv_2", "conv_1", "conv_0"]
+    assert all([m["content"] for m in c["messages"]] == ["q2", "a2"] for c in conversations)
+
+def test_malformed_cursor_is_rejected(api):
+    assert api.get("/conversations/filter", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_cursor_with_the_wrong_key_type_is_rejected(api):
+    """A well-formed cursor whose key doesn't match the listing's id type is a 400, never a database error."""
+    numeric_timestamp = base64.urlsafe_b64encode(b"[1735689600,7]").decode("ascii")
+    for cursor in (encode_cursor(T0, "1 OR 1=1"), encode_cursor(T0, {"id": 1}), encode_cursor(T0, True), numeric_timestamp):
+        assert api.get("/conversations/filter", params={"cursor": cursor}).status_code == 400
+    assert api.get("/", params={"cursor": encode_cursor(T0, 7)}).status_code == 400  # Conversations are keyed by id strings
+    assert api.get("/conversations/filter", params={"cursor": encode_cursor(T0, 7)}).status_code == 200
+
+# 🟢 **NDJSON Export**
+def test_export_streams_ndjson(api):
+    response = api.get("/conversations/export", params={"conversation_id": "conv_1"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["content"] for r in rows] == ["q0", "a0", "q1", "a1", "q2", "a2"]
+    assert set(rows[0]) == {"id", "conversation_id", "sender", "content", "timestamp"}
+
+def test_export_time_window(api):
+    response = api.get("/conversations/export", params={"since": (T0 + timedelta(minutes=10)).isoformat(),
+                                                        "until": (T0 + timedelta(minutes=20)).isoformat()})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 8 and {r["content"] for r in rows} == {"q1", "a1"}
@@ -0,0 +1,107 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.pipeline import Turn, TurnPipeline
+
+client = TestClient(app)
+
+def make_pipeline():
+    retriever = MagicMock()
+    retriever.aretrieve_policy = AsyncMock(return_value=["Policy: Discounts apply."])
+    conversations = MagicMock()
+    conversations.aget_last_n_messages = AsyncMock(return_value=[])
+    conversations.aadd_turn = AsyncMock()
+    return TurnPipeline(retriever, conversations), retriever, conversations
+
+# 🟢 **Stage Ordering**
+def test_rejected_turn_skips_retrieval_and_generation():
+    pipeline, retriever, conversations = make_pipeline()
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock) as mock_llm:
+        turns = [asyncio.run(pipeline.run(Turn("tech_support", "pipe_1", "Please reset my password"))) for _ in range(20)]
+
+    turn = turns[-1]
+    assert turn.rejected and turn.response_text.startswith("❌ Authentication")
+    assert list(turn.timings) == ["validate", "enforce", "persist"]
+    assert min(t.timings["validate"] + t.timings["enforce"] for t in turns) < 0.001
+    retriever.aretrieve_policy.assert_not_called()
+    conversations.aget_last_n_messages.assert_not_called()
+    mock_llm.assert_not_called()
+    assert conversations.aadd_turn.await_count == 20  # Rejections are still recorded in the history
+    assert pipeline.stats()["rejected"] == 20
+
+def test_allowed_turn_retrieves_lazily_and_times_every_stage():
+    pipeline, retriever, conversations = make_pipeline()
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="10% off.") as mock_llm:
+        turn = asyncio.run(pipeline.run(Turn("sales", "pipe_2", "Any deals on the Premium Plan?")))
+
+    assert turn.response_text == "10% off."
+    assert list(turn.timings) == list(TurnPipeline.STAGES)
+    assert mock_llm.await_args.kwargs["policy_context"] == "Policy: Discounts apply."
+    retriever.aretrieve_policy.assert_awaited_once()
+    conversations.aget_last_n_messages.assert_awaited_once_with("pipe_2", n=10)
+    assert mock_llm.await_args.kwargs["history"] == []
+
+def test_history_is_loaded_only_for_agents_that_use_it():
+    pipeline, retriever, conversations = make_pipeline()
+    messages = [MagicMock(sender="user", content="Hi"), MagicMock(sender="bot", content="Hello!")]
+    conversations.aget_last_n_messages.return_value = messages
+    turn = Turn("sales", "pipe_3", "Tell me about the Premium Plan")
+    asyncio.run(pipeline.prepare(turn))
+    assert turn.context["history"] == messages
+
+    turn = Turn("sales", "pipe_3", "And the Basic Plan?")
+    asyncio.run(pipeline.admit(turn))
+    with patch.object(turn.agent, "uses_history", False):
+        asyncio.run(pipeline.retrieve(turn))
+    assert "history" not in turn.context
+    assert conversations.aget_last_n_messages.await_count == 1
+
+def test_stream_times_generation_without_the_client():
+    pipeline, _, _ = make_pipeline()
+
+    async def tokens(**kwargs):
+        for token in ("10% ", "off."):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def slow_reader():
+        turn = await pipeline.prepare(Turn("sales", "pipe_7", "Any deals on the Premium Plan?"))
+        events = []
+        async for event in pipeline.stream(turn):
+            events.append(event)
+            await asyncio.sleep(0.2)  # The client reads slowly
+        return turn, events
+
+    with patch("app.agents.base.llm_service.astream_response", side_effect=tokens):
+        turn, events = asyncio.run(slow_reader())
+
+    assert 0.02 <= turn.timings["generate"] < 0.2
+    event, done = events[-1]
+    assert event == "done" and list(done["timings_ms"]) == list(TurnPipeline.STAGES)
+
+# 🟢 **Endpoints**
+def test_server_timing_header_and_batch_enforcement():
+    with patch("app.api.routes.rag_retriever.aretrieve_policy", new_callable=AsyncMock) as mock_retrieve, \
+         patch("app.api.routes.conversation_service.aget_last_n_messages", new_callable=AsyncMock, return_value=[]), \
+         patch("app.api.routes.conversation_service.aadd_turn", new_callable=AsyncMock):
+        response = client.post("/conversation/sales", json={"conversation_id": "pipe_4", "user_input": "I want Limited Edition Sneakers"})
+
+    assert response.status_code == 200
+    assert "❌" in response.json()["agent_response"]
+    assert [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")] == ["validate", "enforce", "persist"]
+    mock_retrieve.assert_not_called()
+
+    items = [
+        {"conversation_id": "pipe_5", "agent_type": "sales", "user_input": "Is the Premium Plan worth it?"},
+        {"conversation_id": "pipe_6", "agent_type": "tech_support", "user_input": "Reset my password please"}
+    ]
+    with patch("app.api.routes.rag_retriever.aretrieve_policies", new_callable=AsyncMock,
+               side_effect=lambda queries: [["No relevant policy found."]] * len(queries)) as mock_batch_retrieve, \
+         patch("app.api.routes.conversation_service.aadd_turn", new_callable=AsyncMock), \
+         patch("app.services.llm_service.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Yes."):
+        body = client.post("/conversation/batch", json={"items": items}).json()
+
+    assert mock_batch_retrieve.await_args.args[0] == ["Is the Premium Plan worth it?"]
+    assert [result["status"] for result in body["results"]] == ["ok", "ok"]
+    assert body["results"][1]["agent_response"].startswith("❌")
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.rag_service import RAGPolicyRetriever
+
+client = TestClient(app)
+
+POLICY_TEXT = """Policy: Refunds
+- Refunds are processed within 14 days.
+
+Policy: Cancellations
+- Orders can be canceled before shipping.
+"""
+
+def make_retriever(tmp_path):
+    policy_dir = tmp_path / "policies"
+    policy_dir.mkdir()
+    (policy_dir / "support.txt").write_text(POLICY_TEXT)
+    retriever = RAGPolicyRetriever(policy_dir=str(policy_dir), backend="numpy", db_path=str(tmp_path / "index"), embedding_provider="hashing")
+    return retriever, policy_dir
+
+# 🟢 **Incremental Ingestion Tests**
+def test_unchanged_policies_are_not_reembedded(tmp_path):
+    """A second ingest of the same files embeds nothing."""
+    retriever, _ = make_retriever(tmp_path)
+
+    assert retriever.reload_policies() == {"added": 2, "deleted": 0, "unchanged": 0}
+    with patch.object(retriever.embedding_provider, "embed", wraps=retriever.embedding_provider.embed) as spy:
+        assert retriever.reload_policies() == {"added": 0, "deleted": 0, "unchanged": 2}
+    spy.assert_not_called()
+
+def test_edited_chunk_replaces_only_itself(tmp_path):
+    """Editing one policy section re-embeds that section and deletes its old version."""
+    retriever, policy_dir = make_retriever(tmp_path)
+    retriever.reload_policies()
+
+    (policy_dir / "support.txt").write_text(POLICY_TEXT.replace("14 days", "30 days"))
+    (policy_dir / "sales.txt").write_text("Policy: Discounts\n- Bulk orders get 10% off.")
+
+    with patch.object(retriever.embedding_provider, "embed", wraps=retriever.embedding_provider.embed) as spy:
+        stats = retriever.reload_policies()
+
+    assert stats == {"added": 2, "deleted": 1, "unchanged": 1}
+    assert retriever.vector_store.count() == 3
+    assert sum(len(call.args[0]) for call in spy.call_args_list) == 2
+
+def test_embedding_calls_are_batched(tmp_path):
+    """Large ingests are split into several embedding requests."""
+    retriever, policy_dir = make_retriever(tmp_path)
+    (policy_dir / "many.txt").write_text("\n\n".join(f"Policy: Rule {i}\n- Detail {i}." for i in range(5)))
+
+    with patch("app.services.rag_service.EMBEDDING_BATCH_SIZE", 2), \
+         patch.object(retriever.embedding_provider, "embed", wraps=retriever.embedding_provider.embed) as spy:
+        retriever.reload_policies()
+
+    assert [len(call.args[0]) for call in spy.call_args_list] == [2, 2, 2, 1]
+
+def test_reload_endpoint():
+    """The admin endpoint reports what changed."""
+    with patch("app.api.routes.rag_retriever.reload_policies", return_value={"added": 1, "deleted": 0, "unchanged": 5}):
+        response = client.post("/admin/policies/reload")
+
+    assert response.status_code == 200
+    assert response.json()["added"] == 1
@@ -0,0 +1,105 @@
+import os
+import time
+from app.agents.agent_factory import AgentFactory
+from app.policies.enforcement.rule_engine import KeywordMatcher, PolicyEngine, policy_engine
+from app.policies.enforcement.sales_policies import SalesPolicies
+
+RULES = """
+sales:
+  empty_input_response: "Which product?"
+  rules:
+    - id: competitor
+      keywords: ["acme"]
+      word_boundary: true
+      action: flag
+    - id: discontinued
+      keywords: ["Gold Plan", "Legacy Plan"]
+      action: reject
+      response: "❌ {match} is discontinued."
+    - id: card_number
+      patterns: ["\\\\b\\\\d{4}-\\\\d{4}-\\\\d{4}-\\\\d{4}\\\\b"]
+      action: reject
+      response: "❌ Never share card numbers."
+    - id: order_limits
+      keywords: ["order"]
+      action: check
+      check: sales_policies.SalesPolicies.can_order_from_input
+      response: "❌ Too many."
+"""
+
+def make_engine(tmp_path, text=RULES):
+    path = tmp_path / "rules.yaml"
+    path.write_text(text, encoding="utf-8")
+    return PolicyEngine(str(path))
+
+# 🟢 **Keyword Automaton**
+def test_keyword_matcher_reports_overlapping_matches():
+    matcher = KeywordMatcher([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+    found = sorted((start, end, value) for start, end, value in matcher.find("ushers"))
+    assert found == [(1, 4, 2), (2, 4, 1), (2, 6, 3)]
+
+# 🟢 **Rule Evaluation**
+def test_rules_apply_in_file_order(tmp_path):
+    engine = make_engine(tmp_path)
+
+    decision = engine.evaluate("sales", "Is the legacy plan better than ACME? I'd order 50")
+    assert decision.response == "❌ Legacy Plan is discontinued."  # Declared before order_limits
+    assert decision.flags == ["competitor"]
+
+    assert engine.evaluate("sales", "my card is 1234-5678-9012-3456").rule == "card_number"
+    assert engine.evaluate("sales", "I'd like to order 50").response == "❌ Too many."
+    assert not engine.evaluate("sales", "I'd like to order 5").rejected
+    assert engine.evaluate("sales", "   ").response == "Which product?"
+    assert not engine.evaluate("unknown_agent", "anything").rejected
+
+def test_word_boundary_keywords(tmp_path):
+    engine = make_engine(tmp_path)
+    assert engine.matches("sales", "competitor", "acme, inc.")
+    assert not engine.matches("sales", "competitor", "the acmeville store")
+
+def test_evaluation_cost_does_not_scale_with_rule_count(tmp_path):
+    rules = "\n".join(
+        f"    - id: rule_{i}\n      keywords: [\"forbidden phrase {i}\"]\n      word_boundary: true\n      action: reject\n      response: \"❌ {i}\""
+        for i in range(2000)
+    )
+    engine = make_engine(tmp_path, f"sales:\n  rules:\n{rules}\n")
+    assert engine.evaluate("sales", "this has forbidden phrase 1999 in it").rule == "rule_1999"
+
+    text = "an ordinary question about plans and pricing " * 5
+    start = time.perf_counter()
+    for _ in range(200):
+        assert not engine.evaluate("sales", text).rejected
+    assert time.perf_counter() - start < 1.0  # A linear scan of 2000 phrases per request is far slower
+
+# 🟢 **Hot Reload**
+def test_reload_picks_up_changes_and_keeps_rules_on_error(tmp_path):
+    engine = make_engine(tmp_path)
+    assert engine.evaluate("sales", "gold plan please").rejected
+
+    path = tmp_path / "rules.yaml"
+    path.write_text(RULES.replace("Gold Plan", "Silver Plan"), encoding="utf-8")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert engine.reload_if_changed()
+    assert not engine.evaluate("sales", "gold plan please").rejected
+    assert engine.evaluate("sales", "silver plan please").rejected
+
+    path.write_text(RULES.replace("action: flag", "action: shrug"), encoding="utf-8")
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert not engine.reload_if_changed()
+    assert engine.evaluate("sales", "silver plan please").rejected  # Previous rules stay in force
+
+# 🟢 **Shipped Rulebook**
+def test_shipped_rules_compile_and_enforce():
+    policy_engine.reload()
+    assert AgentFactory.get_agent("sales").check_policies("Two Rare Collectible Watches please") is None  # Whole words only
+    assert "Rare Collectible Watch is currently unavailable" in AgentFactory.get_agent("sales").check_policies("Is the rare collectible watch back?")["response"]
+    assert AgentFactory.get_agent("tech_support").check_policies("Please reset my password")["response"].startswith("❌ Authentication")
+    assert AgentFactory.get_agent("customer_support").check_policies("I want to cancel order 5") is not None
+    assert AgentFactory.get_agent("customer_support").check_policies("Where is my parcel?") is None
+
+def test_sales_order_limits_have_no_lower_bound():
+    assert SalesPolicies.can_create_order("Premium Plan", 10)
+    assert SalesPolicies.can_create_order("Premium Plan", 0)
+    assert not SalesPolicies.can_create_order("Premium Plan", 11)
+    assert SalesPolicies.extract_product_name("Upgrade to the PREMIUM PLAN") == "Premium Plan"
+    assert SalesPolicies.extract_quantity("order 3 of them") == 3
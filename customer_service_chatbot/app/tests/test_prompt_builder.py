@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from app.services.llm_service import LLMService
+from app.services.prompt_builder import NO_POLICY_CONTEXT, PromptBuilder, TokenCounter
+from app.services.response_cache import ResponseCache
+
+SYSTEM = "You are a sales representative."
+
+def message(sender, content):
+    return SimpleNamespace(sender=sender, content=content)
+
+def completion(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+def make_builder(budget, history_reserve=0):
+    return PromptBuilder({"gpt-4": budget}, history_reserve=history_reserve, use_tiktoken=False)
+
+# 🟢 **Token Counting**
+def test_estimated_counts_and_static_cache():
+    counter = TokenCounter("gpt-4", use_tiktoken=False)
+    assert counter.estimated
+    assert counter.count("") == 0 and counter.count("abcde") == 2
+    assert counter.truncate("x" * 100, 5) == "x" * 20
+
+    with patch.object(counter, "count", wraps=counter.count) as mock_count:
+        counter.count_static(SYSTEM)
+        counter.count_static(SYSTEM)
+    assert mock_count.call_count == 1
+
+# 🟢 **Budget Packing**
+def test_everything_fits_within_a_large_budget():
+    history = [message("user", "Hi"), message("bot", "Hello! How can I help?")]
+    prompt = make_builder(1000).build("gpt-4", SYSTEM, "Any deals?", "Policy A.\n\nPolicy B.", history)
+
+    assert [m["role"] for m in prompt.messages] == ["system", "user", "assistant", "user"]
+    assert prompt.messages[0]["content"].endswith("Policy A.\n\nPolicy B.")
+    assert prompt.tokens["total"] <= prompt.tokens["budget"]
+    assert prompt.tokens["policies_dropped"] == prompt.tokens["history_dropped"] == 0
+    assert prompt.tokens["total"] == sum(prompt.tokens[part] for part in ("system", "policies", "summary", "history", "user", "overhead"))
+
+def test_policies_are_packed_in_rank_order_and_history_newest_first():
+    builder = make_builder(0)
+    base = builder.build("gpt-4", SYSTEM, "Any deals?").tokens["total"]
+    policies = "A" * 40 + "\n\n" + "B" * 400 + "\n\n" + "C" * 40  # 10, 100 and 10 tokens
+    history = [message("user", "o" * 80), message("bot", "n" * 20)]  # 20 + 3 and 5 + 3 tokens
+    builder.budgets["gpt-4"] = base + 30 + 8
+
+    prompt = builder.build("gpt-4", SYSTEM, "Any deals?", policies, history)
+    assert prompt.messages[0]["content"].endswith("A" * 40 + "\n\n" + "C" * 40)  # B didn't fit, C still did
+    assert prompt.messages[1] == {"role": "assistant", "content": "n" * 20}  # Only the newest message fit
+    assert prompt.tokens["policies_dropped"] == 1 and prompt.tokens["history_dropped"] == 1
+    assert prompt.tokens["total"] <= prompt.tokens["budget"]
+
+def test_history_reserve_keeps_room_for_the_conversation():
+    builder = make_builder(0, history_reserve=10)
+    base = builder.build("gpt-4", SYSTEM, "Any deals?").tokens["total"]
+    builder.budgets["gpt-4"] = base + 15
+
+    prompt = builder.build("gpt-4", SYSTEM, "Any deals?", "P" * 60, [message("user", "Hi")])
+    assert prompt.messages[0]["content"].endswith(NO_POLICY_CONTEXT)
+    assert prompt.tokens["history_used"] == 1
+
+def test_oversized_input_is_truncated():
+    prompt = make_builder(100).build("gpt-4", SYSTEM, "x" * 4000)
+    assert prompt.tokens["user_truncated"]
+    assert len(prompt.messages[-1]["content"]) < 4000
+    assert prompt.tokens["total"] - prompt.tokens["policies"] <= 100
+
+# 🟢 **Response Caching**
+def test_turns_with_history_are_not_cached():
+    service = LLMService()
+    service.prompt_builder = make_builder(6000)
+    service.response_cache = ResponseCache(agents=["sales"])
+    report = {}
+
+    with patch.object(service.client.chat.completions, "create", return_value=completion("Hello!")) as mock_create:
+        service.generate_response("sales", "Hi there", "Policy", history=[message("user", "Earlier")], report=report)
+        service.generate_response("sales", "Hi there", "Policy", history=[message("user", "Earlier")])
+        assert mock_create.call_count == 2
+        assert mock_create.call_args.kwargs["messages"][1] == {"role": "user", "content": "Earlier"}
+
+        service.generate_response("sales", "Hi there", "Policy", history=[])
+        service.generate_response("sales", "Hi there", "Policy")
+        assert mock_create.call_count == 3
+
+    assert report["history_used"] == 1 and report["estimated"]
+    assert service.prompt_builder.stats()["prompts"] == 4
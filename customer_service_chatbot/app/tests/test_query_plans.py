@@ -0,0 +1,85 @@
+import os
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.database import engine_options, get_db, get_session_factory, init_db
+from app.services.conversation_service import ConversationService
+
+# Set to a disposable PostgreSQL database to also check plans on Postgres (e.g. postgresql://postgres:pw@localhost/plans_test)
+PLAN_TEST_DATABASE_URL = os.getenv("PLAN_TEST_DATABASE_URL")
+
+# SQLite: "SCAN <table>" without an index; Postgres: "Seq Scan on <table>"
+FULL_SCAN = re.compile(r"^(SCAN (conversations|conversation_summaries)( AS \w+)?$|.*Seq Scan on (conversations|conversation_summaries))")
+
+def explain(conn, statement, parameters):
+    """Plan lines for a captured statement (`EXPLAIN QUERY PLAN` on SQLite, `EXPLAIN` on Postgres)."""
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+    # Sequential scans are cheapest on a tiny test table, so make the planner prove an index path exists
+    conn.exec_driver_sql("SET enable_seqscan = off")
+    return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)]
+
+@pytest.fixture(params=["sqlite"] + (["postgresql"] if PLAN_TEST_DATABASE_URL else []))
+def migrated_engine(request, tmp_path):
+    """A database built by the migrations (not `create_all`), seeded with a few conversations."""
+    url = f"sqlite:///{tmp_path / 'plans.db'}" if request.param == "sqlite" else PLAN_TEST_DATABASE_URL
+    engine = create_engine(url, **engine_options(url))
+    init_db(engine)
+
+    service = ConversationService(session_factory=sessionmaker(bind=engine), async_session_factory=None)
+    start = datetime(2025, 1, 1)
+    for i in range(30):
+        at = start + timedelta(minutes=i)
+        service.add_turn(f"plan_conv_{i % 6}", f"question {i}", f"answer {i}", at, at + timedelta(seconds=1), agent="sales")
+
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def hot_queries(migrated_engine):
+    """Runs every hot read path once and returns the SQL statements it sent."""
+    factory = sessionmaker(bind=migrated_engine)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    def plan_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    event.listen(migrated_engine, "before_cursor_execute", record)
+    app.dependency_overrides[get_db] = plan_db
+    app.dependency_overrides[get_session_factory] = lambda: factory
+    try:
+        ConversationService(session_factory=factory, async_session_factory=None).get_last_n_messages("plan_conv_1", n=5)
+        client = TestClient(app)
+        for path, params in [("/", {"limit": 2}), ("/conversation/latest", {"limit": 2}), ("/conversations/filter", {"limit": 2})]:
+            first = client.get(path, params=params).json()
+            assert client.get(path, params={**params, "cursor": first["next_cursor"]}).status_code == 200  # Deeper page
+        assert client.get("/conversations/export", params={"since": "2025-01-01T00:10:00"}).status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+        event.remove(migrated_engine, "before_cursor_execute", record)
+
+    return migrated_engine, statements
+
+def test_hot_queries_use_indexes(hot_queries):
+    """Fails if a hot query regresses to a sequential scan of the message or summary tables."""
+    engine, statements = hot_queries
+    assert len(statements) >= 9
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = explain(conn, statement, parameters)
+            scans = [line for line in plan if FULL_SCAN.match(line.strip())]
+            assert not scans, f"Full scan in plan for:\n{statement}\n" + "\n".join(plan)
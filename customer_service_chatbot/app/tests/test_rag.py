@@ -1,9 +1,20 @@
+from unittest.mock import patch
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.rag_service import RAGPolicyRetriever
 
 client = TestClient(app)
 
-def test_retrieve_policy():
+@pytest.fixture
+def local_retriever(tmp_path):
+    """Serves /retrieve_policy from local (hashing) embeddings, so no embeddings API is needed."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path), embedding_provider="hashing", hybrid_search=True)
+    retriever.ensure_index()
+    with patch("app.api.routes.rag_retriever", retriever):
+        yield retriever
+
+def test_retrieve_policy(local_retriever):
     """Test RAG-based policy retrieval."""
     response = client.post(
         "/retrieve_policy",
@@ -15,14 +26,9 @@ def test_retrieve_policy():
     assert "retrieved_policies" in json_data
     assert isinstance(json_data["retrieved_policies"], list)
     assert len(json_data["retrieved_policies"]) > 0
+    assert any("canceled" in policy for policy in json_data["retrieved_policies"])
 
-    # ✅ Allow the test to pass if either:
-    # - The policy was correctly retrieved, OR
-    # - No relevant policy was found (because of the strict threshold)
-    retrieved_text = json_data["retrieved_policies"][0]
-    assert "Orders can only be canceled" in retrieved_text or retrieved_text == "No relevant policy found."
-
-def test_retrieve_policy_no_match():
+def test_retrieve_policy_no_match(local_retriever):
     """Test RAG retrieval when no policy is found."""
     response = client.post(
         "/retrieve_policy",
@@ -30,7 +36,17 @@ def test_retrieve_policy_no_match():
     )
     assert response.status_code == 200
     json_data = response.json()
-    
+
     assert "retrieved_policies" in json_data
     assert isinstance(json_data["retrieved_policies"], list)
-    assert json_data["retrieved_policies"] == ["No relevant policy found."]
\ No newline at end of file
+    assert json_data["retrieved_policies"] == ["No relevant policy found."]
+
+def test_retrieve_policy_unavailable(local_retriever):
+    """When embeddings fail (and there is no lexical fallback), the endpoint answers 503 with Retry-After."""
+    local_retriever.hybrid_search = False
+    with patch.object(local_retriever.embedding_provider, "aembed", side_effect=TimeoutError("embedding API timed out")):
+        response = client.post("/retrieve_policy", json={"query": "How long do refunds take?"})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "Error retrieving policy" in response.json()["detail"]
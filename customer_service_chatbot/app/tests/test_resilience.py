@@ -0,0 +1,141 @@
+import asyncio
+import time
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.pipeline import Turn, TurnPipeline
+from app.services.llm_service import LLMService
+from app.services.prompt_builder import POLICY_UNAVAILABLE
+from app.services.rag_service import PolicyRetrievalError
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller, RetryPolicy, UpstreamUnavailable, deadline_scope
+)
+
+client = TestClient(app)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_caller(**kwargs):
+    kwargs.setdefault("retry", RetryPolicy(attempts=3, base_delay=0, max_delay=0))
+    kwargs.setdefault("breaker", CircuitBreaker("test", failure_threshold=2, recovery_seconds=30))
+    return ResilientCaller("test", timeout=1.0, **kwargs)
+
+# 🟢 **Circuit Breaker**
+def test_breaker_opens_then_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow() and breaker.retry_after() == 10
+
+    clock.now = 10
+    assert breaker.allow()  # Half-open: one trial call
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.stats()["opened"] == 2
+
+def test_open_circuit_fails_fast():
+    caller = make_caller()
+    fn = MagicMock(side_effect=ConnectionError("reset"))
+    for _ in range(2):
+        try:
+            caller.call_sync(fn, retry=False)
+        except UpstreamUnavailable:
+            pass
+
+    try:
+        caller.call_sync(fn)
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError as e:
+        assert e.retry_after > 0
+    assert fn.call_count == 2 and caller.stats()["short_circuited"] == 1
+
+# 🟢 **Retries**
+def test_transient_errors_are_retried_with_jitter():
+    delays = []
+    caller = make_caller(retry=RetryPolicy(attempts=3, base_delay=0.1, max_delay=1.0, rng=lambda: 0.5),
+                         breaker=CircuitBreaker("test", failure_threshold=5))
+    fn = MagicMock(side_effect=[ConnectionError("reset"), TimeoutError(), "ok"])
+    with patch("app.services.resilience.time.sleep", side_effect=delays.append):
+        assert caller.call_sync(fn) == "ok"
+    assert delays == [0.05, 0.1]  # Half of 0.1 * 2^(retry - 1)
+
+    bad_request = MagicMock(side_effect=ValueError("bad request"))
+    try:
+        caller.call_sync(bad_request)
+    except ValueError:
+        pass
+    assert bad_request.call_count == 1  # Not retryable, and not held against the upstream
+    assert caller.breaker.consecutive_failures == 0
+
+def test_deadline_caps_attempts_and_stops_retries():
+    caller = make_caller()
+    fn = MagicMock(return_value="ok")
+    with deadline_scope(time.monotonic() + 0.25):
+        caller.call_sync(fn)
+    assert fn.call_args.args[0] <= 0.25
+
+    with deadline_scope(time.monotonic() - 1):
+        try:
+            caller.call_sync(fn)
+            assert False, "expected DeadlineExceeded"
+        except DeadlineExceeded:
+            pass
+    assert fn.call_count == 1
+
+# 🟢 **Hedging**
+def test_slow_attempt_is_hedged():
+    caller = make_caller(hedge=True, hedge_min_samples=1)
+    caller.latency.add(0.01)
+    calls = []
+
+    async def fetch(timeout):
+        calls.append(timeout)
+        await asyncio.sleep(0.5 if len(calls) == 1 else 0)
+        return len(calls)
+
+    assert asyncio.run(caller.call(fetch)) == 2
+    assert caller.stats()["hedge_wins"] == 1
+
+# 🟢 **Fallbacks**
+def test_unavailable_completions_fall_back_to_the_policy():
+    service = LLMService()
+    service.response_cache.agents = set()
+    with patch("app.services.llm_service.chat_upstream.call_sync", side_effect=CircuitOpenError("circuit open", 30)):
+        reply = service.generate_response("tech_support", "How do I reset my router?", "Hold the reset button for 10 seconds.\n\nRouters restart in 2 minutes.")
+        assert reply.endswith("Hold the reset button for 10 seconds.")
+        assert service.generate_response("tech_support", "Hello", POLICY_UNAVAILABLE) == LLMService.FALLBACK_RESPONSE
+
+def test_failed_retrieval_is_not_passed_off_as_a_policy():
+    retriever = MagicMock()
+    retriever.aretrieve_policy = AsyncMock(side_effect=PolicyRetrievalError("Error retrieving policy: timeout"))
+    conversations = MagicMock()
+    conversations.aget_last_n_messages = AsyncMock(return_value=[])
+    conversations.aadd_turn = AsyncMock()
+    pipeline = TurnPipeline(retriever, conversations)
+
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Let me follow up.") as mock_llm:
+        turn = asyncio.run(pipeline.run(Turn("sales", "conv_down", "Any discounts?")))
+
+    assert mock_llm.await_args.kwargs["policy_context"] == POLICY_UNAVAILABLE
+    assert turn.policies == [] and turn.policy_error
+    assert pipeline.stats()["policy_unavailable"] == 1
+
+def test_retrieve_policy_endpoint_returns_503():
+    with patch("app.api.routes.rag_retriever.aretrieve_policy", new_callable=AsyncMock,
+               side_effect=PolicyRetrievalError("Error retrieving policy: circuit open")):
+        response = client.post("/retrieve_policy", json={"query": "refunds"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,81 @@
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.embeddings import HashingEmbeddingProvider
+from app.services.llm_service import LLMService
+from app.services.response_cache import ResponseCache
+
+client = TestClient(app)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def completion(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+# 🟢 **Response Cache Tests**
+def test_exact_match_on_canonical_key():
+    """Normalized input with the same agent, model and policy context hits the cache."""
+    cache = ResponseCache()
+    cache.set("sales", "gpt-4", 0.5, "Do you have discounts?", "Policy A", "10% off annual plans.")
+
+    assert cache.get("sales", "gpt-4", 0.5, "  do you HAVE discounts? ", "Policy A") == "10% off annual plans."
+    assert cache.get("sales", "gpt-4", 0.5, "Do you have discounts?", "Policy B") is None
+    assert cache.get("tech_support", "gpt-4", 0.5, "Do you have discounts?", "Policy A") is None
+
+def test_semantic_match_above_threshold():
+    """Near-identical questions reuse an answer when semantic matching is enabled."""
+    cache = ResponseCache(semantic_threshold=0.7, embed_fn=HashingEmbeddingProvider().embed)
+    cache.set("tech_support", "gpt-4", 0.5, "My internet is very slow", "Policy", "Try restarting your router.")
+
+    assert cache.get("tech_support", "gpt-4", 0.5, "my internet is very slow today", "Policy") == "Try restarting your router."
+    assert cache.get("tech_support", "gpt-4", 0.5, "How do I schedule a technician?", "Policy") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_ttl_and_size_bounds():
+    """Entries expire after the TTL and the least recently used entry is evicted."""
+    clock = FakeClock()
+    cache = ResponseCache(max_size=2, ttl_seconds=60, clock=clock)
+    cache.set("sales", "gpt-4", 0.5, "a", "p", "A")
+    cache.set("sales", "gpt-4", 0.5, "b", "p", "B")
+    cache.set("sales", "gpt-4", 0.5, "c", "p", "C")
+
+    assert cache.get("sales", "gpt-4", 0.5, "a", "p") is None
+    clock.now += 61
+    assert cache.get("sales", "gpt-4", 0.5, "c", "p") is None
+
+def test_llm_service_serves_repeats_from_cache():
+    """A repeated turn skips the completion call; errors and disabled agents are never cached."""
+    service = LLMService()
+    service.response_cache = ResponseCache(agents=["sales"])
+
+    with patch.object(service.client.chat.completions, "create", return_value=completion("Hello!")) as mock_create:
+        assert service.generate_response("sales", "Hi there", "Policy") == "Hello!"
+        assert service.generate_response("sales", "hi there", "Policy") == "Hello!"
+        assert mock_create.call_count == 1
+
+        service.generate_response("tech_support", "Hi there", "Policy")
+        service.generate_response("tech_support", "Hi there", "Policy")
+        assert mock_create.call_count == 3
+
+        service.generate_response("sales", "Hi there", "Policy", use_cache=False)
+        assert mock_create.call_count == 4
+
+def test_bypass_header_reaches_llm_service():
+    """`X-Cache-Bypass: true` turns off the cache lookup for that request."""
+    with patch("app.api.routes.rag_retriever.aretrieve_policy", new_callable=AsyncMock, return_value=["No relevant policy found."]), \
+         patch("app.api.routes.conversation_service.aget_last_n_messages", new_callable=AsyncMock, return_value=[]), \
+         patch("app.api.routes.conversation_service.aadd_turn", new_callable=AsyncMock), \
+         patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Fresh answer") as mock_llm:
+        response = client.post(
+            "/conversation/sales",
+            json={"conversation_id": "test_cache_bypass", "user_input": "Do you have discounts?"},
+            headers={"X-Cache-Bypass": "true"}
+        )
+
+    assert response.status_code == 200
+    assert mock_llm.await_args.kwargs["use_cache"] is False
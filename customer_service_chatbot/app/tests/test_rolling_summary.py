@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.api.pipeline import Turn, TurnPipeline
+from app.models.database import Base, engine_options
+from app.services.conversation_service import ConversationService
+from app.services.prompt_builder import PromptBuilder
+from app.services.summary_service import ConversationSummarizer
+
+T0 = datetime(2025, 1, 1)
+
+@pytest.fixture
+def conversations(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    yield ConversationService(session_factory=sessionmaker(bind=engine), async_session_factory=None)
+    engine.dispose()
+
+def add_turns(conversations, conversation_id, count, start=0):
+    for i in range(start, start + count):
+        at = T0 + timedelta(minutes=i)
+        conversations.add_turn(conversation_id, f"question {i}", f"answer {i}", at, at + timedelta(seconds=1))
+
+async def fake_summarize(summary, messages):
+    return " | ".join(([summary] if summary else []) + [msg.content for msg in messages])
+
+# 🟢 **Incremental Updates**
+def test_only_messages_outside_the_window_are_folded(conversations):
+    summarizer = ConversationSummarizer(conversations, AsyncMock(side_effect=fake_summarize), recent_messages=4)
+    add_turns(conversations, "conv_r", 2)
+    assert asyncio.run(summarizer.update("conv_r")) == 0  # Everything still fits in the window
+    assert asyncio.run(summarizer.aget("conv_r")) is None
+
+    add_turns(conversations, "conv_r", 1, start=2)
+    assert asyncio.run(summarizer.update("conv_r")) == 2
+    assert asyncio.run(summarizer.aget("conv_r")) == "question 0 | answer 0"
+
+    add_turns(conversations, "conv_r", 1, start=3)
+    assert asyncio.run(summarizer.update("conv_r")) == 2  # Only the turn that just left the window
+    assert summarizer.summarize.await_args.args[0] == "question 0 | answer 0"
+    assert [msg.content for msg in summarizer.summarize.await_args.args[1]] == ["question 1", "answer 1"]
+
+    summarizer.invalidate("conv_r")  # Persisted on the conversation row, not just cached
+    assert asyncio.run(summarizer.aget("conv_r")) == "question 0 | answer 0 | question 1 | answer 1"
+    assert summarizer.stats()["folded_messages"] == 4
+
+def test_backlog_is_folded_in_batches(conversations):
+    summarizer = ConversationSummarizer(conversations, AsyncMock(side_effect=fake_summarize), recent_messages=2, batch_messages=4)
+    add_turns(conversations, "conv_b", 6)
+
+    asyncio.run(summarizer._run("conv_b"))
+    assert [call.args[1][0].content for call in summarizer.summarize.await_args_list] == ["question 0", "question 2", "question 4"]
+    assert summarizer.stats()["updates"] == 3
+
+def test_failed_update_keeps_the_stored_summary(conversations):
+    summarizer = ConversationSummarizer(conversations, AsyncMock(side_effect=fake_summarize), recent_messages=2)
+    add_turns(conversations, "conv_f", 2)
+    asyncio.run(summarizer.update("conv_f"))
+
+    add_turns(conversations, "conv_f", 1, start=2)
+    summarizer.summarize.side_effect = RuntimeError("API down")
+    asyncio.run(summarizer._run("conv_f"))
+    summarizer.invalidate("conv_f")
+    assert asyncio.run(summarizer.aget("conv_f")) == "question 0 | answer 0"
+    assert summarizer.stats()["failures"] == 1
+
+# 🟢 **Background Scheduling**
+def test_turns_during_an_update_trigger_one_more_pass():
+    async def scenario():
+        release = asyncio.Event()
+        summarizer = ConversationSummarizer(MagicMock(), AsyncMock(), recent_messages=2)
+
+        async def slow_update(conversation_id):
+            await release.wait()
+            return 0
+
+        with patch.object(summarizer, "update", side_effect=slow_update) as mock_update:
+            task = summarizer.schedule("conv_s")
+            await asyncio.sleep(0)
+            assert summarizer.schedule("conv_s") is task and summarizer.schedule("conv_s") is task
+            release.set()
+            await task
+        return mock_update.await_count
+
+    assert asyncio.run(scenario()) == 2
+
+def test_pipeline_sends_summary_and_schedules_updates():
+    retriever = MagicMock()
+    retriever.aretrieve_policy = AsyncMock(return_value=["Policy: Discounts apply."])
+    conversations = MagicMock()
+    conversations.aget_last_n_messages = AsyncMock(return_value=[MagicMock(sender="user", content=f"m{i}") for i in range(4)])
+    conversations.aadd_turn = AsyncMock()
+    summaries = MagicMock()
+    summaries.aget = AsyncMock(return_value="Customer asked about the Premium Plan.")
+    pipeline = TurnPipeline(retriever, conversations, history_messages=4, summaries=summaries)
+
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Sure.") as mock_llm:
+        asyncio.run(pipeline.run(Turn("sales", "conv_p", "And the annual price?")))
+
+    assert mock_llm.await_args.kwargs["summary"] == "Customer asked about the Premium Plan."
+    summaries.schedule.assert_called_once_with("conv_p")
+
+    conversations.aget_last_n_messages.return_value = []
+    summaries.reset_mock()
+    with patch("app.agents.base.llm_service.agenerate_response", new_callable=AsyncMock, return_value="Hi!"):
+        asyncio.run(pipeline.run(Turn("sales", "conv_new", "Hello")))
+    summaries.aget.assert_not_called()  # A short conversation has nothing summarized
+    summaries.schedule.assert_not_called()
+
+# 🟢 **Prompt Assembly**
+def test_summary_goes_into_the_system_message():
+    builder = PromptBuilder({"gpt-4": 1000}, use_tiktoken=False)
+    prompt = builder.build("gpt-4", "You are helpful.", "And the price?", "Policy A.", [], summary="Customer wants the Premium Plan.")
+
+    assert prompt.messages[0]["content"].endswith("Customer wants the Premium Plan.")
+    assert prompt.tokens["summary"] > 0 and prompt.conversational
+    assert "Customer wants the Premium Plan." in prompt.cache_context
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch, MagicMock
+from app.services.single_flight import SingleFlight
+from app.services.llm_service import LLMService
+from app.services.response_cache import ResponseCache
+
+# 🟢 **Single-Flight Tests**
+def test_concurrent_async_callers_share_one_call():
+    """Dozens of identical in-flight requests trigger a single upstream call."""
+    flight = SingleFlight("test")
+    upstream_calls = []
+
+    async def upstream():
+        upstream_calls.append(1)
+        await asyncio.sleep(0.05)
+        return "embedding"
+
+    async def burst():
+        return await asyncio.gather(*[flight.do("my internet is slow", upstream) for _ in range(30)])
+
+    results = asyncio.run(burst())
+    assert results == ["embedding"] * 30
+    assert len(upstream_calls) == 1
+    assert flight.stats()["collapsed_calls"] == 29
+    assert flight.stats()["in_flight"] == 0
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight("test")
+
+    async def upstream(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        return await asyncio.gather(flight.do("a", lambda: upstream("a")), flight.do("b", lambda: upstream("b")))
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert flight.stats()["upstream_calls"] == 2
+
+def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rate limited")
+
+    async def run():
+        return await asyncio.gather(*[flight.do("k", failing) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_cancelled_leader_does_not_cancel_followers():
+    """A client disconnect on the first request doesn't fail the coalesced ones."""
+    flight = SingleFlight("test")
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+def test_sync_callers_share_one_call():
+    """Threads calling the sync API with the same key are coalesced too."""
+    flight = SingleFlight("test")
+    upstream_calls = []
+    results = []
+
+    def upstream():
+        upstream_calls.append(1)
+        time.sleep(0.1)
+        return "shared"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do_sync("k", upstream))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["shared"] * 8
+    assert len(upstream_calls) == 1
+
+def test_llm_service_coalesces_identical_turns():
+    """Identical concurrent turns send one chat completion."""
+    service = LLMService()
+    service.response_cache = ResponseCache(agents=[])  # isolate coalescing from caching
+
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(0.05)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="Restart your router."))])
+
+    async def burst():
+        return await asyncio.gather(*[service.agenerate_response("tech_support", "My internet is slow", "Policy") for _ in range(10)])
+
+    with patch.object(service.async_client.chat.completions, "create", side_effect=slow_completion) as mock_create:
+        results = asyncio.run(burst())
+
+    assert results == ["Restart your router."] * 10
+    assert mock_create.call_count == 1
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.health import Warmup, warmup
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 🟢 **Cold Start**
+def test_import_is_fast_and_defers_heavy_dependencies():
+    """`import app.main` in a fresh interpreter doesn't load the vector store, document loaders or OpenAI client."""
+    code = (
+        "import json, sys, time; start = time.perf_counter(); import app.main; "
+        "print(json.dumps({'seconds': time.perf_counter() - start, "
+        "'loaded': [m for m in ('chromadb', 'llama_index', 'openai') if m in sys.modules]}))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["loaded"] == []
+    assert report["seconds"] < 5.0  # ~1s here; eagerly importing llama_index + chromadb + openai tripled it
+
+# 🟢 **Health & Readiness**
+def test_warmup_retries_failed_steps_until_ready():
+    attempts = []
+
+    def flaky_database():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("db unreachable")
+
+    steps = Warmup()
+    steps.add_step("database", flaky_database)
+    steps.add_step("policy_index", lambda: None)
+
+    async def run():
+        await steps.start()
+        failed = {name: dict(state) for name, state in steps.state.items()}
+        await steps.start()  # e.g. the next /readyz call
+        return failed
+
+    failed = asyncio.run(run())
+    assert failed["database"]["status"] == "failed" and "unreachable" in failed["database"]["error"]
+    assert failed["policy_index"]["status"] == "pending"  # Not attempted after an earlier failure
+    assert steps.ready and len(attempts) == 2
+
+def test_healthz_and_readyz():
+    client = TestClient(app)
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+    saved = dict(warmup.state)
+    try:
+        warmup.state.update({name: {"status": "ok"} for name in warmup.state})
+        response = client.get("/readyz")
+        assert response.status_code == 200 and response.json()["status"] == "ready"
+
+        warmup.state["database"] = {"status": "failed", "error": "db unreachable"}
+        with patch.object(warmup, "start") as mock_start:
+            response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["steps"]["database"] == {"status": "failed", "error": "db unreachable"}
+        mock_start.assert_called_once()  # The failed step is retried in the background
+    finally:
+        warmup.state.update(saved)
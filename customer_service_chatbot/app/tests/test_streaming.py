@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import routes as app_routes
+from config import REQUEST_DEADLINE_SECONDS
+
+client = TestClient(app)
+
+def parse_sse(body: str):
+    """Parses a Server-Sent Events body into (event, data) tuples."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+async def fake_token_stream(**kwargs):
+    for token in ["Hello", ", ", "how can I help?"]:
+        yield token
+
+@pytest.fixture
+def offline_turn():
+    """Stubs retrieval, history and persistence so streaming can be tested offline."""
+    with patch("app.api.routes.rag_retriever.aretrieve_policy", new_callable=AsyncMock, return_value=["No relevant policy found."]), \
+         patch("app.api.routes.conversation_service.aget_last_n_messages", new_callable=AsyncMock, return_value=[]), \
+         patch("app.api.routes.conversation_service.aadd_turn", new_callable=AsyncMock) as mock_store:
+        yield mock_store
+
+def test_sse_streams_tokens_and_persists_full_response(offline_turn):
+    """SSE: tokens are forwarded as they arrive and the joined response is stored."""
+    with patch("app.agents.base.llm_service.astream_response", side_effect=fake_token_stream):
+        response = client.post(
+            "/conversation/sales/stream",
+            json={"conversation_id": "test_stream_1", "user_input": "Do you have discounts?"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "Server-Timing" not in response.headers  # Sent before generation, so timings come in the done event
+
+    events = parse_sse(response.text)
+    assert [e for e, _ in events] == ["token", "token", "token", "done"]
+    assert events[-1][1]["agent_response"] == "Hello, how can I help?"
+    assert "generate" in events[-1][1]["timings_ms"]
+    stored = [call.args[:3] for call in offline_turn.await_args_list]
+    assert stored == [("test_stream_1", "Do you have discounts?", "Hello, how can I help?")]
+
+def test_sse_policy_rejection_is_single_event(offline_turn):
+    """SSE: policy short-circuit replies are sent as one token event."""
+    response = client.post(
+        "/conversation/tech_support/stream",
+        json={"conversation_id": "test_stream_2", "user_input": "Can you reset my password?"}
+    )
+
+    events = parse_sse(response.text)
+    assert [e for e, _ in events] == ["token", "done"]
+    assert "❌" in events[0][1]["content"]
+
+def test_websocket_streams_tokens(offline_turn):
+    """WebSocket: each turn yields token messages followed by a done message."""
+    with patch("app.agents.base.llm_service.astream_response", side_effect=fake_token_stream):
+        with client.websocket_connect("/conversation/customer_support/ws") as websocket:
+            websocket.send_json({"conversation_id": "test_stream_3", "user_input": "Where is my order?"})
+            messages = []
+            while True:
+                message = websocket.receive_json()
+                messages.append(message)
+                if message["event"] in ("done", "error"):
+                    break
+
+            websocket.send_json({"conversation_id": "test_stream_3", "user_input": "   "})
+            assert websocket.receive_json()["event"] == "error"
+
+    assert [m["event"] for m in messages] == ["token", "token", "token", "done"]
+    assert messages[-1]["agent_response"] == "Hello, how can I help?"
+
+def test_queueing_does_not_count_against_the_stream_deadline(offline_turn):
+    """The turn's deadline starts once it holds an admission slot, as for non-streamed turns."""
+    admission = app_routes.admission_controller
+    acquire = admission.acquire
+    admitted_at, deadlines = [], []
+
+    async def slow_acquire(agent):
+        await asyncio.sleep(0.05)  # Queued behind other turns
+        admitted_at.append(time.monotonic())
+        return await acquire(agent)
+
+    async def retrieve(turn):
+        deadlines.append(turn.deadline)
+
+    with patch.object(admission, "acquire", side_effect=slow_acquire), patch.object(app_routes.pipeline, "retrieve", side_effect=retrieve), \
+         patch("app.agents.base.llm_service.astream_response", side_effect=fake_token_stream):
+        client.post("/conversation/sales/stream", json={"conversation_id": "test_stream_4", "user_input": "Any discounts?"})
+
+    assert deadlines[0] >= admitted_at[0] + REQUEST_DEADLINE_SECONDS
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.services.vector_store import NumpyVectorStore, ChromaVectorStore, get_vector_store
+from app.services.rag_service import RAGPolicyRetriever
+
+DOCS = ["Refunds within 14 days.", "Orders can only be canceled before shipping.", "Passwords require authentication."]
+EMBEDDINGS = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.6, 0.8]]
+
+# 🟢 **Vector Store Tests**
+def test_numpy_store_returns_top_k_by_cosine(tmp_path):
+    """NumPy backend ranks documents by cosine similarity."""
+    store = NumpyVectorStore(path=str(tmp_path))
+    store.add(["p0", "p1", "p2"], DOCS, EMBEDDINGS)
+
+    matches = store.query([0.0, 2.0, 0.0], top_k=2)
+    assert [doc for doc, _ in matches] == [DOCS[1], DOCS[2]]
+    assert matches[0][1] == pytest.approx(1.0)
+    assert matches[1][1] == pytest.approx(0.6)
+
+def test_numpy_store_persists_memory_mapped_index(tmp_path):
+    """A new store instance memory-maps the saved float32 matrix."""
+    NumpyVectorStore(path=str(tmp_path)).add(["p0", "p1", "p2"], DOCS, EMBEDDINGS)
+
+    reopened = NumpyVectorStore(path=str(tmp_path))
+    matrix = reopened._index[0]
+    assert reopened.count() == 3
+    assert isinstance(matrix, np.memmap)
+    assert matrix.dtype == np.float32
+    assert reopened.query([1.0, 0.0, 0.0], top_k=1)[0][0] == DOCS[0]
+
+def test_chroma_store_reports_cosine_similarity(tmp_path):
+    """Chroma distances are converted to the same similarity scale as the NumPy backend."""
+    store = ChromaVectorStore(path=str(tmp_path))
+    store.add(["p0", "p1", "p2"], DOCS, EMBEDDINGS)
+
+    matches = store.query([0.0, 1.0, 0.0], top_k=2)
+    assert matches[0] == (DOCS[1], pytest.approx(1.0, abs=1e-4))
+    assert matches[1] == (DOCS[2], pytest.approx(0.6, abs=1e-4))
+
+def test_unknown_backend_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        get_vector_store("faiss", path=str(tmp_path))
+
+def test_retriever_with_numpy_backend(tmp_path):
+    """RAGPolicyRetriever filters NumPy matches by similarity threshold."""
+    retriever = RAGPolicyRetriever(backend="numpy", db_path=str(tmp_path))
+    retriever.vector_store.add(["p0", "p1", "p2"], DOCS, EMBEDDINGS)
+
+    with patch.object(retriever.embedding_provider, "embed", return_value=[[0.0, 1.0, 0.05]]):
+        assert retriever.retrieve_policy("Can I cancel my order?", similarity_threshold=0.8) == [DOCS[1]]
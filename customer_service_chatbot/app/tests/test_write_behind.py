@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.models.database import Base, engine_options, session_scope
+from app.models.conversation import Conversation
+from app.services.conversation_service import ConversationService
+from app.services.write_behind import WriteBehindQueue
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+def count_inserts(engine):
+    """Records every INSERT into the messages table."""
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("INSERT INTO conversations "):
+            statements.append(statement)
+
+    return statements
+
+# 🟢 **Turn Writes**
+def test_turn_is_one_insert_in_one_transaction(sqlite_engine):
+    inserts = count_inserts(sqlite_engine)
+    service = ConversationService(session_factory=sessionmaker(bind=sqlite_engine), async_session_factory=None)
+    now = datetime.utcnow()
+
+    service.add_turn("conv_turn", "Hi", "Hello!", user_timestamp=now, bot_timestamp=now)
+
+    assert len(inserts) == 1
+    messages = service.get_last_n_messages("conv_turn")
+    assert [(m.sender, m.content) for m in messages] == [("user", "Hi"), ("bot", "Hello!")]
+    assert messages[1].timestamp > messages[0].timestamp  # Reply sorts after the question even with equal clocks
+
+# 🟢 **Write-Behind Queue**
+def test_flushes_on_batch_size():
+    batches = []
+
+    async def flush(rows):
+        batches.append(len(rows))
+
+    async def run():
+        queue = WriteBehindQueue(flush, max_batch_size=4, flush_interval=10)
+        queue.start()
+        for i in range(4):
+            await queue.enqueue([{"conversation_id": "c", "n": i}, {"conversation_id": "c", "n": -i}])
+        await asyncio.sleep(0.05)
+        flushed_before_stop = list(batches)
+        await queue.stop()
+        return flushed_before_stop
+
+    assert asyncio.run(run()) == [4, 4]
+
+def test_flushes_on_interval_and_on_stop():
+    batches = []
+
+    async def flush(rows):
+        batches.append(len(rows))
+
+    async def run():
+        queue = WriteBehindQueue(flush, max_batch_size=100, flush_interval=0.02)
+        queue.start()
+        for _ in range(3):
+            await queue.enqueue([{"conversation_id": "c"}])
+        await asyncio.sleep(0.1)
+        assert batches == [3]  # Interval elapsed before the batch filled up
+
+        queue.flush_interval = 10
+        for _ in range(2):
+            await queue.enqueue([{"conversation_id": "c"}])
+        await queue.stop()  # Shutdown flushes what is still queued
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert batches == [3, 2]
+    assert stats["flushed_rows"] == 5 and stats["queued"] == 0
+
+def test_bounded_queue_applies_backpressure():
+    release = None
+
+    async def slow_flush(rows):
+        await release.wait()
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        queue = WriteBehindQueue(slow_flush, max_batch_size=2, flush_interval=0, max_queue_size=2)
+        queue.start()
+        async def produce():
+            for _ in range(8):
+                await queue.enqueue([{"conversation_id": "c"}])
+
+        producer = asyncio.create_task(produce())
+        await asyncio.sleep(0.05)
+        blocked = not producer.done()
+        release.set()
+        await producer
+        await queue.stop()
+        return blocked, queue.stats()
+
+    blocked, stats = asyncio.run(run())
+    assert blocked
+    assert stats["backpressure_waits"] > 0 and stats["flushed_rows"] == 8
+
+def test_queued_turns_are_visible_and_written_in_batches(sqlite_engine):
+    """History reads include queued turns; the flusher writes them with few INSERTs."""
+    inserts = count_inserts(sqlite_engine)
+    factory = sessionmaker(bind=sqlite_engine)
+    service = ConversationService(session_factory=factory, async_session_factory=None, write_behind=True,
+                                  write_behind_batch_size=50, write_behind_flush_interval=10)
+
+    async def run():
+        service.write_behind.start()
+        await asyncio.gather(*[service.aadd_turn(f"conv_{i % 2}", f"q{i}", f"a{i}") for i in range(10)])
+        history = await service.aget_last_n_messages("conv_0", n=4)
+        await service.write_behind.stop()
+        return history
+
+    history = asyncio.run(run())
+    assert [m.content for m in history] == ["q6", "a6", "q8", "a8"]
+    assert len(inserts) == 1
+    with session_scope(factory) as session:
+        assert session.query(Conversation).count() == 20
+
+def test_turns_are_never_split_across_flushes():
+    batches = []
+
+    async def flush(rows):
+        batches.append([row["n"] for row in rows])
+
+    async def run():
+        queue = WriteBehindQueue(flush, max_batch_size=3, flush_interval=10)
+        queue.start()
+        for turn in range(3):
+            await queue.enqueue([{"conversation_id": "c", "n": turn}, {"conversation_id": "c", "n": turn}])
+        await queue.stop()
+
+    asyncio.run(run())
+    assert batches == [[0, 0, 1, 1], [2, 2]]  # A batch ends after the turn that fills it
+
+def test_discarded_turns_are_never_written():
+    written = []
+    release = None
+
+    async def flush(rows):
+        await release.wait()
+        written.extend(row["conversation_id"] for row in rows)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        queue = WriteBehindQueue(flush, max_batch_size=2, flush_interval=0)
+        queue.start()
+        await queue.enqueue([{"conversation_id": "kept"}, {"conversation_id": "kept"}])
+        await asyncio.sleep(0.01)  # "kept" is being written, the next turns wait in the queue
+        await queue.enqueue([{"conversation_id": "gone"}, {"conversation_id": "gone"}])
+        await queue.enqueue([{"conversation_id": "kept"}, {"conversation_id": "kept"}])
+
+        await queue.discard("gone")
+        assert queue.pending("gone") == [] and len(queue.pending("kept")) == 4
+
+        discarding = asyncio.create_task(queue.discard("kept"))  # Waits for the batch being written
+        await asyncio.sleep(0.01)
+        assert not discarding.done()
+        release.set()
+        await discarding
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert written == ["kept", "kept"]
+    assert stats["discarded_rows"] == 4
@@ -0,0 +1 @@
+"""Offline load testing: a fake OpenAI server, a load generator and JSON latency reports (see README, "Load Testing")."""
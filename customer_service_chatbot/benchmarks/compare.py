@@ -0,0 +1,38 @@
+"""
+Compares two benchmark reports endpoint by endpoint.
+
+Usage (from customer_service_chatbot/):
+    python -m benchmarks.compare benchmarks/results/main.json benchmarks/results/branch.json --max-regression 0.1
+
+Exits with status 1 when p95/p99 latency or throughput got worse by more than
+`--max-regression`, or the error rate grew, so it can gate a deploy.
+"""
+import argparse
+import json
+import sys
+from benchmarks.report import compare
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Allowed relative change (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.max_regression)
+    print(f"🔹 {baseline.get('label')} ({baseline.get('git_commit')}) → {candidate.get('label')} ({candidate.get('git_commit')})")
+    for row in rows:
+        changes = "  ".join(f"{key} {row[key][0]}→{row[key][1]}" for key in ("p50", "p95", "p99", "throughput_rps", "error_rate"))
+        print(f"{'❌' if row['regressed'] else '✅'} {row['endpoint']:<38}{changes}")
+
+    regressed = [row["endpoint"] for row in rows if row["regressed"]]
+    if regressed:
+        sys.exit(f"❌ Regressions in: {', '.join(regressed)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the OpenAI API: chat completions (plain and streamed) and embeddings.
+
+Answers take a configurable, randomly drawn time and fail at a configurable
+rate, so the chatbot's throughput and tail latency can be measured offline.
+
+Usage (from customer_service_chatbot/):
+    python -m benchmarks.fake_openai --port 9000 --chat-latency lognormal:800,0.4 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 uvicorn app.main:app
+
+Latency specs (milliseconds): `fixed:MS`, `uniform:LOW,HIGH`, `lognormal:MEDIAN,SIGMA`.
+Embeddings are local hashed n-gram vectors, so similar texts still get similar vectors.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.embeddings import HashingEmbeddingProvider
+
+class Latency:
+    """A latency distribution parsed from a spec such as `lognormal:800,0.4` (samples are seconds)."""
+
+    KINDS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}'. Valid distributions: {list(self.KINDS)}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value.strip()]
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(self.params[0], self.params[1])
+        else:
+            ms = self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return max(0.0, ms) / 1000
+
+class FakeOpenAI:
+    """Behaviour of the fake server (read from `FAKE_OPENAI_*` environment variables by `create_app`)."""
+
+    REPLY = ("Thank you for reaching out. According to our policy, this request can be handled within 14 days. "
+             "Please share your order number so I can help you further.")
+
+    def __init__(self, chat_latency: str = "lognormal:800,0.4", embedding_latency: str = "lognormal:60,0.3",
+                 token_latency: str = "fixed:15", error_rate: float = 0.0, escalation_rate: float = 0.0,
+                 reply_words: int = 40, embedding_dim: int = 1536, seed: Optional[int] = None):
+        rng = random.Random(seed)
+        self.chat_latency = Latency(chat_latency, rng)
+        self.embedding_latency = Latency(embedding_latency, rng)
+        self.token_latency = Latency(token_latency, rng)
+        self.error_rate = error_rate
+        self.escalation_rate = escalation_rate
+        self.reply_words = reply_words
+        self.embedder = HashingEmbeddingProvider(dim=embedding_dim)
+        self.rng = rng
+        self.requests: Counter = Counter()  # endpoint -> count
+        self.errors: Counter = Counter()  # status -> count
+
+    @classmethod
+    def from_env(cls) -> "FakeOpenAI":
+        seed = os.getenv("FAKE_OPENAI_SEED")
+        return cls(
+            chat_latency=os.getenv("FAKE_OPENAI_CHAT_LATENCY", "lognormal:800,0.4"),
+            embedding_latency=os.getenv("FAKE_OPENAI_EMBEDDING_LATENCY", "lognormal:60,0.3"),
+            token_latency=os.getenv("FAKE_OPENAI_TOKEN_LATENCY", "fixed:15"),
+            error_rate=float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0")),
+            escalation_rate=float(os.getenv("FAKE_OPENAI_ESCALATION_RATE", "0")),
+            reply_words=int(os.getenv("FAKE_OPENAI_REPLY_WORDS", "40")),
+            embedding_dim=int(os.getenv("FAKE_OPENAI_EMBEDDING_DIM", "1536")),
+            seed=int(seed) if seed else None
+        )
+
+    def failure(self) -> Optional[JSONResponse]:
+        """A random 429 or 500 response, `error_rate` of the time."""
+        if self.rng.random() >= self.error_rate:
+            return None
+        status = self.rng.choice((429, 500))
+        self.errors[status] += 1
+        return JSONResponse(status_code=status, content={"error": {
+            "message": "Simulated upstream failure", "type": "rate_limit_error" if status == 429 else "server_error", "code": None
+        }})
+
+    def reply(self, messages: List[dict]) -> str:
+        # Tiers that may escalate are told the marker in their system prompt (see ESCALATION_INSTRUCTION)
+        system = messages[0].get("content", "") if messages else ""
+        if "reply with exactly: " in system and self.rng.random() < self.escalation_rate:
+            return system.rsplit("reply with exactly: ", 1)[1].split()[0]
+        words = self.REPLY.split()
+        return " ".join(words[i % len(words)] for i in range(self.reply_words))
+
+    def stats(self) -> dict:
+        return {
+            "requests": dict(self.requests),
+            "errors": {str(status): count for status, count in self.errors.items()},
+            "chat_latency": self.chat_latency.spec,
+            "embedding_latency": self.embedding_latency.spec,
+            "token_latency": self.token_latency.spec,
+            "error_rate": self.error_rate,
+            "escalation_rate": self.escalation_rate
+        }
+
+def completion(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+    }
+
+def chunk(completion_id: str, model: str, content: Optional[str], finish_reason: Optional[str] = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    return "data: " + json.dumps({
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }) + "\n\n"
+
+def create_app(fake: Optional[FakeOpenAI] = None) -> FastAPI:
+    fake = fake or FakeOpenAI.from_env()
+    app = FastAPI(title="Fake OpenAI API")
+    app.state.fake = fake
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stream = bool(body.get("stream"))
+        fake.requests["chat_stream" if stream else "chat"] += 1
+        await asyncio.sleep(fake.chat_latency.sample())  # Time to first token
+        failed = fake.failure()
+        if failed is not None:
+            return failed
+
+        model, content = body.get("model", "gpt-4"), fake.reply(body.get("messages", []))
+        if not stream:
+            return completion(model, content)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        async def events():
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    await asyncio.sleep(fake.token_latency.sample())
+                yield chunk(completion_id, model, word if i == 0 else " " + word)
+            yield chunk(completion_id, model, None, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fake.requests["embeddings"] += 1
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        await asyncio.sleep(fake.embedding_latency.sample())
+        failed = fake.failure()
+        if failed is not None:
+            return failed
+        vectors = fake.embedder.embed(texts)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        """Request and simulated error counts (collected into benchmark reports)."""
+        return fake.stats()
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for offline load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--chat-latency", default="lognormal:800,0.4", help="Time to the first token, e.g. lognormal:800,0.4")
+    parser.add_argument("--embedding-latency", default="lognormal:60,0.3")
+    parser.add_argument("--token-latency", default="fixed:15", help="Delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429/500")
+    parser.add_argument("--escalation-rate", type=float, default=0.0, help="Share of cascade tiers that answer with the escalation marker")
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    fake = FakeOpenAI(args.chat_latency, args.embedding_latency, args.token_latency, args.error_rate, args.escalation_rate,
+                      args.reply_words, args.embedding_dim, args.seed)
+    print(f"🔹 Fake OpenAI API on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
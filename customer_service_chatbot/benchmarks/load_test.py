@@ -0,0 +1,237 @@
+"""
+Open-loop load generator for a running chatbot API.
+
+Requests are started on a fixed schedule (`--rps`, constant or Poisson
+arrivals) whether or not earlier ones have finished, and each latency is
+measured from its scheduled start, so a slow server can't hide its queueing
+delay by slowing the generator down. Every virtual client sends its own
+`X-API-Key` (`bench-client-<n>`), so per-client rate limits apply as they
+would in production once the server lists those keys in `RATE_LIMIT_API_KEYS`.
+
+Usage (from customer_service_chatbot/):
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rps 20 --duration 60 --out benchmarks/results/run.json
+
+To start the API and a fake OpenAI server as well, use `python -m benchmarks.run`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import httpx
+from benchmarks.report import Recorder
+
+AGENTS = ("customer_support", "sales", "tech_support")
+
+QUESTIONS = {
+    "customer_support": [
+        "I want a refund for a product I bought last week.",
+        "My order never arrived, can you check it?",
+        "How long does shipping take?",
+        "Can I cancel my order?"
+    ],
+    "sales": [
+        "Do you have a discount on the Premium Plan?",
+        "What is the price of the annual subscription?",
+        "If I buy 3 Premium Plans with a 10% discount each, how much do I save?",
+        "Which plan is best for a small team?"
+    ],
+    "tech_support": [
+        "My internet is very slow.",
+        "I can't reset my password.",
+        "The app crashes when I open settings.",
+        "How do I update my router firmware?"
+    ]
+}
+
+SCENARIOS = ("conversation", "stream", "retrieve_policy", "latest", "filter", "root")  # LoadGenerator methods
+DEFAULT_MIX = "conversation=0.6,stream=0.1,retrieve_policy=0.15,latest=0.05,filter=0.05,root=0.05"
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """"scenario=weight,..." -> normalized weights."""
+    weights = {name.strip(): float(weight) for name, weight in (entry.split("=") for entry in spec.split(",") if entry.strip())}
+    unknown = set(weights) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {sorted(unknown)}. Valid scenarios: {sorted(SCENARIOS)}")
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, clients: int = 100, conversations: int = 200,
+                 rng: Optional[random.Random] = None):
+        self.client = client
+        self.recorder = recorder
+        self.clients = clients
+        self.conversations = conversations
+        self.rng = rng or random.Random()
+
+    def _turn(self):
+        agent = self.rng.choice(AGENTS)
+        conversation = f"bench_{self.rng.randrange(self.conversations)}"
+        headers = {"X-API-Key": f"bench-client-{self.rng.randrange(self.clients)}"}
+        return agent, {"conversation_id": conversation, "user_input": self.rng.choice(QUESTIONS[agent])}, headers
+
+    async def _send(self, endpoint: str, scheduled: float, request) -> None:
+        try:
+            response = await request
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0  # Timeout or connection error
+        self.recorder.record(endpoint, status, time.perf_counter() - scheduled)
+
+    async def conversation(self, scheduled: float):
+        agent, body, headers = self._turn()
+        await self._send(f"conversation/{agent}", scheduled, self.client.post(f"/conversation/{agent}", json=body, headers=headers))
+
+    async def stream(self, scheduled: float):
+        agent, body, headers = self._turn()
+        endpoint, first_byte, status = f"conversation_stream/{agent}", None, 0
+        try:
+            async with self.client.stream("POST", f"/conversation/{agent}/stream", json=body, headers=headers) as response:
+                status = response.status_code
+                async for event in response.aiter_lines():
+                    if first_byte is None and event.startswith("event: token"):
+                        first_byte = time.perf_counter() - scheduled
+                    if event.startswith("event: error"):
+                        status = 500  # Failed mid-stream after a 200
+        except httpx.HTTPError:
+            status = 0
+        self.recorder.record(endpoint, status, time.perf_counter() - scheduled, first_byte)
+
+    async def retrieve_policy(self, scheduled: float):
+        _, body, headers = self._turn()
+        await self._send("retrieve_policy", scheduled, self.client.post("/retrieve_policy", json={"query": body["user_input"]}, headers=headers))
+
+    async def latest(self, scheduled: float):
+        _, body, _ = self._turn()
+        await self._send("conversation/latest", scheduled,
+                         self.client.get("/conversation/latest", params={"conversation_id": body["conversation_id"], "limit": 50}))
+
+    async def filter(self, scheduled: float):
+        await self._send("conversations/filter", scheduled,
+                         self.client.get("/conversations/filter", params={"agent_type": self.rng.choice(AGENTS), "limit": 20}))
+
+    async def root(self, scheduled: float):
+        await self._send("root", scheduled, self.client.get("/", params={"limit": 5, "messages": 10}))
+
+async def run_load(url: str, rps: float, duration: float, mix: Dict[str, float], arrivals: str = "constant", warmup: float = 0.0,
+                   clients: int = 100, conversations: int = 200, max_outstanding: int = 1000, timeout: float = 60.0,
+                   seed: Optional[int] = None) -> dict:
+    """
+    Sends `rps` requests per second for `warmup + duration` seconds and summarizes the last `duration`.
+
+    Arrivals that find `max_outstanding` requests still running are dropped
+    (and counted), so an overloaded generator never queues on the client side.
+    """
+    rng = random.Random(seed)
+    recorder, discarded = Recorder(), Recorder()
+    names, weights = list(mix), list(mix.values())
+    limits = httpx.Limits(max_connections=max_outstanding, max_keepalive_connections=max_outstanding)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        generators = (LoadGenerator(client, discarded, clients, conversations, rng), LoadGenerator(client, recorder, clients, conversations, rng))
+        tasks = set()
+        start = time.perf_counter()
+        measured_from, end = start + warmup, start + warmup + duration
+        scheduled = start
+        while scheduled < end:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            generator = generators[scheduled >= measured_from]
+            if len(tasks) >= max_outstanding:
+                generator.recorder.dropped += 1
+            else:
+                scenario = rng.choices(names, weights)[0]
+                task = asyncio.create_task(getattr(generator, scenario)(scheduled))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            scheduled += rng.expovariate(rps) if arrivals == "poisson" else 1 / rps
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - measured_from
+
+    return recorder.summary(elapsed)
+
+async def fetch_json(url: str, path: str) -> Optional[dict]:
+    """GETs a JSON document, or None if the server doesn't answer (reports are still written)."""
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+            response = await client.get(path)
+            return response.json() if response.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def new_report(label: str, config: dict, results: dict, **extra) -> dict:
+    return {
+        "label": label,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": git_commit(),
+        "config": config,
+        "results": results,
+        **extra
+    }
+
+def write_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def print_summary(results: dict):
+    overall = results["overall"]
+    print(f"🔹 {overall['ok']}/{overall['requests']} ok ({overall['rejected']} rejected, {overall['failed']} failed, "
+          f"{overall['dropped']} dropped), {overall['throughput_rps']} req/s")
+    print(f"{'endpoint':<38}{'ok':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in results["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{endpoint:<38}{stats['ok']:>7}{stats['throughput_rps']:>9}"
+              + "".join(f"{latency[key] if latency[key] is not None else '-':>10}" for key in ("p50", "p95", "p99")))
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. conversation=0.7,retrieve_policy=0.3")
+    parser.add_argument("--arrivals", choices=("constant", "poisson"), default="poisson")
+    parser.add_argument("--clients", type=int, default=100, help="Distinct API keys")
+    parser.add_argument("--conversations", type=int, default=200, help="Distinct conversation ids")
+    parser.add_argument("--max-outstanding", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None, help="Report path (default: benchmarks/results/<label>-<time>.json)")
+
+def load_config(args) -> dict:
+    return {key: getattr(args, key) for key in ("rps", "duration", "warmup", "mix", "arrivals", "clients", "conversations",
+                                                "max_outstanding", "timeout", "seed")}
+
+def report_path(args) -> str:
+    return args.out or os.path.join("benchmarks", "results", f"{args.label}-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test against a running chatbot API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    add_load_arguments(parser)
+    args = parser.parse_args()
+
+    async def run():
+        results = await run_load(args.url, args.rps, args.duration, parse_mix(args.mix), args.arrivals, args.warmup,
+                                 args.clients, args.conversations, args.max_outstanding, args.timeout, args.seed)
+        return results, await fetch_json(args.url, "/metrics")
+
+    results, metrics = asyncio.run(run())
+    path = report_path(args)
+    write_report(new_report(args.label, {"url": args.url, **load_config(args)}, results, server_metrics=metrics), path)
+    print_summary(results)
+    print(f"✅ Report saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Latency percentiles, per-endpoint summaries and run-to-run comparison of benchmark reports."""
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values: Sequence[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values (None when empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def latency_summary(seconds: List[float]) -> dict:
+    """p50/p95/p99, mean and max in milliseconds."""
+    values = sorted(seconds)
+    summary = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["max"] = values[-1] if values else None
+    return {key: round(value * 1000, 3) if value is not None else None for key, value in summary.items()}
+
+class Recorder:
+    """Collects one sample per request: endpoint, status and latency (plus time to first byte for streams)."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.first_byte: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.dropped = 0
+
+    def record(self, endpoint: str, status: int, seconds: float, first_byte: Optional[float] = None):
+        self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+        if 200 <= status < 300:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if first_byte is not None:
+                self.first_byte.setdefault(endpoint, []).append(first_byte)
+
+    def summary(self, elapsed: float) -> dict:
+        """Overall and per-endpoint throughput, status counts and latency percentiles (successful requests only)."""
+        endpoints = {}
+        for endpoint in sorted(self.statuses):
+            statuses = self.statuses[endpoint]
+            latencies = self.latencies.get(endpoint, [])
+            endpoints[endpoint] = {
+                "requests": sum(statuses.values()),
+                "ok": len(latencies),
+                "status": dict(statuses),
+                "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+                "latency_ms": latency_summary(latencies)
+            }
+            if endpoint in self.first_byte:
+                endpoints[endpoint]["first_byte_ms"] = latency_summary(self.first_byte[endpoint])
+
+        requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+        ok = sum(endpoint["ok"] for endpoint in endpoints.values())
+        rejected = sum(count for statuses in self.statuses.values() for status, count in statuses.items() if status in ("429", "503"))
+        return {
+            "overall": {
+                "requests": requests,
+                "ok": ok,
+                "rejected": rejected,
+                "failed": requests - ok - rejected,
+                "dropped": self.dropped,
+                "elapsed_s": round(elapsed, 3),
+                "throughput_rps": round(ok / elapsed, 3) if elapsed else 0.0,
+                "latency_ms": latency_summary([seconds for values in self.latencies.values() for seconds in values])
+            },
+            "endpoints": endpoints
+        }
+
+def compare(baseline: dict, candidate: dict, max_regression: float = 0.1) -> List[dict]:
+    """
+    Per-endpoint changes between two reports.
+
+    A row regresses when a p95/p99 latency grows, or throughput drops, by more
+    than `max_regression` (a fraction), or the share of failed requests grows.
+    """
+    rows = []
+    base_endpoints = baseline["results"]["endpoints"]
+    for endpoint, current in candidate["results"]["endpoints"].items():
+        before = base_endpoints.get(endpoint)
+        if before is None:
+            continue
+        row = {"endpoint": endpoint, "regressed": []}
+        for key in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][key], current["latency_ms"][key]
+            row[key] = (old, new)
+            if key != "p50" and old and new and new > old * (1 + max_regression):
+                row["regressed"].append(key)
+
+        old, new = before["throughput_rps"], current["throughput_rps"]
+        row["throughput_rps"] = (old, new)
+        if old and new < old * (1 - max_regression):
+            row["regressed"].append("throughput_rps")
+
+        old_errors = 1 - before["ok"] / before["requests"] if before["requests"] else 0.0
+        new_errors = 1 - current["ok"] / current["requests"] if current["requests"] else 0.0
+        row["error_rate"] = (round(old_errors, 4), round(new_errors, 4))
+        if new_errors > old_errors + 0.01:
+            row["regressed"].append("error_rate")
+        rows.append(row)
+    return rows
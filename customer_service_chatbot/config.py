@@ -2,6 +2,150 @@ import os
 
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-openai-key")
+# Alternative API endpoint (e.g. http://127.0.0.1:9000/v1 for the fake server in benchmarks/); unset for api.openai.com
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Database of PostgreSQL URL
-DATABASE_URL = "postgresql://postgres:your-postgres-key@db/chatbot_db"
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:your-postgres-key@db/chatbot_db")
+
+# Optional async engine URL (e.g. "postgresql+asyncpg://..."; requires the matching async driver)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Query-embedding cache (set EMBEDDING_CACHE_PATH to persist it across restarts)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# Policy vector store: "chroma" (ChromaDB) or "numpy" (in-process, memory-mapped .npy index)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vector_index" if VECTOR_STORE_BACKEND == "numpy" else "chroma_db")
+
+# Embedding provider: "openai" (remote API) or "hashing" (fully local hashed n-gram vectors)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", "1024"))
+
+# Hybrid retrieval: fuse BM25 lexical ranking with vector ranking (Reciprocal Rank Fusion)
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "false").lower() == "true"
+RAG_BM25_WEIGHT = float(os.getenv("RAG_BM25_WEIGHT", "1.0"))
+
+# Policy ingestion: embedding request limits and hot reload of app/policies/retrievable/
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_MAX_CHARS = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "200000"))
+POLICY_HOT_RELOAD = os.getenv("POLICY_HOT_RELOAD", "false").lower() == "true"
+
+# LLM response cache: agents listed here may reuse answers (empty = disabled).
+# Setting RESPONSE_CACHE_SEMANTIC_THRESHOLD also serves near-identical questions (cosine similarity, local embeddings).
+RESPONSE_CACHE_AGENTS = [agent.strip() for agent in os.getenv("RESPONSE_CACHE_AGENTS", "sales,customer_support,tech_support").split(",") if agent.strip()]
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD")) if os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD") else None
+
+# Conversation writes: optionally queue turns in memory and insert them in batches (flushed on size, interval and shutdown)
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+
+# Opt-in recent-history cache: last HISTORY_CACHE_MESSAGES messages per active conversation, kept in process memory.
+# Invalidated only in its own process, so enable it only with a single worker (or each conversation pinned to one).
+HISTORY_CACHE_ENABLED = os.getenv("HISTORY_CACHE_ENABLED", "false").lower() == "true"
+HISTORY_CACHE_MESSAGES = int(os.getenv("HISTORY_CACHE_MESSAGES", "20"))
+HISTORY_CACHE_MAX_CONVERSATIONS = int(os.getenv("HISTORY_CACHE_MAX_CONVERSATIONS", "10000"))
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# NDJSON export: rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Batch conversation endpoint: turns processed at once (across conversations) and items accepted per request
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Embedding micro-batching: concurrent query embeddings arriving within the window share one API call (0 disables)
+EMBEDDING_MICRO_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_MICRO_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MICRO_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_MICRO_BATCH_MAX_SIZE", "64"))
+
+# Enforced policy rules (keywords, patterns, actions and responses per agent), compiled at startup.
+# Reloaded on change when POLICY_HOT_RELOAD is on, or via POST /admin/policies/reload.
+POLICY_RULES_PATH = os.getenv("POLICY_RULES_PATH", "app/policies/enforcement/rules.yaml")
+
+# Startup: migrations, policy index and clients warm up in the background (watch GET /readyz);
+# set to true to finish warming up before serving requests
+STARTUP_WAIT_FOR_WARMUP = os.getenv("STARTUP_WAIT_FOR_WARMUP", "false").lower() == "true"
+
+# Prompt assembly: max prompt tokens per model ("model=tokens,..."), tokens held back for history, history messages loaded
+PROMPT_TOKEN_BUDGETS = {
+    model.strip(): int(tokens) for model, tokens in
+    (entry.split("=") for entry in os.getenv("PROMPT_TOKEN_BUDGETS", "gpt-4=6000,gpt-4o=24000,gpt-4o-mini=24000,gpt-3.5-turbo=12000").split(",") if entry.strip())
+}
+PROMPT_TOKEN_BUDGET_DEFAULT = int(os.getenv("PROMPT_TOKEN_BUDGET_DEFAULT", "6000"))
+PROMPT_HISTORY_RESERVE_TOKENS = int(os.getenv("PROMPT_HISTORY_RESERVE_TOKENS", "500"))
+PROMPT_HISTORY_MESSAGES = int(os.getenv("PROMPT_HISTORY_MESSAGES", "10"))
+
+# Rolling conversation summaries: messages older than the last PROMPT_HISTORY_MESSAGES are folded into a summary
+# after each turn (in the background) and sent instead of the raw messages
+CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "true").lower() == "true"
+CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", "gpt-3.5-turbo")
+CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", "300"))
+CONVERSATION_SUMMARY_BATCH_MESSAGES = int(os.getenv("CONVERSATION_SUMMARY_BATCH_MESSAGES", "40"))  # Max messages folded per update
+CONVERSATION_SUMMARY_CACHE_SIZE = int(os.getenv("CONVERSATION_SUMMARY_CACHE_SIZE", "10000"))  # Per process, like the history cache
+
+# Opt-in model cascade per agent ("agent=cheap>larger;...", e.g. "sales=gpt-3.5-turbo>gpt-4"): the first model answers
+# unless an escalation signal fires (cut-off/empty reply, escalation marker, refusal, or the latency budget);
+# agents not listed (by default, all of them) answer with LLM_DEFAULT_MODEL alone
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gpt-4")
+LLM_MODEL_CASCADES = {
+    agent.strip(): [model.strip() for model in models.split(">") if model.strip()] for agent, models in
+    (entry.split("=") for entry in os.getenv("LLM_MODEL_CASCADES", "").split(";") if entry.strip())
+}
+CASCADE_MIN_RESPONSE_CHARS = int(os.getenv("CASCADE_MIN_RESPONSE_CHARS", "1"))
+CASCADE_ESCALATION_MARKERS = tuple(marker.strip() for marker in os.getenv("CASCADE_ESCALATION_MARKERS", "ESCALATE").split(",") if marker.strip())
+CASCADE_REFUSAL_PATTERN = os.getenv(
+    "CASCADE_REFUSAL_PATTERN",
+    r"\b(I'?m sorry,? but I (can(no|')t|am unable)|I (cannot|can't|am unable to) (help|assist)|as an AI( language model)?)\b"
+)
+CASCADE_LATENCY_BUDGET_SECONDS = float(os.getenv("CASCADE_LATENCY_BUDGET_SECONDS", "4.0"))  # Per non-final tier; 0 disables
+CASCADE_STREAM_PEEK_CHARS = int(os.getenv("CASCADE_STREAM_PEEK_CHARS", "80"))  # Streamed replies checked before forwarding
+
+# Upstream resilience (OpenAI): per-attempt timeout, retries with jittered backoff, circuit breaker, hedging.
+# The SDK's own retries are off so these are the only ones; each turn must finish within REQUEST_DEADLINE_SECONDS.
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "20"))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "3"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.2"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "2.0"))
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RECOVERY_SECONDS = float(os.getenv("OPENAI_BREAKER_RECOVERY_SECONDS", "30"))
+OPENAI_HEDGE_EMBEDDINGS = os.getenv("OPENAI_HEDGE_EMBEDDINGS", "true").lower() == "true"  # Embeddings are idempotent and cheap
+OPENAI_HEDGE_COMPLETIONS = os.getenv("OPENAI_HEDGE_COMPLETIONS", "false").lower() == "true"  # Doubles the cost of slow completions
+OPENAI_HEDGE_QUANTILE = float(os.getenv("OPENAI_HEDGE_QUANTILE", "0.95"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+
+# Admission control: opt-in per-client token buckets (keyed by a known X-API-Key from RATE_LIMIT_API_KEYS, else the
+# client address; behind a proxy listed in RATE_LIMIT_TRUSTED_PROXIES, "*" for any, the X-Forwarded-For address),
+# a global and per-agent in-flight cap ("agent=limit;..."), and a bounded queue served by agent priority
+# ("agent=priority;...", lower first). Requests that would wait longer than ADMISSION_QUEUE_SLO_SECONDS are rejected
+# at once with 503 and Retry-After.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "5"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))  # Idle clients' buckets are evicted beyond this
+RATE_LIMIT_API_KEYS = [key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()]
+RATE_LIMIT_TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if proxy.strip()]
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_AGENT_LIMITS = {
+    agent.strip(): int(limit) for agent, limit in
+    (entry.split("=") for entry in os.getenv("ADMISSION_AGENT_LIMITS", "customer_support=32;sales=16;tech_support=32").split(";") if entry.strip())
+}
+ADMISSION_PRIORITIES = {
+    agent.strip(): int(priority) for agent, priority in
+    (entry.split("=") for entry in os.getenv("ADMISSION_PRIORITIES", "tech_support=0;customer_support=1;sales=2").split(";") if entry.strip())
+}
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+ADMISSION_QUEUE_SLO_SECONDS = float(os.getenv("ADMISSION_QUEUE_SLO_SECONDS", "5"))
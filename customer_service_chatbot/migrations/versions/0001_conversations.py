@@ -0,0 +1,28 @@
+"""Conversations table (schema previously created by create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-02-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("conversation_id", sa.String(255), nullable=False),
+        sa.Column("sender", sa.String(255), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.TIMESTAMP(), nullable=False)
+    )
+    op.create_index("ix_conversations_conversation_id", "conversations", ["conversation_id"])
+
+def downgrade():
+    op.drop_index("ix_conversations_conversation_id", table_name="conversations")
+    op.drop_table("conversations")
@@ -0,0 +1,32 @@
+"""Conversation summaries, backfilled from existing messages
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-02-12
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "conversation_summaries",
+        sa.Column("conversation_id", sa.String(255), primary_key=True),
+        sa.Column("agent", sa.String(255), nullable=True),
+        sa.Column("last_timestamp", sa.TIMESTAMP(), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False)
+    )
+    op.create_index("ix_conversation_summaries_last_timestamp", "conversation_summaries", ["last_timestamp"])
+
+    op.execute(
+        "INSERT INTO conversation_summaries (conversation_id, last_timestamp, message_count) "
+        "SELECT conversation_id, MAX(timestamp), COUNT(*) FROM conversations GROUP BY conversation_id"
+    )
+
+def downgrade():
+    op.drop_index("ix_conversation_summaries_last_timestamp", table_name="conversation_summaries")
+    op.drop_table("conversation_summaries")
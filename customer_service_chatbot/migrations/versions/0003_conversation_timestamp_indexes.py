@@ -0,0 +1,28 @@
+"""Composite indexes for history and latest-message queries
+
+`(conversation_id, timestamp DESC)` serves "last N messages of a conversation"
+straight from the index, and `(timestamp DESC)` serves the global newest-first
+listings. The old single-column `conversation_id` index is a prefix of the
+composite one, so it is dropped.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-02-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_conversations_conversation_id_timestamp", "conversations", ["conversation_id", sa.text("timestamp DESC")])
+    op.create_index("ix_conversations_timestamp", "conversations", [sa.text("timestamp DESC")])
+    op.drop_index("ix_conversations_conversation_id", table_name="conversations")
+
+def downgrade():
+    op.create_index("ix_conversations_conversation_id", "conversations", ["conversation_id"])
+    op.drop_index("ix_conversations_timestamp", table_name="conversations")
+    op.drop_index("ix_conversations_conversation_id_timestamp", table_name="conversations")
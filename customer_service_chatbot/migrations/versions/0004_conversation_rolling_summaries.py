@@ -0,0 +1,28 @@
+"""Rolling conversation summaries
+
+Adds the running summary of each conversation's older messages to its
+`conversation_summaries` row, with the timestamp of the newest message folded
+into it so updates only summarize what is new.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-02-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("conversation_summaries", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column("conversation_summaries", sa.Column("summarized_through", sa.TIMESTAMP(), nullable=True))
+    op.add_column("conversation_summaries", sa.Column("summarized_messages", sa.Integer(), nullable=False, server_default="0"))
+
+def downgrade():
+    with op.batch_alter_table("conversation_summaries") as batch:
+        batch.drop_column("summarized_messages")
+        batch.drop_column("summarized_through")
+        batch.drop_column("summary")
@@ -0,0 +1,70 @@
+"""
+Import-time profile of the app (or any module), from `python -X importtime`.
+
+Usage (from customer_service_chatbot/):
+    python scripts/profile_imports.py                 # profiles `import app.main`
+    python scripts/profile_imports.py app.api.routes --top 30
+
+Prints the total import time, the slowest modules by cumulative and self time,
+and whether any of the heavy optional dependencies were imported eagerly.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Imported on first use only; loading one of them at import time is a startup regression
+LAZY_MODULES = ("chromadb", "llama_index", "openai", "tiktoken")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def profile(module: str):
+    """Returns [(module, self_us, cumulative_us, depth)] for a fresh `import module`."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"❌ import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total = next((cumulative for name, _, cumulative, _ in rows if name == args.module), 0)
+    print(f"🔹 import {args.module}: {total / 1000:.1f} ms, {len(rows)} modules\n")
+
+    print("Slowest top-level packages (cumulative):")
+    top_level = {}
+    for name, _, cumulative, _ in rows:
+        package = name.split(".")[0]
+        top_level[package] = max(top_level.get(package, 0), cumulative)
+    for package, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {package}")
+
+    print("\nSlowest modules (self time):")
+    for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    eager = sorted({name.split(".")[0] for name, _, _, _ in rows if name.split(".")[0] in LAZY_MODULES})
+    print()
+    if eager:
+        print(f"❌ Imported eagerly (should load on first use): {', '.join(eager)}")
+        sys.exit(1)
+    print(f"✅ None of {', '.join(LAZY_MODULES)} imported at startup")
+
+if __name__ == "__main__":
+    main()